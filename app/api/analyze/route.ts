@@ -3,6 +3,7 @@ import { writeFile, unlink, mkdir } from 'fs/promises'
 import { join } from 'path'
 import { spawn } from 'child_process'
 import * as fs from 'fs'
+import { getPythonCommand } from '../pythonCommand'
 
 const PROGRESS_LINE = /\[PROGRESS\](\d+)(?:\|(.*))?/
 
@@ -96,13 +97,7 @@ export async function POST(request: NextRequest) {
     console.log('savedConfig.kpis:', JSON.stringify(savedConfig.kpis, null, 2))
     console.log('savedConfig.kpis 개수:', savedConfig.kpis ? savedConfig.kpis.length : 0)
 
-    const venvPython = join(process.cwd(), 'venv', 'bin', 'python')
-    let pythonCmd: string
-    if (fs.existsSync(venvPython)) {
-      pythonCmd = venvPython
-    } else {
-      pythonCmd = process.platform === 'win32' ? 'python' : 'python3'
-    }
+    const pythonCmd = getPythonCommand()
     const env = {
       ...process.env,
       GEMINI_API_KEY: process.env.GEMINI_API_KEY || '',
@@ -110,7 +105,8 @@ export async function POST(request: NextRequest) {
     const resultsPath = join(tmpDir, 'results.json')
     const excelScript = join(process.cwd(), 'python', 'report_excel.py')
     const excelPath = join(tmpDir, 'report.xlsx')
-    const parsedDataPath = join(tmpDir, 'parsed_data.xlsx')
+    // ARTIFACT_MODE=lazy: 결과만 먼저 반환하고 report.xlsx는 만들지 않음 (기본 eager: 분석 직후 생성)
+    const lazyArtifacts = process.env.ARTIFACT_MODE === 'lazy'
 
     const stream = new ReadableStream<Uint8Array>({
       async start(controller) {
@@ -164,43 +160,45 @@ export async function POST(request: NextRequest) {
             (results.additionalResults?.length > 0)
           if (!hasResults) results.warning = '분석 결과가 없습니다. Excel 파일 형식과 KPI 설정을 확인해주세요.'
 
-          await new Promise<void>((resolve, reject) => {
-            const child = spawn(pythonCmd, [excelScript, resultsPath], {
-              env,
-              cwd: process.cwd(),
-            })
-            let buffer = ''
-            child.stdout?.on('data', (chunk: Buffer) => {
-              buffer += chunk.toString()
-              const parts = buffer.split('\n')
-              buffer = parts.pop() ?? ''
-              for (const line of parts) {
-                const m = line.match(PROGRESS_LINE)
-                if (m) pushProgress(controller, parseInt(m[1], 10), (m[2] || '').trim())
-              }
-            })
-            child.stderr?.on('data', (chunk: Buffer) => {
-              const s = chunk.toString()
-              if (!s.includes('DeprecationWarning')) console.error('Excel stderr:', s)
+          if (lazyArtifacts) {
+            // 다운로드 파일은 /api/excel, /api/parsed-data 첫 요청 시 생성
+            pushProgress(controller, 100, 'Done')
+          } else {
+            await new Promise<void>((resolve, reject) => {
+              const child = spawn(pythonCmd, [excelScript, resultsPath], {
+                env,
+                cwd: process.cwd(),
+              })
+              let buffer = ''
+              child.stdout?.on('data', (chunk: Buffer) => {
+                buffer += chunk.toString()
+                const parts = buffer.split('\n')
+                buffer = parts.pop() ?? ''
+                for (const line of parts) {
+                  const m = line.match(PROGRESS_LINE)
+                  if (m) pushProgress(controller, parseInt(m[1], 10), (m[2] || '').trim())
+                }
+              })
+              child.stderr?.on('data', (chunk: Buffer) => {
+                const s = chunk.toString()
+                if (!s.includes('DeprecationWarning')) console.error('Excel stderr:', s)
+              })
+              child.on('error', reject)
+              child.on('close', (code) => (code === 0 ? resolve() : reject(new Error(`report_excel.py exited with ${code}`))))
             })
-            child.on('error', reject)
-            child.on('close', (code) => (code === 0 ? resolve() : reject(new Error(`report_excel.py exited with ${code}`))))
-          })
+          }
 
           let excelBase64: string | null = null
-          let parsedDataBase64: string | null = null
-          if (fs.existsSync(excelPath)) {
+          if (!lazyArtifacts && fs.existsSync(excelPath)) {
             excelBase64 = fs.readFileSync(excelPath).toString('base64')
           }
-          if (fs.existsSync(parsedDataPath)) {
-            parsedDataBase64 = fs.readFileSync(parsedDataPath).toString('base64')
-          }
           results.useAI = config.useAI || false
           const excelUrl = excelBase64 ? null : `/api/excel?t=${Date.now()}`
-          const parsedDataUrl = parsedDataBase64 ? null : `/api/parsed-data?t=${Date.now()}`
+          // parsed_data.xlsx는 analyze.py가 만들지 않음 (/api/parsed-data 요청 시 중간 파일에서 생성)
+          const parsedDataUrl = `/api/parsed-data?t=${Date.now()}`
           controller.enqueue(encoder.encode(JSON.stringify({
             type: 'done',
-            data: { results, excelUrl, parsedDataUrl, excelBase64, parsedDataBase64 },
+            data: { results, excelUrl, parsedDataUrl, excelBase64 },
           }) + '\n'))
 
           try {
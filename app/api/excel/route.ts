@@ -1,12 +1,14 @@
 import { NextRequest, NextResponse } from 'next/server'
-import { readFile, access, writeFile, unlink } from 'fs/promises'
+import { readFile, access, writeFile, unlink, stat } from 'fs/promises'
 import { constants } from 'fs'
 import { join } from 'path'
 import { execFile } from 'child_process'
+import { getPythonCommand } from '../pythonCommand'
 
 function execFileAsync(command: string, args: string[], cwd?: string): Promise<void> {
   return new Promise((resolve, reject) => {
-    execFile(command, args, { cwd }, (error, stdout, stderr) => {
+    // report_excel.py는 DEBUG 로그가 많아 기본 출력 버퍼(1MB)를 넘을 수 있음
+    execFile(command, args, { cwd, maxBuffer: 64 * 1024 * 1024 }, (error, stdout, stderr) => {
       if (error) {
         reject(new Error(`${error.message}\n${stderr || ''}`))
         return
@@ -17,9 +19,42 @@ function execFileAsync(command: string, args: string[], cwd?: string): Promise<v
   })
 }
 
+async function mtimeMs(path: string): Promise<number | null> {
+  try {
+    return (await stat(path)).mtimeMs
+  } catch (err) {
+    return null
+  }
+}
+
+// ARTIFACT_MODE=lazy이면 analyze가 report.xlsx를 만들지 않으므로 첫 요청 시 생성.
+// results.json보다 최신인 report.xlsx는 같은 분석 작업의 것이므로 재사용, 동시 요청은 생성 1회를 공유
+let reportGeneration: Promise<void> | null = null
+
+async function ensureReport(): Promise<void> {
+  const resultsPath = join(process.cwd(), 'tmp', 'results.json')
+  const excelPath = join(process.cwd(), 'tmp', 'report.xlsx')
+  const resultsMtime = await mtimeMs(resultsPath)
+  if (resultsMtime === null) return
+  const excelMtime = await mtimeMs(excelPath)
+  if (excelMtime !== null && excelMtime >= resultsMtime) return
+
+  if (!reportGeneration) {
+    reportGeneration = execFileAsync(
+      getPythonCommand(),
+      [join(process.cwd(), 'python', 'report_excel.py'), resultsPath],
+      process.cwd()
+    ).finally(() => {
+      reportGeneration = null
+    })
+  }
+  await reportGeneration
+}
+
 export async function GET(request: NextRequest) {
   try {
     const excelPath = join(process.cwd(), 'tmp', 'report.xlsx')
+    await ensureReport()
     
     // 파일 존재 여부 확인
     try {
@@ -63,6 +98,7 @@ export async function GET(request: NextRequest) {
 export async function POST(request: NextRequest) {
   try {
     const excelPath = join(process.cwd(), 'tmp', 'report.xlsx')
+    await ensureReport()
 
     try {
       await access(excelPath, constants.F_OK)
@@ -87,7 +123,7 @@ export async function POST(request: NextRequest) {
         'utf-8'
       )
       await execFileAsync(
-        'python',
+        getPythonCommand(),
         [join(process.cwd(), 'python', 'add_summary_sheet.py'), excelPath, payloadPath],
         process.cwd()
       )
@@ -2,15 +2,48 @@ import { NextRequest, NextResponse } from 'next/server'
 import { readFile, access } from 'fs/promises'
 import { constants } from 'fs'
 import { join } from 'path'
+import { execFile } from 'child_process'
+import { getPythonCommand } from '../pythonCommand'
+
+function execFileAsync(command: string, args: string[], cwd?: string): Promise<void> {
+  return new Promise((resolve, reject) => {
+    execFile(command, args, { cwd }, (error, stdout, stderr) => {
+      if (error) {
+        reject(new Error(`${error.message}\n${stderr || ''}`))
+        return
+      }
+      if (stdout) console.log(stdout)
+      resolve()
+    })
+  })
+}
+
+async function exists(path: string): Promise<boolean> {
+  try {
+    await access(path, constants.F_OK)
+    return true
+  } catch (err) {
+    return false
+  }
+}
 
 export async function GET(request: NextRequest) {
   try {
-    const parsedDataPath = join(process.cwd(), 'tmp', 'parsed_data.xlsx')
-    
+    const tmpDir = join(process.cwd(), 'tmp')
+    const parsedDataPath = join(tmpDir, 'parsed_data.xlsx')
+    // analyze.py는 중간 파일(parsed_data.pkl)만 저장하므로 XLSX는 요청 시 생성 (최신이면 재사용)
+    const intermediatePath = join(tmpDir, 'parsed_data.pkl')
+
+    if (await exists(intermediatePath)) {
+      await execFileAsync(
+        getPythonCommand(),
+        [join(process.cwd(), 'python', 'export_parsed_data.py'), tmpDir],
+        process.cwd()
+      )
+    }
+
     // 파일 존재 여부 확인
-    try {
-      await access(parsedDataPath, constants.F_OK)
-    } catch (err) {
+    if (!(await exists(parsedDataPath))) {
       console.error(`Parsed data file not found at: ${parsedDataPath}`)
       console.error(`Current working directory: ${process.cwd()}`)
       return NextResponse.json(
@@ -45,4 +78,3 @@ export async function GET(request: NextRequest) {
     )
   }
 }
-
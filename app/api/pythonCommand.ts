@@ -0,0 +1,11 @@
+import { existsSync } from 'fs'
+import { join } from 'path'
+
+// Python 스크립트 실행 명령: 프로젝트 venv가 있으면 그 인터프리터(pandas/openpyxl 설치), 없으면 플랫폼 기본 명령
+export function getPythonCommand(): string {
+  const venvPython = join(process.cwd(), 'venv', 'bin', 'python')
+  if (existsSync(venvPython)) {
+    return venvPython
+  }
+  return process.platform === 'win32' ? 'python' : 'python3'
+}
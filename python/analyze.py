@@ -4,13 +4,31 @@
 Adobe Analytics A/B 테스트 데이터 분석 스크립트
 """
 
+import os
 import sys
 import json
+import threading
+import time
 import pandas as pd
 import numpy as np
-from scipy.stats import norm
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from core.bayesian import (
+    QMC_SIMS, CellStreams, adaptive_mc_uplift_probs, mc_uplift_probs, qmc_uplift_probs, uplift_probs,
+)
+from core.bayesian_cache import BayesianCache, bayesian_cell_key, bayesian_settings_key
+from core.columns import col_index_to_letter, col_letter_to_index, column_labels
+from core.country_codes import COUNTRY_MATCHER
+from core.layout_cache import LayoutCache, layout_fingerprint
+from core.metric_index import (
+    MATCH_CART_ADD, MATCH_CORE_WORDS, cell_to_float, clean_label, get_metric_index, resolve_metric_matrix,
+)
+from core.parse_cache import ParseCache
+from core.parsed_data import save_parsed_data, save_parsed_data_sources
+from core.stats import confidence_rates, verdicts
+from core.workbook_reader import WorkbookReader
 
 # Windows 콘솔 인코딩 설정
 if sys.platform == 'win32':
@@ -24,6 +42,32 @@ if sys.platform == 'win32':
 
 # B열(인덱스 1) 이후부터 Control/Variation 세그먼트 컬럼을 동적으로 탐색
 SEGMENT_SCAN_START_COL_IDX = 1  # B열 (0-based index)
+# 컬럼 수를 모를 때 세그먼트 순차 폴백이 배치하는 컬럼 범위 (A~Z)
+FALLBACK_SEGMENT_COLUMN_COUNT = 26
+# 세그먼트 컬럼 감지 시 Segments 행 아래에서 숫자 여부를 확인하는 샘플 행 수
+SEGMENT_SAMPLE_ROWS = 8
+# 헤더 미리보기(1단계 읽기)에서 처음 읽는 행 수 (Segments 행을 못 찾으면 늘려가며 재시도)
+HEADER_PEEK_ROWS = 64
+# detect_country_from_excel이 확인하는 데이터 행 수 (Visits 탐색 100행 + 하단 5행)
+COUNTRY_SCAN_ROWS = 105
+# 파싱 결과 캐시 키에 포함되는 파서 버전 (parse_excel 출력이 바뀌면 올려서 기존 캐시 무효화)
+PARSER_VERSION = 5
+# 파싱 캐시 기본 용량 상한 (MB, 환경변수 PARSE_CACHE_MAX_MB로 변경)
+PARSE_CACHE_DEFAULT_MAX_MB = 512
+# 헤더 레이아웃 지문 캐시 최대 항목 수
+LAYOUT_CACHE_MAX_ENTRIES = 1000
+# 다중 파일 파싱 백엔드: auto일 때 이 파일 수 이상이면 프로세스 풀 사용 (적으면 스레드 풀)
+PROCESS_POOL_MIN_FILES = 4
+# 스레드 풀 백엔드 최대 워커 수
+THREAD_POOL_MAX_WORKERS = 6
+PARSE_BACKENDS = ('auto', 'thread', 'process')
+# (Report Order, Country) 조합 KPI 분석 백엔드: auto일 때 이 조합 수 이상이면 프로세스 풀 사용 (적으면 순차 실행)
+ANALYSIS_POOL_MIN_COMBINATIONS = 4
+ANALYSIS_BACKENDS = ('auto', 'sequential', 'process')
+# 이 크기 이상의 CSV는 데이터 영역을 청크 단위로 스트리밍 파싱 (MB, 환경변수 CSV_STREAM_MIN_MB로 변경)
+CSV_STREAM_DEFAULT_MIN_MB = 64
+# 스트리밍 파싱 시 한 번에 읽는 행 수
+CSV_STREAM_CHUNK_ROWS = 100_000
 
 
 def report_progress(pct: int, message: str = ""):
@@ -65,10 +109,13 @@ class JSONEncoder(json.JSONEncoder):
         return value
 
 # =============================
-# Bayesian 사후확률 계산 (Beta-분포 Monte Carlo)
+# Bayesian 사후확률 계산 (Beta 사후분포)
 # =============================
-_BAYESIAN_RNG = np.random.default_rng(42)
+# 작업 시드 (환경변수 BAYESIAN_SEED). 셀 키가 없을 때 쓰는 공유 난수열도 이 시드로 만든다
+_BAYESIAN_SEED = 42
+_BAYESIAN_RNG = np.random.default_rng(_BAYESIAN_SEED)
 _N_SIMS = 50_000
+_QMC_SIMS = QMC_SIMS    # qmc 모드 Sobol 점 개수
 _UPLIFT_TH = 0.03
 _PRIOR_A = 1.0
 _PRIOR_B = 1.0
@@ -77,6 +124,18 @@ _MIN_EVENTS = 60       # 분자(numerator) 최소 모수
 _TH_STRONG = 0.90
 _TH_SOFT = 0.80
 
+# 사후확률 계산 방식 (환경변수 BAYESIAN_MODE)
+# analytic: 수치 적분 (큰 모수는 정규근사), mc: Monte Carlo (_N_SIMS회 추출)
+# adaptive: 조기 종료 Monte Carlo (decision이 확정되면 중단, 최대 BAYESIAN_MAX_SIMS회)
+# qmc: scrambled Sobol 준난수 + Beta 역 CDF (_QMC_SIMS개 점)
+BAYESIAN_MODES = ('analytic', 'mc', 'adaptive', 'qmc')
+BAYESIAN_DEFAULT_MODE = 'analytic'
+
+# Bayesian 결과 캐시 최대 항목 수 (프로세스 내부 LRU, 디스크 저장소 공통)
+BAYESIAN_CACHE_MAX_ENTRIES = 100_000
+# 캐시 키에 포함되는 계산 버전 (확률 계산 방식이 바뀌면 올려서 기존 캐시 무효화)
+BAYESIAN_CACHE_VERSION = 2
+
 _BAYESIAN_NONE = (None, None, None, None, None, None)
 _BAYESIAN_INSUFF = (None, None, None, None, None, '모수부족 (60건 미만)')
 
@@ -93,157 +152,570 @@ def _assign_bayesian_decision(p_gt3, p_lt3):
     return 'No Clear Direction'
 
 
-def compute_bayesian_probs(cd, cn, vd, vn):
-    """Beta 사후분포 Monte Carlo로 uplift 확률 계산.
+def get_bayesian_mode():
+    """환경변수 BAYESIAN_MODE (analytic/mc/adaptive/qmc, 기본 analytic)"""
+    mode = str(os.getenv('BAYESIAN_MODE') or BAYESIAN_DEFAULT_MODE).lower()
+    if mode not in BAYESIAN_MODES:
+        print(f"DEBUG: 알 수 없는 Bayesian 계산 방식 '{mode}', {BAYESIAN_DEFAULT_MODE}로 처리")
+        mode = BAYESIAN_DEFAULT_MODE
+    return mode
+
+
+def get_bayesian_max_sims():
+    """환경변수 BAYESIAN_MAX_SIMS (adaptive 모드 셀당 최대 추출 수, 기본 _N_SIMS)"""
+    value = os.getenv('BAYESIAN_MAX_SIMS')
+    if not value:
+        return _N_SIMS
+    try:
+        max_sims = int(value)
+    except ValueError:
+        max_sims = 0
+    if max_sims <= 0:
+        print(f"DEBUG: 잘못된 BAYESIAN_MAX_SIMS '{value}', {_N_SIMS}로 처리")
+        return _N_SIMS
+    return max_sims
+
+
+def get_bayesian_seed():
+    """환경변수 BAYESIAN_SEED (셀별 난수열의 작업 시드, 기본 _BAYESIAN_SEED)"""
+    value = os.getenv('BAYESIAN_SEED')
+    if not value:
+        return _BAYESIAN_SEED
+    try:
+        return int(value)
+    except ValueError:
+        print(f"DEBUG: 잘못된 BAYESIAN_SEED '{value}', {_BAYESIAN_SEED}로 처리")
+        return _BAYESIAN_SEED
+
+
+def _report_adaptive_draws(draws, max_sims):
+    """adaptive 모드 셀별 추출 횟수와 고정 추출 대비 절감량 출력"""
+    fixed = len(draws) * max_sims
+    print(f"DEBUG: Bayesian adaptive MC - 셀 {len(draws)}개, 추출 {int(draws.sum()):,}회 "
+          f"(고정 {fixed:,}회 대비 {100 * (1 - draws.sum() / fixed):.1f}% 절감), "
+          f"셀별 추출 횟수: {draws.tolist()}")
+
+
+def _bayesian_posterior(cd, cn, vd, vn):
+    """
+    입력 검증 후 Beta 사후분포 모수 (a_c, b_c, a_v, b_v).
+    계산하지 않는 셀은 _BAYESIAN_INSUFF / _BAYESIAN_NONE 반환.
+    """
+    try:
+        cd, cn, vd, vn = float(cd), float(cn), float(vd), float(vn)
+    except (TypeError, ValueError):
+        return _BAYESIAN_NONE
+    if not np.isfinite([cd, cn, vd, vn]).all():
+        return _BAYESIAN_NONE
+    if cn < _MIN_EVENTS or vn < _MIN_EVENTS:
+        return _BAYESIAN_INSUFF
+    if cd <= 0 or vd <= 0 or cn < 0 or vn < 0 or cn > cd or vn > vd:
+        return _BAYESIAN_NONE
+    return _PRIOR_A + cn, _PRIOR_B + (cd - cn), _PRIOR_A + vn, _PRIOR_B + (vd - vn)
+
+
+def _bayesian_result(p_gt0, p_lt0, p_gt3, p_lt3, p_neutral):
+    """확률을 소수 4자리로 반올림하고 decision 부여"""
+    p_gt0, p_lt0, p_gt3, p_lt3, p_neutral = (round(float(p), 4) for p in (p_gt0, p_lt0, p_gt3, p_lt3, p_neutral))
+    return p_gt0, p_lt0, p_gt3, p_lt3, p_neutral, _assign_bayesian_decision(p_gt3, p_lt3)
+
+
+def compute_bayesian_probs(cd, cn, vd, vn, mode=None):
+    """Beta 사후분포로 uplift 확률 계산.
 
     cd: control denominator, cn: control numerator (분자)
     vd: variation denominator, vn: variation numerator (분자)
     분자가 각각 60 미만이면 decision만 '모수부족 (60건 미만)'으로 반환.
+    mode: 'analytic' (수치 적분), 'mc' (Monte Carlo), 'adaptive' (조기 종료 Monte Carlo),
+          'qmc' (Sobol 준난수).
+          None이면 get_bayesian_mode()
     반환: (p_gt0, p_lt0, p_gt3, p_lt3, p_neutral, decision)
     """
+    return compute_bayesian_probs_batch([cd], [cn], [vd], [vn], mode)[0]
+
+
+_bayesian_cache = None
+_bayesian_cache_lock = threading.Lock()
+
+
+def get_bayesian_cache():
+    """
+    Bayesian 결과 캐시 (프로세스당 하나). 환경변수 BAYESIAN_CACHE=0이면 None.
+    BAYESIAN_CACHE_DISK=1이면 실행 간 공유하는 디스크 저장소 사용
+    (위치: BAYESIAN_CACHE_PATH, 기본: 프로젝트 tmp/bayesian_cache.json)
+    """
+    global _bayesian_cache
+    if os.getenv('BAYESIAN_CACHE', '1') == '0':
+        return None
+    with _bayesian_cache_lock:
+        if _bayesian_cache is None:
+            path = None
+            if os.getenv('BAYESIAN_CACHE_DISK', '0') == '1':
+                path = os.getenv('BAYESIAN_CACHE_PATH') or (Path(__file__).parent.parent / 'tmp' / 'bayesian_cache.json')
+            _bayesian_cache = BayesianCache(BAYESIAN_CACHE_MAX_ENTRIES, path)
+        return _bayesian_cache
+
+
+def flush_bayesian_cache():
+    """작업 끝에 Bayesian 캐시의 새 항목을 디스크 저장소에 한 번에 저장 (디스크 저장소를 쓸 때만)"""
+    cache = get_bayesian_cache()
+    if cache is None:
+        return
+    started = time.perf_counter()
+    saved = cache.flush()
+    if saved:
+        print(f"DEBUG: Bayesian 캐시 저장 - 새 항목 {saved}개 ({time.perf_counter() - started:.3f}초)")
+
+
+def _bayesian_settings(mode, seed):
+    """계산 방식별로 결과에 영향을 주는 설정 (캐시 키)"""
+    sims = {'mc': _N_SIMS, 'adaptive': get_bayesian_max_sims(), 'qmc': _QMC_SIMS}.get(mode)
+    return bayesian_settings_key(
+        version=BAYESIAN_CACHE_VERSION, mode=mode, sims=sims, seed=seed,
+        prior=[_PRIOR_A, _PRIOR_B], uplift_threshold=_UPLIFT_TH, eps=_EPS,
+        decision_thresholds=[_TH_SOFT, _TH_STRONG],
+    )
+
+
+def _bayesian_probs_array(mode, a_c, b_c, a_v, b_v, rng):
+    """사후분포 모수 배열 → (셀 수 × 5) 확률 배열 (계산 실패 시 NaN)"""
     try:
-        cd, cn, vd, vn = float(cd), float(cn), float(vd), float(vn)
-        if cn < _MIN_EVENTS or vn < _MIN_EVENTS:
-            return _BAYESIAN_INSUFF
-        if cd <= 0 or vd <= 0 or cn < 0 or vn < 0 or cn > cd or vn > vd:
-            return _BAYESIAN_NONE
-        a_c = _PRIOR_A + cn
-        b_c = _PRIOR_B + (cd - cn)
-        a_v = _PRIOR_A + vn
-        b_v = _PRIOR_B + (vd - vn)
-        p_c = _BAYESIAN_RNG.beta(a_c, b_c, _N_SIMS)
-        p_v = _BAYESIAN_RNG.beta(a_v, b_v, _N_SIMS)
-        uplift = (p_v - p_c) / np.clip(p_c, _EPS, None)
-        p_gt0 = round(float(np.mean(uplift > 0)), 4)
-        p_lt0 = round(float(np.mean(uplift < 0)), 4)
-        p_gt3 = round(float(np.mean(uplift > _UPLIFT_TH)), 4)
-        p_lt3 = round(float(np.mean(uplift < -_UPLIFT_TH)), 4)
-        p_neutral = round(float(np.mean(np.abs(uplift) <= _UPLIFT_TH)), 4)
-        decision = _assign_bayesian_decision(p_gt3, p_lt3)
-        return p_gt0, p_lt0, p_gt3, p_lt3, p_neutral, decision
+        if mode == 'mc':
+            probs = mc_uplift_probs(a_c, b_c, a_v, b_v, _UPLIFT_TH, _N_SIMS, rng, eps=_EPS)
+        elif mode == 'adaptive':
+            max_sims = get_bayesian_max_sims()
+            probs, draws = adaptive_mc_uplift_probs(
+                a_c, b_c, a_v, b_v, _UPLIFT_TH, (_TH_SOFT, _TH_STRONG), max_sims, rng, eps=_EPS,
+            )
+            _report_adaptive_draws(draws, max_sims)
+        elif mode == 'qmc':
+            probs = qmc_uplift_probs(a_c, b_c, a_v, b_v, _UPLIFT_TH, _QMC_SIMS, rng, eps=_EPS)
+        else:
+            probs = uplift_probs(a_c, b_c, a_v, b_v, _UPLIFT_TH)
+        return np.column_stack(probs)
     except Exception:
-        return _BAYESIAN_NONE
+        return np.full((len(a_c), 5), np.nan)
+
+
+def compute_bayesian_probs_batch(cd, cn, vd, vn, mode=None, cell_keys=None):
+    """
+    여러 셀의 compute_bayesian_probs 결과 목록 (입력 순서대로).
+    계산 대상 셀을 모아 한 번에 계산한다 (analytic: 배열 적분, mc/adaptive: Control 그룹별 추출·Control 추출값 공유, qmc: 2-D 블록).
+    cell_keys: 셀별 안정적인 키 (country, report_order, KPI, segment, variation).
+               주어지면 추출 방식은 작업 시드 + 키로 만든 셀별 난수열(CellStreams)을 사용해
+               계산 순서·워커와 무관하게 같은 결과를 낸다. 없으면 공유 난수열 _BAYESIAN_RNG 사용.
+    같은 설정·같은 값의 셀은 get_bayesian_cache() 결과를 재사용한다 (적중률은 DEBUG로 출력).
+    adaptive 모드는 셀별 추출 횟수를 DEBUG로 출력한다.
+    """
+    mode = mode or get_bayesian_mode()
+    seed = get_bayesian_seed()
+    # 셀별 난수열을 쓰면 결과가 셀 키에 따라 달라지므로 캐시 키에도 포함
+    streamed = cell_keys is not None and mode != 'analytic'
+    if cell_keys is None:
+        cell_keys = [None] * len(cd)
+    results = []
+    positions = []
+    posteriors = []
+    stream_keys = []
+    keys = []
+    cache = get_bayesian_cache()
+    settings = _bayesian_settings(mode, seed) if cache is not None else None
+    for cell, cell_key in zip(zip(cd, cn, vd, vn), cell_keys):
+        posterior = _bayesian_posterior(*cell)
+        if posterior is _BAYESIAN_NONE or posterior is _BAYESIAN_INSUFF:
+            results.append(posterior)
+            continue
+        positions.append(len(results))
+        posteriors.append(posterior)
+        stream_keys.append(cell_key)
+        if cache is not None:
+            keys.append(bayesian_cell_key(settings, *cell, stream_key=cell_key if streamed else None))
+        results.append(None)
+    if not posteriors:
+        return results
+
+    cached = cache.get_many(keys) if cache is not None else [None] * len(posteriors)
+    pending = [i for i, value in enumerate(cached) if value is None]
+    for pos, value in zip(positions, cached):
+        results[pos] = value
+    if pending:
+        a_c, b_c, a_v, b_v = np.array([posteriors[i] for i in pending], dtype=float).T
+        rng = _BAYESIAN_RNG
+        if streamed:
+            # Control은 같은 (country, report_order, KPI, segment) + 같은 Control 값끼리 공유, Variation은 셀마다 별도
+            rng = CellStreams(
+                seed,
+                [('control', *stream_keys[i][:-1], *posteriors[i][:2]) for i in pending],
+                [('variation', *stream_keys[i]) for i in pending],
+            )
+        new_entries = []
+        for i, row in zip(pending, _bayesian_probs_array(mode, a_c, b_c, a_v, b_v, rng)):
+            if np.isnan(row).any():
+                results[positions[i]] = _BAYESIAN_NONE
+                continue
+            results[positions[i]] = _bayesian_result(*row)
+            if cache is not None:
+                new_entries.append((keys[i], results[positions[i]]))
+        if cache is not None:
+            cache.put_many(new_entries)
+    if cache is not None:
+        print(f"DEBUG: Bayesian 캐시 - 셀 {len(posteriors)}개 중 {len(posteriors) - len(pending)}개 재사용 "
+              f"(누적 {cache.hit_rate_summary()})")
+    return results
+
+
+def _first_column_text(df):
+    """A열(첫 번째 컬럼)을 문자열 Series로 반환. 빈 셀은 ''로 채움."""
+    col = df.iloc[:, 0]
+    return col.astype(str).where(col.notna(), '')
+
+
+def _first_matching_row(mask):
+    """boolean mask에서 첫 번째 True 행의 인덱스 라벨 반환 (없으면 None)"""
+    hits = np.flatnonzero(mask.to_numpy(dtype=bool))
+    if len(hits) == 0:
+        return None
+    return mask.index[hits[0]]
 
 
 def find_segments_row(df):
     """'Segments' 행을 찾아 데이터 시작 위치 반환"""
-    for idx, row in df.iterrows():
-        # 첫 번째 컬럼에 "Segments"가 포함되어 있는지 확인
-        if pd.notna(row[0]) and 'Segments' in str(row[0]):
+    # 첫 번째 컬럼에 "Segments"가 포함되어 있는지 확인
+    idx = _first_matching_row(_first_column_text(df).str.contains('Segments', regex=False))
+    return 0 if idx is None else idx
+
+
+def locate_segments_row(df, head_rows=200):
+    """A열이 'Segments'로 시작하는 첫 번째 행 인덱스 반환 (없으면 None)"""
+    # Segments 행은 보통 상단에 있으므로 앞부분을 먼저 확인하고, 없을 때만 전체 스캔
+    for part in (df.iloc[:head_rows], df.iloc[head_rows:]):
+        idx = _first_matching_row(_first_column_text(part).str.strip().str.startswith('Segments'))
+        if idx is not None:
             return idx
-    return 0
+    return None
+
 
-def parse_excel(file_path):
+def _valid_metric_row_mask(a_col):
+    """A열이 비어있거나 주석/구분선(#, =, ====, ####)인 행을 False로 표시하는 mask"""
+    a_val = a_col.astype(str).where(a_col.notna(), '')
+    a_clean = a_val.str.strip()
+    invalid = (
+        a_clean.str.startswith('#') | a_clean.str.startswith('=')
+        | a_val.str.contains('====', regex=False) | a_val.str.contains('####', regex=False)
+        | (a_clean == '')
+    )
+    return ~invalid
+
+
+def _coerce_numeric_block(block):
     """
-    Excel 또는 CSV 파일 파싱
-    - A열: 메트릭 이름
-    - B열 이후: 세그먼트 Control/Variation 컬럼 (위치는 파일마다 다를 수 있음, 헤더에서 동적 감지)
+    B열 이후 값 블록을 한 번에 숫자로 변환 (변환 불가 값은 NaN).
+    컬럼별 pd.to_numeric 결과와 동일한 dtype/값: 모든 값이 정수로 파싱된 컬럼만 int64로 유지.
+    이미 숫자형인 컬럼은 그대로 두고 object 컬럼만 모아서 변환한다.
     """
-    file_path_obj = Path(file_path)
-    file_ext = file_path_obj.suffix.lower()
-    
-    # 파일 확장자에 따라 읽기
-    if file_ext == '.csv':
-        # CSV 파일 읽기 (인코딩 자동 감지 시도)
-        try:
-            df = pd.read_csv(file_path, header=None, encoding='utf-8')
-        except UnicodeDecodeError:
-            # UTF-8 실패 시 다른 인코딩 시도
-            try:
-                df = pd.read_csv(file_path, header=None, encoding='cp949')
-            except:
-                df = pd.read_csv(file_path, header=None, encoding='latin-1')
-    elif file_ext in ['.xlsx', '.xls']:
-        df = pd.read_excel(file_path, header=None)
+    object_cols = [col for col in block.columns if not pd.api.types.is_numeric_dtype(block[col])]
+    if not object_cols or len(block) == 0:
+        return block.apply(pd.to_numeric, errors='coerce')
+    shape = (len(block), len(object_cols))
+    raw = block[object_cols].to_numpy(dtype=object)
+    parsed = pd.to_numeric(raw.ravel(), errors='coerce')
+    if parsed.dtype.kind == 'i':
+        # 모든 값이 int64 정수 → 컬럼별로 변환해도 int64
+        columns = parsed.reshape(shape)
+        converted = {col: columns[:, i] for i, col in enumerate(object_cols)}
     else:
-        raise ValueError(f"지원하지 않는 파일 형식입니다: {file_ext}. .xlsx, .xls, .csv만 지원합니다.")
-    
-    # Segments 행 찾기 (첫 번째 컬럼에 "Segments"가 포함된 행)
-    segments_row = None
-    for idx, row in df.iterrows():
-        if pd.notna(row[0]) and 'Segments' in str(row[0]) and str(row[0]).strip().startswith('Segments'):
-            segments_row = idx
-            break
-    
-    if segments_row is None:
-        raise ValueError("'Segments' 행을 찾을 수 없습니다. 파일 형식을 확인해주세요.")
-    
+        values = np.asarray(parsed, dtype=float).reshape(shape)
+        converted = {col: values[:, i] for i, col in enumerate(object_cols)}
+        # 빈 값 없이 정숫값인 컬럼은 정수 표기('1.0' 아닌 '1')일 때만 int64 → 원본 값으로 다시 판별
+        # (float를 거치면 2^53보다 큰 정수의 정밀도가 손실되므로 원본 값으로 변환)
+        with np.errstate(invalid='ignore'):
+            candidates = np.flatnonzero(~np.isnan(values).any(axis=0) & (values == np.round(values)).all(axis=0))
+        if len(candidates):
+            exact = pd.to_numeric(raw[:, candidates].ravel(), errors='coerce')
+            if exact.dtype.kind == 'i':
+                exact = exact.reshape(len(block), len(candidates))
+                for j, i in enumerate(candidates):
+                    converted[object_cols[i]] = exact[:, j]
+            else:
+                for i in candidates:
+                    converted[object_cols[i]] = pd.to_numeric(raw[:, i], errors='coerce')
+    data = {col: converted[col] if col in converted else block[col] for col in block.columns}
+    return pd.DataFrame(data, index=block.index)
+
+
+def _number_duplicate_labels(a_col):
+    """
+    중복된 메트릭명에 (2), (3) 번호 추가.
+    기존 (숫자) 접미사는 제거한 뒤 같은 이름끼리 등장 순서대로 번호를 다시 매김.
+    """
+    base = a_col.astype(str).str.strip().str.replace(r'\s*\(\d+\)\s*$', '', regex=True).str.strip()
+    occurrence = base.groupby(base, sort=False).cumcount() + 1
+    numbered = base + ' (' + occurrence.astype(str) + ')'
+    return base.where(occurrence == 1, numbered).tolist()
+
+def _peek_segments_header(reader):
+    """
+    1단계 읽기: 상단 HEADER_PEEK_ROWS행만 읽어 Segments 행을 찾는다.
+    Segments 행과 그 아래 샘플 행(SEGMENT_SAMPLE_ROWS)이 모두 포함될 때까지 읽는 행 수를 늘린다.
+    반환: (df, segments_row, fully_read) - fully_read가 True면 파일 전체를 이미 읽은 상태
+    """
+    nrows = HEADER_PEEK_ROWS
+    while True:
+        df = reader.read(nrows=nrows, dtype=object)
+        fully_read = len(df) < nrows
+        segments_row = locate_segments_row(df)
+        if fully_read or (segments_row is not None and len(df) > segments_row + SEGMENT_SAMPLE_ROWS):
+            return df, segments_row, fully_read
+        nrows *= 4
+
+
+def _needed_data_columns(segment_names, country_column_mapping):
+    """
+    2단계에서 읽을 컬럼 인덱스 집합 (A열 + 감지된 Control/Variation 컬럼).
+    세그먼트 컬럼을 감지하지 못했으면 None (순서 기반 세그먼트 매핑이 B열 이후를 쓰므로 전체 컬럼 읽기).
+    """
+    if not segment_names:
+        return None
+    letters = set(segment_names)
+    for mapping in country_column_mapping.values():
+        for _, control_col, variation_col in mapping or []:
+            letters.update([control_col, variation_col])
+    return {0} | {col_letter_to_index(letter) for letter in letters}
+
+
+def _read_data_region(reader, header_df, segments_row, needed_cols):
+    """
+    2단계 읽기: Segments 행 이후 데이터 영역을 필요한 컬럼만 읽는다 (needed_cols가 None이면 전체 컬럼).
+    읽지 않은 컬럼은 빈 값으로 채워 컬럼 위치(A, B, C, ...)를 그대로 유지한다.
+    """
+    data_start = segments_row + 1
+    if reader.is_csv:
+        # CSV는 빈 줄 처리 때문에 행 번호가 어긋날 수 있어 전체 행을 읽은 뒤 자름 (컬럼만 제한)
+        usecols = None
+        if needed_cols is not None:
+            usecols = sorted(col for col in needed_cols if col < len(header_df.columns))
+        data = reader.read(usecols=usecols).iloc[data_start:]
+    else:
+        # 데이터 영역이 헤더보다 좁을 수 있으므로 범위를 벗어난 인덱스는 무시하도록 callable로 지정.
+        # 헤더 행 없이 읽으면 dtype 추론이 전체 읽기와 달라지므로(int → float) object로 읽고 이후 일괄 변환
+        usecols = needed_cols.__contains__ if needed_cols is not None else None
+        data = reader.read(skiprows=data_start, usecols=usecols, dtype=object)
+    data.index = pd.RangeIndex(data_start, data_start + len(data))
+    if needed_cols is not None or len(data.columns) < len(header_df.columns):
+        data = data.reindex(columns=header_df.columns)
+    return data
+
+
+def _csv_stream_threshold_bytes():
+    try:
+        min_mb = float(os.getenv('CSV_STREAM_MIN_MB', CSV_STREAM_DEFAULT_MIN_MB))
+    except ValueError:
+        min_mb = CSV_STREAM_DEFAULT_MIN_MB
+    return int(min_mb * 1024 * 1024)
+
+
+def _stream_csv_data_region(reader, header_df, segments_row, needed_cols):
+    """
+    대용량 CSV용 2단계 읽기: 데이터 영역을 CSV_STREAM_CHUNK_ROWS행씩 읽으면서
+    청크마다 주석/구분선/빈 행을 버리고 B열 이후를 숫자로 변환한다.
+    파일 전체를 object 프레임으로 올리지 않으므로 메모리는 결과 크기 + 청크 하나로 제한된다.
+    중간에 디코딩이 실패하면(판별 범위 뒤쪽에만 다른 인코딩 문자가 있는 경우) 다음 인코딩으로 처음부터 다시 읽는다.
+    반환: (data, raw_head) - raw_head는 국가 감지용 데이터 앞부분 원본 행 (COUNTRY_SCAN_ROWS행)
+    """
+    usecols = None
+    if needed_cols is not None:
+        usecols = sorted(col for col in needed_cols if col < len(header_df.columns))
+    attempts = reader.csv_decode_attempts()
+    for attempt, (encoding, errors) in enumerate(attempts):
+        chunks = reader.read_csv_chunks(CSV_STREAM_CHUNK_ROWS, encoding, errors, usecols=usecols, dtype=object)
+        try:
+            data, raw_head = _collect_csv_chunks(chunks, header_df, segments_row + 1)
+        except UnicodeDecodeError as e:
+            if attempt == len(attempts) - 1:
+                raise
+            print(f"DEBUG: CSV 디코딩 실패 ({encoding}), 다른 인코딩으로 다시 스트리밍: {e}")
+            continue
+        # 읽지 않은 컬럼은 마지막에 한 번만 빈 값으로 채워 컬럼 위치 유지
+        if needed_cols is not None:
+            data = data.reindex(columns=header_df.columns)
+            raw_head = raw_head.reindex(columns=header_df.columns)
+        return data, raw_head
+
+
+def _collect_csv_chunks(chunks, header_df, data_start):
+    """_stream_csv_data_region의 청크 필터링·숫자 변환. 반환: (data, raw_head)"""
+    parts = []
+    raw_head = []
+    raw_rows = 0
+    chunk = None
+    # 헤더 미리보기와 같은 행 번호를 쓰도록 skiprows 없이 처음부터 읽고 데이터 시작 전 행은 버림
+    for chunk in chunks:
+        chunk = chunk[chunk.index >= data_start]
+        if raw_rows < COUNTRY_SCAN_ROWS:
+            raw_head.append(chunk.iloc[:COUNTRY_SCAN_ROWS - raw_rows])
+            raw_rows += len(raw_head[-1])
+        chunk = chunk[_valid_metric_row_mask(chunk.iloc[:, 0])]
+        if len(chunk) == 0:
+            continue
+        # 청크별 정수/실수 판정은 concat 시 전체 기준(빈 값·소수가 하나라도 있으면 float)과 같아짐
+        parts.append(pd.concat([chunk.iloc[:, :1], _coerce_numeric_block(chunk.iloc[:, 1:])], axis=1))
+    if not parts:
+        empty = chunk.iloc[:0] if chunk is not None else header_df.iloc[:0]
+        parts = [pd.concat([empty.iloc[:, :1], _coerce_numeric_block(empty.iloc[:, 1:])], axis=1)]
+    data = pd.concat(parts)
+    raw_head = pd.concat(raw_head) if raw_head else data.iloc[:0]
+    return data, raw_head
+
+
+def build_country_column_mapping(df, segments_row, countries):
+    """
+    세그먼트 이름 행(Segments 행 - 2)에서 국가 코드를 찾아 국가별 컬럼 매핑 생성.
+    반환: {country: [(segment_name, control_col, variation_col), ...]}
+    """
+    country_column_mapping = {}
+    segment_name_row_idx = segments_row - 2
+    if segment_name_row_idx < 0:
+        return country_column_mapping
+    segment_name_row = df.iloc[segment_name_row_idx]
+    # Control 컬럼(B, D, F, ...) 헤더를 한 번에 스캔 (Variation 컬럼이 있는 쌍만)
+    n_cols = len(segment_name_row)
+    control_values = segment_name_row.iloc[1:n_cols - 1:2]
+    control_codes = COUNTRY_MATCHER.match_cells(control_values.tolist())
+
+    for offset, (control_col_value, country_code) in enumerate(zip(control_values, control_codes)):
+        col_idx = 1 + offset * 2
+        if country_code is None or country_code not in countries:
+            continue
+        # 세그먼트 이름 추출 (국가 코드 제거)
+        control_value_str = str(control_col_value).strip().upper()
+        segment_name = control_value_str.replace(country_code, '').strip()
+        if not segment_name:
+            segment_name = 'All'
+        country_column_mapping.setdefault(country_code, []).append(
+            (segment_name, col_index_to_letter(col_idx), col_index_to_letter(col_idx + 1))
+        )
+    return country_column_mapping
+
+
+_layout_cache = None
+_layout_cache_lock = threading.Lock()
+
+
+def get_layout_cache():
+    """
+    헤더 레이아웃 지문 캐시 (프로세스당 하나). 환경변수 LAYOUT_CACHE=0이면 None.
+    캐시 위치: LAYOUT_CACHE_PATH (기본: 프로젝트 tmp/layout_cache.json)
+    """
+    global _layout_cache
+    if os.getenv('LAYOUT_CACHE', '1') == '0':
+        return None
+    with _layout_cache_lock:
+        if _layout_cache is None:
+            cache_path = os.getenv('LAYOUT_CACHE_PATH') or (Path(__file__).parent.parent / 'tmp' / 'layout_cache.json')
+            _layout_cache = LayoutCache(cache_path, LAYOUT_CACHE_MAX_ENTRIES)
+        return _layout_cache
+
+
+def _header_layout_fingerprint(df, segments_row):
+    """세그먼트/국가 감지가 읽는 입력만으로 만든 레이아웃 지문 (날짜 등 주석 행은 제외)"""
+    header_idx = [segments_row + offset for offset in (-2, -1, 0) if segments_row + offset >= 0]
+    header = df.iloc[header_idx]
+    header_texts = header.where(header.notna(), '').astype(str).apply(lambda col: col.str.strip()).values.tolist()
+    numeric_mask = _SegmentHeaderMatrix._numeric_mask(df, segments_row + 1, SEGMENT_SAMPLE_ROWS)
+    return layout_fingerprint(PARSER_VERSION, header_texts, numeric_mask, segments_row)
+
+
+def resolve_header_layout(df, segments_row):
+    """
+    세그먼트 컬럼 위치와 B열 국가 코드 감지.
+    반환: (segment_names, countries_from_b, country_column_mapping)
+    country_column_mapping은 여러 국가일 때만 채워짐 (단일 국가 매핑은 parse_excel에서 추가).
+    레이아웃 캐시에 같은 지문이 있으면 감지를 건너뛰고 저장된 결과를 사용한다.
+    """
+    layout_cache = get_layout_cache()
+    fingerprint = None
+    if layout_cache is not None:
+        fingerprint = _header_layout_fingerprint(df, segments_row)
+        layout = layout_cache.get(fingerprint)
+        print(f"DEBUG: 레이아웃 캐시 {'적중' if layout else '미스'} ({layout_cache.hit_rate_summary()})")
+        if layout:
+            mapping = {
+                code: [tuple(entry) for entry in entries]
+                for code, entries in layout['country_column_mapping'].items()
+            }
+            countries_from_b = list(layout['countries_from_b']) if layout['countries_from_b'] else None
+            return dict(layout['segment_names']), countries_from_b, mapping
+
     # B열 이후 헤더를 스캔하여 세그먼트 컬럼 위치를 동적으로 감지
     segment_names = scan_segment_columns_from_excel(df, segments_row)
-    
-    # B열에서 국가 코드 감지
+    # B열에서 국가 코드 감지, 여러 국가이면 국가별 컬럼 매핑 생성
     countries_from_b = detect_countries_from_b_column(df, segments_row)
+    country_column_mapping = build_country_column_mapping(df, segments_row, countries_from_b) if countries_from_b else {}
+
+    if layout_cache is not None:
+        layout_cache.put(fingerprint, {
+            'segment_names': segment_names,
+            'countries_from_b': countries_from_b,
+            'country_column_mapping': {code: [list(entry) for entry in entries]
+                                       for code, entries in country_column_mapping.items()},
+        })
+    return segment_names, countries_from_b, country_column_mapping
+
+
+def parse_excel(file_path, full_width=False):
+    """
+    Excel 또는 CSV 파일 파싱
+    - A열: 메트릭 이름
+    - B열 이후: 세그먼트 Control/Variation 컬럼 (위치는 파일마다 다를 수 있음, 헤더에서 동적 감지)
+    - full_width=False면 긴 파일은 A열과 감지된 세그먼트 컬럼 값만 읽음 (나머지 컬럼은 빈 값).
+      전체 컬럼을 읽었는지는 data_df.attrs['full_width']에 기록 (파싱 데이터 내보내기는 True로 다시 파싱)
+    """
+    with WorkbookReader(file_path) as reader:
+        # 1단계: 상단 행만 읽어 Segments 행과 헤더 확인
+        df, segments_row, fully_read = _peek_segments_header(reader)
+        
+        if segments_row is None:
+            raise ValueError("'Segments' 행을 찾을 수 없습니다. 파일 형식을 확인해주세요.")
+        
+        # 세그먼트 컬럼 위치·국가 감지 (같은 헤더 레이아웃이면 이전 감지 결과 재사용)
+        segment_names, countries_from_b, country_column_mapping = resolve_header_layout(df, segments_row)
+        
+        # B열에 국가 코드가 있으면 여러 국가 테스트
+        is_multi_country = bool(countries_from_b)
+        if is_multi_country:
+            countries = countries_from_b
+            country = countries[0] if countries else 'UK'  # 기본값으로 첫 번째 국가 사용
+        
+        # 2단계: 데이터 영역은 A열과 감지된 Control/Variation 컬럼만 읽기
+        # 실제 데이터는 Segments 행 다음 행부터 시작
+        data_start = segments_row + 1
+        streamed = False
+        needed_cols = None if full_width else _needed_data_columns(segment_names, country_column_mapping)
+        if fully_read:
+            needed_cols = None
+            data_df = df.iloc[data_start:].copy()
+        elif reader.is_csv and os.path.getsize(file_path) >= _csv_stream_threshold_bytes():
+            # 대용량 CSV: 청크 단위로 필터링·숫자 변환 (아래 필터/변환 단계는 결과를 그대로 유지)
+            print(f"DEBUG: 대용량 CSV 스트리밍 파싱 ({os.path.getsize(file_path) / 1024 / 1024:.0f}MB)")
+            data_df, raw_head = _stream_csv_data_region(reader, df, segments_row, needed_cols)
+            df = pd.concat([df.iloc[:data_start], raw_head])
+            streamed = True
+        else:
+            data_df = _read_data_region(reader, df, segments_row, needed_cols)
+            # 국가 감지(Visits 행 하단 텍스트)용으로 헤더 + 데이터 앞부분만 이어 붙임
+            df = pd.concat([df.iloc[:data_start], data_df.iloc[:COUNTRY_SCAN_ROWS]])
     
-    # 국가별 컬럼 매핑 생성
-    country_column_mapping = {}  # {country: [(segment_name, control_col, variation_col), ...]}
-    
-    # 국가 추출: B열에 국가 코드가 없으면 기존 방법 사용
-    if countries_from_b is None or len(countries_from_b) == 0:
+    # 국가 추출: B열에 국가 코드가 없으면 기존 방법 사용 (Visits 행 하단 텍스트)
+    if not is_multi_country:
         # B열에 국가 코드가 없으면 단일 국가 테스트
         country = detect_country_from_excel(df, segments_row)
-        is_multi_country = False
         countries = [country]
         # 단일 국가인 경우 기존 세그먼트 매핑 사용
         country_column_mapping[country] = None  # None이면 기본 세그먼트 매핑 사용
-    else:
-        # B열에 국가 코드가 있으면 여러 국가 테스트
-        is_multi_country = True
-        countries = countries_from_b
-        country = countries[0] if countries else 'UK'  # 기본값으로 첫 번째 국가 사용
-        
-        # 각 국가별로 컬럼 매핑 생성
-        # 세그먼트 이름 행에서 국가 코드를 찾아 컬럼 매핑
-        segment_name_row_idx = segments_row - 2
-        if segment_name_row_idx >= 0:
-            segment_name_row = df.iloc[segment_name_row_idx]
-            col_letters = ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'I', 'J', 'K', 'L', 'M', 'N', 'O', 'P', 'Q', 'R', 'S', 'T']
-            common_countries = ['N_AFRICA', 'AFRICA_EN', 'AFRICA_PT', 'AFRICA_FR', 'EG', 'ZA', 'AU', 'CN', 'HK', 'HK_EN', 'TW', 
-                               'IN', 'ID', 'JP', 'SEC', 'MY', 'MM', 'NZ', 'PH', 'SG', 'TH', 'VN', 'BD', 'MN', 'AL', 'AT', 'AZ', 
-                               'BE', 'BE_FR', 'BG', 'BA', 'HR', 'CZ', 'DK', 'EE', 'FI', 'FR', 'DE', 'GR', 'HU', 'IE', 'IL', 'IT', 
-                               'KZ_KZ', 'KZ_RU', 'LV', 'LT', 'NL', 'NO', 'MK', 'PL', 'PT', 'RO', 'RS', 'SK', 'SI', 'ES', 'SE', 
-                               'CH', 'CH_FR', 'TR', 'UA', 'UK', 'UZ_UZ', 'UZ_RU', 'GE', 'AR', 'LATIN_EN', 'LATIN', 'BR', 'CL', 
-                               'CO', 'MX', 'PE', 'PY', 'UY', 'PK', 'AE_AR', 'AE', 'IRAN', 'LEVANT', 'LEVANT_AR', 'SA', 'SA_EN', 
-                               'IQ_AR', 'IQ_KU', 'KB', 'CA', 'CA_FR', 'US', 'PS']
-            
-            col_idx = 1  # B열부터 시작
-            max_cols = min(len(segment_name_row), 50)
-            
-            while col_idx < max_cols:
-                control_col_value = segment_name_row.iloc[col_idx] if col_idx < len(segment_name_row) else None
-                
-                if pd.notna(control_col_value):
-                    control_value_str = str(control_col_value).strip().upper()
-                    
-                    # 국가 코드 찾기
-                    for country_code in countries:
-                        if (control_value_str == country_code or 
-                            country_code in control_value_str or 
-                            control_value_str in country_code):
-                            # 해당 국가의 컬럼 매핑 생성
-                            if country_code not in country_column_mapping:
-                                country_column_mapping[country_code] = []
-                            
-                            control_col = col_letters[col_idx] if col_idx < len(col_letters) else None
-                            variation_col = col_letters[col_idx + 1] if col_idx + 1 < len(col_letters) else None
-                            
-                            if control_col and variation_col:
-                                # 세그먼트 이름 추출 (국가 코드 제거)
-                                segment_name = control_value_str.replace(country_code, '').strip()
-                                if not segment_name:
-                                    segment_name = 'All'
-                                
-                                country_column_mapping[country_code].append((segment_name, control_col, variation_col))
-                            break
-                
-                col_idx += 2  # 다음 Control-Variation 쌍으로 이동
-    
-    # 실제 데이터는 Segments 행 다음 행부터 시작
-    data_start = segments_row + 1
-    data_df = df.iloc[data_start:].copy()
     
     # 컬럼 이름 설정 (A: 메트릭 이름, B부터는 값들)
     max_cols = max(len(data_df.columns), 20)  # 충분한 컬럼 확보
-    col_names = ['A'] + [chr(66 + i) for i in range(max_cols - 1)]  # A, B, C, D, ...
+    col_names = column_labels(max_cols)  # A, B, ..., Z, AA, AB, ...
     if len(data_df.columns) < len(col_names):
         # 부족한 컬럼 추가
         for i in range(len(data_df.columns), len(col_names)):
@@ -256,54 +728,23 @@ def parse_excel(file_path):
     data_df.attrs['is_multi_country'] = is_multi_country
     data_df.attrs['countries'] = countries
     data_df.attrs['country_column_mapping'] = country_column_mapping
+    data_df.attrs['full_width'] = needed_cols is None
     
     # 빈 행 제거 (A열이 비어있거나 주석인 행 제거)
-    def is_valid_row(row):
-        a_val = str(row['A']) if pd.notna(row['A']) else ''
-        a_clean = a_val.strip()
-        # 주석이나 구분선 행 제거
-        if (a_clean.startswith('#') or a_clean.startswith('=') or 
-            '====' in a_val or '####' in a_val or a_clean == ''):
-            return False
-        return True
-    
-    data_df = data_df[data_df.apply(is_valid_row, axis=1)]
-    
-    # 숫자 컬럼(B부터)의 데이터 타입 변환
+    # 스트리밍 파싱은 청크 단위로 이미 제거·변환했으므로 아직 숫자형이 아닌(추가된 빈) 컬럼만 변환
+    if not streamed:
+        data_df = data_df[_valid_metric_row_mask(data_df['A'])]
+    
+    # 숫자 컬럼(B부터)의 데이터 타입 변환 (블록 단위 일괄 변환)
     numeric_cols = [col for col in data_df.columns if col != 'A']
-    for col in numeric_cols:
-        data_df[col] = pd.to_numeric(data_df[col], errors='coerce')
+    if streamed:
+        numeric_cols = [col for col in numeric_cols if not pd.api.types.is_numeric_dtype(data_df[col])]
+    if numeric_cols:
+        data_df[numeric_cols] = _coerce_numeric_block(data_df[numeric_cols])
     
     # 중복된 세그먼트명(메트릭명) 처리: (2), (3) 같은 번호 추가
     if len(data_df) > 0:
-        import re
-        # A열의 값들을 문자열로 변환하여 비교
-        a_values = data_df['A'].astype(str)
-        # 중복 카운트를 위한 딕셔너리
-        name_counts = {}
-        new_a_values = []
-        
-        for idx, value in a_values.items():
-            # 원본 값 (괄호와 번호 제거)
-            clean_value = str(value).strip()
-            # 이미 (숫자) 형식이 있으면 제거
-            clean_value = re.sub(r'\s*\(\d+\)\s*$', '', clean_value).strip()
-            
-            # 중복 카운트
-            if clean_value not in name_counts:
-                name_counts[clean_value] = 0
-            
-            name_counts[clean_value] += 1
-            count = name_counts[clean_value]
-            
-            # 첫 번째는 그대로, 두 번째부터는 (2), (3) 추가
-            if count == 1:
-                new_a_values.append(clean_value)
-            else:
-                new_a_values.append(f"{clean_value} ({count})")
-        
-        # A열 업데이트
-        data_df['A'] = new_a_values
+        data_df['A'] = _number_duplicate_labels(data_df['A'])
     
     return data_df, segment_names, country, is_multi_country, countries
 
@@ -315,14 +756,6 @@ def detect_countries_from_b_column(df, segments_row):
     
     여러 국가인 경우, 각 컬럼 쌍(B-C, D-E, F-G, ...)이 국가별로 구성될 수 있음
     """
-    common_countries = ['N_AFRICA', 'AFRICA_EN', 'AFRICA_PT', 'AFRICA_FR', 'EG', 'ZA', 'AU', 'CN', 'HK', 'HK_EN', 'TW', 
-                       'IN', 'ID', 'JP', 'SEC', 'MY', 'MM', 'NZ', 'PH', 'SG', 'TH', 'VN', 'BD', 'MN', 'AL', 'AT', 'AZ', 
-                       'BE', 'BE_FR', 'BG', 'BA', 'HR', 'CZ', 'DK', 'EE', 'FI', 'FR', 'DE', 'GR', 'HU', 'IE', 'IL', 'IT', 
-                       'KZ_KZ', 'KZ_RU', 'LV', 'LT', 'NL', 'NO', 'MK', 'PL', 'PT', 'RO', 'RS', 'SK', 'SI', 'ES', 'SE', 
-                       'CH', 'CH_FR', 'TR', 'UA', 'UK', 'UZ_UZ', 'UZ_RU', 'GE', 'AR', 'LATIN_EN', 'LATIN', 'BR', 'CL', 
-                       'CO', 'MX', 'PE', 'PY', 'UY', 'PK', 'AE_AR', 'AE', 'IRAN', 'LEVANT', 'LEVANT_AR', 'SA', 'SA_EN', 
-                       'IQ_AR', 'IQ_KU', 'KB', 'CA', 'CA_FR', 'US', 'PS']
-    
     detected_countries = []
     
     # 세그먼트 이름 행 (segments_row - 2)에서 각 컬럼 확인
@@ -330,27 +763,10 @@ def detect_countries_from_b_column(df, segments_row):
     if segment_name_row_idx >= 0:
         segment_name_row = df.iloc[segment_name_row_idx]
         
-        # B열부터 시작하여 Control-Variation 쌍으로 확인 (B-C, D-E, F-G, ...)
-        col_idx = 1  # B열은 인덱스 1
-        max_cols = min(len(segment_name_row), 50)  # 최대 50개 컬럼까지 확인
-        
-        while col_idx < max_cols:
-            # Control 컬럼 (B, D, F, ...)
-            control_col_value = segment_name_row.iloc[col_idx] if col_idx < len(segment_name_row) else None
-            
-            if pd.notna(control_col_value):
-                control_value_str = str(control_col_value).strip().upper()
-                
-                # 국가 코드인지 확인
-                for country_code in common_countries:
-                    if (control_value_str == country_code or 
-                        country_code in control_value_str or 
-                        control_value_str in country_code):
-                        if country_code not in detected_countries:
-                            detected_countries.append(country_code)
-                        break
-            
-            col_idx += 2  # 다음 Control-Variation 쌍으로 이동
+        # B열부터 Control-Variation 쌍의 Control 컬럼(B, D, F, ...)만 확인 (헤더 행 전체를 한 번에 스캔)
+        for country_code in COUNTRY_MATCHER.match_cells(segment_name_row.iloc[1::2].tolist()):
+            if country_code is not None and country_code not in detected_countries:
+                detected_countries.append(country_code)
     
     if detected_countries:
         return detected_countries
@@ -375,38 +791,15 @@ def detect_country_from_excel(df, segments_row):
     
     # Visits 행 하단에서 국가 추출 (Visits 행 아래 몇 행 확인)
     if visits_row_idx is not None:
-        # Site code 리스트
-        common_countries = ['N_AFRICA', 'AFRICA_EN', 'AFRICA_PT', 'AFRICA_FR', 'EG', 'ZA', 'AU', 'CN', 'HK', 'HK_EN', 'TW', 
-                           'IN', 'ID', 'JP', 'SEC', 'MY', 'MM', 'NZ', 'PH', 'SG', 'TH', 'VN', 'BD', 'MN', 'AL', 'AT', 'AZ', 
-                           'BE', 'BE_FR', 'BG', 'BA', 'HR', 'CZ', 'DK', 'EE', 'FI', 'FR', 'DE', 'GR', 'HU', 'IE', 'IL', 'IT', 
-                           'KZ_KZ', 'KZ_RU', 'LV', 'LT', 'NL', 'NO', 'MK', 'PL', 'PT', 'RO', 'RS', 'SK', 'SI', 'ES', 'SE', 
-                           'CH', 'CH_FR', 'TR', 'UA', 'UK', 'UZ_UZ', 'UZ_RU', 'GE', 'AR', 'LATIN_EN', 'LATIN', 'BR', 'CL', 
-                           'CO', 'MX', 'PE', 'PY', 'UY', 'PK', 'AE_AR', 'AE', 'IRAN', 'LEVANT', 'LEVANT_AR', 'SA', 'SA_EN', 
-                           'IQ_AR', 'IQ_KU', 'KB', 'CA', 'CA_FR', 'US', 'PS']
-        
-        # Visits 행 아래 1-5행 확인
-        for check_idx in range(visits_row_idx + 1, min(visits_row_idx + 6, len(df))):
-            check_row = df.iloc[check_idx]
-            # 첫 번째 컬럼(A열)에서 국가 코드 찾기
-            if pd.notna(check_row[0]):
-                text = str(check_row[0]).strip().upper()
-                # 리스트에서 정확히 일치하는 국가 코드 찾기
-                for country_code in common_countries:
-                    if text == country_code or country_code in text or text in country_code:
-                        return country_code
+        # Visits 행 아래 1-5행의 첫 번째 컬럼(A열)에서 국가 코드 찾기
+        check_values = df.iloc[visits_row_idx + 1:visits_row_idx + 6, 0].tolist()
+        for country_code in COUNTRY_MATCHER.match_cells(check_values):
+            if country_code is not None:
+                return country_code
     
     return 'UK'  # 기본값
 
 
-def col_index_to_letter(col_idx):
-    """0-based 컬럼 인덱스를 Excel 컬럼 문자로 변환 (0=A, 1=B, ...)"""
-    if col_idx < 26:
-        return chr(65 + col_idx)
-    first = (col_idx - 26) // 26
-    second = (col_idx - 26) % 26
-    return chr(65 + first) + chr(65 + second)
-
-
 def extract_segment_name_from_header(cell_value):
     """헤더 셀에서 세그먼트 이름 추출 (Control/Variation 접미사 제거)"""
     if pd.isna(cell_value):
@@ -422,43 +815,72 @@ def extract_segment_name_from_header(cell_value):
     return text.strip()
 
 
-def _header_cell_texts(header_rows, col_idx):
-    """여러 헤더 행에서 해당 컬럼의 텍스트 목록 반환"""
-    texts = []
-    for row in header_rows:
-        if col_idx < len(row) and pd.notna(row.iloc[col_idx]):
-            text = str(row.iloc[col_idx]).strip()
-            if text and text.lower() not in ['nan', 'none']:
-                texts.append(text)
-    return texts
+class _SegmentHeaderMatrix:
+    """
+    scan_segment_columns_from_excel용 시트 단위 사전 계산 결과.
+    헤더 3행(Segments 행과 위 2행)의 컬럼별 텍스트, Control/Variation 키워드 여부,
+    첫 헤더 텍스트의 세그먼트 이름, Segments 행 아래 샘플 데이터의 숫자 여부를 한 번에 구해 두고
+    감지 패턴에서는 인덱스 조회만 한다. 범위를 벗어난 컬럼은 빈 텍스트/False.
+    """
 
+    def __init__(self, df, segments_row, sample_rows=SEGMENT_SAMPLE_ROWS):
+        self.n_cols = len(df.columns)
+        header_idx = [segments_row + offset for offset in (-2, -1, 0) if segments_row + offset >= 0]
+        header = df.iloc[header_idx].to_numpy(dtype=object)
+        shape = header.shape
+
+        # 헤더 텍스트 행렬 (빈 값·'nan'·'none'은 제외)
+        cells = pd.Series(header.ravel())
+        texts = cells.astype(str).str.strip()
+        lower = texts.str.lower()
+        valid = (cells.notna() & (texts != '') & ~lower.isin(['nan', 'none'])).to_numpy().reshape(shape)
+        texts = texts.to_numpy(dtype=object).reshape(shape)
+        control = lower.str.contains('control', regex=False).to_numpy().reshape(shape) & valid
+        variation = lower.str.contains('variation', regex=False).to_numpy().reshape(shape) & valid
+
+        self.texts = [texts[valid[:, col], col].tolist() for col in range(self.n_cols)]
+        self.is_control = control.any(axis=0)
+        self.is_variation = variation.any(axis=0)
+        self.names = [extract_segment_name_from_header(t[0]) if t else '' for t in self.texts]
+        self.is_numeric = self._numeric_mask(df, segments_row + 1, sample_rows)
+
+    @staticmethod
+    def _numeric_mask(df, data_start, sample_rows):
+        """샘플 행의 비어있지 않은 값 중 절반 이상이 숫자(콤마·공백 제거 후 float 변환 가능)인 컬럼"""
+        values = df.iloc[data_start:data_start + sample_rows].to_numpy(dtype=object)
+        present = pd.notna(values)
+        cleaned = (
+            pd.Series(values.ravel(), dtype=object).astype(str)
+            .str.replace(',', '', regex=False).str.replace(' ', '', regex=False).str.strip()
+        )
+        parsed = pd.to_numeric(cleaned, errors='coerce').notna().to_numpy().copy()
+        # to_numeric이 NaN으로 보는 float() 허용 표기('nan', 'inf', '1_000' 등)는 개별 확인
+        flat_present = present.ravel()
+        for i in np.flatnonzero(~parsed & flat_present):
+            try:
+                float(cleaned.iat[i])
+            except ValueError:
+                continue
+            parsed[i] = True
+        numeric = (parsed & flat_present).reshape(values.shape)
+        total = present.sum(axis=0)
+        return (total > 0) & (numeric.sum(axis=0) * 2 >= total)
 
-def _is_control_header(texts):
-    return any('control' in t.lower() for t in texts)
+    def _in_range(self, col_idx):
+        return 0 <= col_idx < self.n_cols
 
+    def segment_name(self, col_idx):
+        """첫 헤더 텍스트에서 추출한 세그먼트 이름"""
+        return self.names[col_idx] if self._in_range(col_idx) else ''
 
-def _is_variation_header(texts):
-    return any('variation' in t.lower() for t in texts)
+    def control(self, col_idx):
+        return self._in_range(col_idx) and bool(self.is_control[col_idx])
 
+    def variation(self, col_idx):
+        return self._in_range(col_idx) and bool(self.is_variation[col_idx])
 
-def _looks_like_numeric_data_column(df, segments_row, col_idx, sample_rows=8):
-    """Segments 행 이후 샘플 데이터가 숫자형인지 확인"""
-    data_start = segments_row + 1
-    total = 0
-    numeric = 0
-    for idx in range(data_start, min(data_start + sample_rows, len(df))):
-        if col_idx >= len(df.columns):
-            break
-        val = df.iloc[idx, col_idx]
-        if pd.isna(val):
-            continue
-        total += 1
-        try:
-            float(str(val).replace(',', '').replace(' ', '').strip())
-            numeric += 1
-        except (ValueError, TypeError):
-            pass
-    return total > 0 and numeric / total >= 0.5
+    def numeric(self, col_idx):
+        return self._in_range(col_idx) and bool(self.is_numeric[col_idx])
 
 
 def segment_names_exact_match(user_name, detected_name):
@@ -474,39 +896,29 @@ def scan_segment_columns_from_excel(df, segments_row, variation_count=1):
     반환: {'D': 'All Visits', 'E': 'All Visits', 'F': 'MO Device', ...}
     """
     segment_names = {}
-    header_rows = []
-    for offset in [-2, -1, 0]:
-        row_idx = segments_row + offset
-        if row_idx >= 0:
-            header_rows.append(df.iloc[row_idx])
-    if not header_rows:
+    if segments_row < 0 or len(df.columns) == 0:
         return segment_names
+    matrix = _SegmentHeaderMatrix(df, segments_row)
 
-    max_cols = max(len(row) for row in header_rows)
+    max_cols = matrix.n_cols
     col_idx = SEGMENT_SCAN_START_COL_IDX
     group_size = 1 + variation_count
 
     while col_idx + variation_count < max_cols:
-        control_texts = _header_cell_texts(header_rows, col_idx)
-        variation_texts = _header_cell_texts(header_rows, col_idx + 1) if variation_count == 1 else []
         seg_name = None
         matched = False
 
         # 패턴 1: Control / Variation 키워드가 명시된 컬럼 쌍
-        if variation_count == 1 and _is_control_header(control_texts) and _is_variation_header(variation_texts):
-            seg_name = (
-                extract_segment_name_from_header(control_texts[0] if control_texts else '')
-                or extract_segment_name_from_header(variation_texts[0] if variation_texts else '')
-            )
+        if variation_count == 1 and matrix.control(col_idx) and matrix.variation(col_idx + 1):
+            seg_name = matrix.segment_name(col_idx) or matrix.segment_name(col_idx + 1)
             matched = True
 
         # 패턴 2: 인접 컬럼에 동일한 세그먼트 이름 (Control/Variation 키워드 없는 순수 라벨 쌍)
         if not matched and variation_count == 1:
-            n1 = extract_segment_name_from_header(control_texts[0] if control_texts else '')
-            n2 = extract_segment_name_from_header(variation_texts[0] if variation_texts else '')
-            neither_cv = (
-                not _is_control_header(control_texts) and not _is_variation_header(control_texts)
-                and not _is_control_header(variation_texts) and not _is_variation_header(variation_texts)
+            n1 = matrix.segment_name(col_idx)
+            n2 = matrix.segment_name(col_idx + 1)
+            neither_cv = not any(
+                matrix.control(idx) or matrix.variation(idx) for idx in (col_idx, col_idx + 1)
             )
             if n1 and n2 and segment_names_exact_match(n1, n2) and neither_cv:
                 seg_name = n1
@@ -514,37 +926,27 @@ def scan_segment_columns_from_excel(df, segments_row, variation_count=1):
 
         # 패턴 3: 왼쪽 열에 세그먼트 라벨, 현재 열부터 Control/Variation 데이터
         if not matched and variation_count == 1 and col_idx > SEGMENT_SCAN_START_COL_IDX:
-            label_texts = _header_cell_texts(header_rows, col_idx - 1)
-            label_name = extract_segment_name_from_header(label_texts[0] if label_texts else '')
-            label_is_plain = not _is_control_header(label_texts) and not _is_variation_header(label_texts)
-            has_cv_marker = _is_control_header(control_texts) or _is_variation_header(variation_texts)
-            has_numeric_pair = (
-                _looks_like_numeric_data_column(df, segments_row, col_idx)
-                and _looks_like_numeric_data_column(df, segments_row, col_idx + 1)
-            )
+            label_name = matrix.segment_name(col_idx - 1)
+            label_is_plain = not matrix.control(col_idx - 1) and not matrix.variation(col_idx - 1)
+            has_cv_marker = matrix.control(col_idx) or matrix.variation(col_idx + 1)
+            has_numeric_pair = matrix.numeric(col_idx) and matrix.numeric(col_idx + 1)
             if label_name and label_is_plain and (has_cv_marker or has_numeric_pair):
                 seg_name = label_name
                 matched = True
 
         # 패턴 4: variation_count > 1 — Control 열 + 연속 Variation 열
-        if not matched and variation_count > 1 and _is_control_header(control_texts):
-            seg_name = extract_segment_name_from_header(control_texts[0] if control_texts else '')
-            var_headers_ok = all(
-                _is_variation_header(_header_cell_texts(header_rows, col_idx + vi))
-                for vi in range(1, variation_count + 1)
-            )
+        if not matched and variation_count > 1 and matrix.control(col_idx):
+            seg_name = matrix.segment_name(col_idx)
+            var_headers_ok = all(matrix.variation(col_idx + vi) for vi in range(1, variation_count + 1))
             if seg_name and var_headers_ok:
                 matched = True
 
         # 패턴 5: 헤더 없이 숫자 데이터만 있는 연속 컬럼 (메타데이터 열 제외)
         if not matched and variation_count == 1:
-            if (
-                _looks_like_numeric_data_column(df, segments_row, col_idx)
-                and _looks_like_numeric_data_column(df, segments_row, col_idx + 1)
-            ):
+            if matrix.numeric(col_idx) and matrix.numeric(col_idx + 1):
                 seg_name = (
-                    extract_segment_name_from_header(control_texts[0] if control_texts else '')
-                    or extract_segment_name_from_header(variation_texts[0] if variation_texts else '')
+                    matrix.segment_name(col_idx)
+                    or matrix.segment_name(col_idx + 1)
                     or f'Segment {len(segment_names) // 2 + 1}'
                 )
                 matched = True
@@ -578,7 +980,7 @@ def build_segment_pairs_from_names(segment_names, variation_count=1):
 
     col_order = sorted(
         segment_names.keys(),
-        key=lambda c: sum((ord(ch) - 64) * (26 ** i) for i, ch in enumerate(reversed(c)))
+        key=col_letter_to_index
     )
 
     pairs = []
@@ -649,11 +1051,12 @@ def match_user_segments_to_excel(user_segments, segment_names, variation_count=1
     return segments
 
 
-def detect_segments_from_user_input(user_segments, variation_count=1, segment_names=None):
+def detect_segments_from_user_input(user_segments, variation_count=1, segment_names=None, column_count=None):
     """
     사용자 입력 세그먼트를 Excel 헤더에서 동적으로 찾아 컬럼 매핑 생성.
     segment_names가 제공되면 Excel 헤더 탐색 결과와 이름 매칭을 우선 사용.
     매칭 실패 시 B열 이후를 순차 스캔하는 폴백을 사용.
+    column_count: 폴백에서 배치할 수 있는 컬럼 수 (파싱된 프레임 너비, 없으면 Z열까지)
     """
     print(f"DEBUG detect_segments_from_user_input: 입력 세그먼트: {user_segments}")
     print(f"DEBUG detect_segments_from_user_input: variation_count: {variation_count}")
@@ -667,7 +1070,7 @@ def detect_segments_from_user_input(user_segments, variation_count=1, segment_na
 
     # 폴백: B열 이후 순차 배치 (위치 고정 없이 남은 컬럼 순서대로)
     segments = []
-    all_cols = [col_index_to_letter(i) for i in range(26)]
+    all_cols = column_labels(column_count or FALLBACK_SEGMENT_COLUMN_COUNT)
     col_idx = SEGMENT_SCAN_START_COL_IDX
 
     for segment_name in user_segments:
@@ -718,48 +1121,22 @@ def detect_segments(segment_names, variation_count=1):
     print(f"DEBUG detect_segments: 총 {len(segments)}개 세그먼트 감지됨")
     return segments
 
-def clean_label(label):
-    """라벨 정리 (공백, 언더스코어, 특수문자 제거)"""
-    if pd.isna(label):
-        return ''
-    # 언더스코어, 공백, 특수문자 제거하여 매칭 정확도 향상
-    cleaned = str(label).strip().replace('_', '').replace(' ', '').replace('>', '').replace('-', '').replace('(', '').replace(')', '')
-    return cleaned
-
 def compute_confidence_rate(xC, nC, xV, nV):
     """
     비율에 대한 신뢰도 계산 (two-sided z-test, unpooled)
+    여러 셀을 한 번에 계산할 때는 core.stats.confidence_rates 사용
     """
-    if nC == 0 or nV == 0:
-        return None, 0.0
-    
-    pC = xC / nC if nC > 0 else 0
-    pV = xV / nV if nV > 0 else 0
-    
-    # 분산이 0인 경우
-    if pC == 0 and pV == 0:
-        return None, 0.0
+    pC, _, _, confidence = confidence_rates([xC], [nC], [xV], [nV])
     
-    # Unpooled standard error
-    se = np.sqrt((pV * (1 - pV) / nV) + (pC * (1 - pC) / nC))
+    # 계산 불가 (NaN/inf)
+    if np.isnan(confidence[0]):
+        return None, None
     
-    if se == 0:
+    # 분모 0, 비율 0, 분산 0이면 pC 없이 0.0
+    if np.isnan(pC[0]):
         return None, 0.0
     
-    # z-score
-    z = (pV - pC) / se
-    
-    # p-value (two-sided)
-    p_value = 2 * (1 - norm.cdf(abs(z)))
-    
-    # Confidence level
-    confidence = (1 - p_value) * 100
-    
-    # NaN 체크
-    if np.isnan(confidence) or np.isinf(confidence):
-        return None, None
-    
-    return pC, confidence
+    return float(pC[0]), float(confidence[0])
 
 def compute_verdict(uplift, num_c, num_v, confidence=None):
     """
@@ -771,31 +1148,9 @@ def compute_verdict(uplift, num_c, num_v, confidence=None):
     - num_c >= 100 AND num_v >= 100 AND confidence >= 90% AND confidence < 95% AND uplift >= 3% => Variation 우세 (유보)
     - num_c >= 100 AND num_v >= 100 AND confidence >= 90% AND confidence < 95% AND uplift <= -3% => Control 우세 (유보)
     - else => 차이 없음
+    여러 셀을 한 번에 계산할 때는 core.stats.verdicts 사용
     """
-    # Control 또는 Variation 분자 샘플 크기가 100 미만이면 모수 부족
-    if num_c < 100 or num_v < 100:
-        return '모수 부족'
-    
-    # 신뢰도가 없으면 차이 없음
-    if confidence is None:
-        return '차이 없음'
-    
-    # 신뢰도 95% 이상
-    if confidence >= 95.0:
-        if uplift >= 3.0:
-            return 'Variation 우세'
-        elif uplift <= -3.0:
-            return 'Control 우세'
-    
-    # 신뢰도 90% 이상 95% 미만
-    elif confidence >= 90.0:
-        if uplift >= 3.0:
-            return 'Variation 우세 (유보)'
-        elif uplift <= -3.0:
-            return 'Control 우세 (유보)'
-    
-    # 그 외 (신뢰도 90% 미만)
-    return '차이 없음'
+    return verdicts([uplift], [num_c], [num_v], [np.nan if confidence is None else confidence])[0]
 
 def _coerce_numeric(value):
     """프론트엔드에서 전달된 셀 값을 float로 변환. 변환 불가 시 None 반환."""
@@ -826,7 +1181,7 @@ def _coerce_numeric(value):
         return None
 
 
-def get_kpi_metric_value(data_df, kpi_config, field, device_col, debug=False, fallback_label=None):
+def get_kpi_metric_value(data_df, kpi_config, field, device_col, debug=False, fallback_label=None, metric_matrix=None):
     """
     KPI 분자/분모 메트릭 값 조회.
 
@@ -841,6 +1196,7 @@ def get_kpi_metric_value(data_df, kpi_config, field, device_col, debug=False, fa
         device_col: 'B', 'C', 'D' 등 엑셀 컬럼 letter
         debug: 디버그 로그 출력 여부
         fallback_label: 폴백 시 사용할 메트릭 이름 (없으면 kpi_config[field] 사용)
+        metric_matrix: resolve_metric_matrix 결과. (라벨, 컬럼)이 들어 있으면 프레임 검색 대신 사용
     """
     row_key = f'{field}Row' if field in ('numerator', 'denominator') else None
     row_data = kpi_config.get(row_key) if row_key else None
@@ -863,6 +1219,11 @@ def get_kpi_metric_value(data_df, kpi_config, field, device_col, debug=False, fa
         label = fallback_label or ''
     if not label:
         return None
+    if metric_matrix is not None and (label, device_col) in metric_matrix:
+        value = metric_matrix.get(label, device_col)
+        if debug:
+            print(f"DEBUG: [일괄 조회] '{label}', col={device_col} -> {value}")
+        return value
     return find_metric_value(data_df, label, None, device_col, debug)
 
 
@@ -881,95 +1242,42 @@ def find_metric_value(data_df, metric_label, country, device_col, debug=False):
     - 컬럼 G: 세그먼트 2 - Variation
     - ...
     """
-    metric_clean = clean_label(metric_label)
+    # 정리된 A열 라벨 인덱스 (프레임당 한 번 생성)
+    # 컬럼 A(메트릭 이름)로 검색, 실패하면 핵심 단어 → 'cart add' 키워드 순으로 재시도
+    row_pos, matched_by = get_metric_index(data_df).resolve(metric_label)
     
-    # 컬럼 A(메트릭 이름)로 필터링
-    filtered = data_df[
-        data_df['A'].apply(clean_label).str.contains(metric_clean, case=False, na=False, regex=False)
-    ]
+    if debug and matched_by == MATCH_CORE_WORDS:
+        print(f"DEBUG: 핵심 단어로 메트릭 찾음 - 원본: {metric_label}")
+    elif debug and matched_by == MATCH_CART_ADD:
+        print(f"DEBUG: 'cart add' 키워드로 메트릭 찾음 - 원본: {metric_label}")
     
-    # 정확한 매칭이 실패하면, 메트릭 이름의 핵심 부분만 추출하여 재시도
-    if filtered.empty:
-        # 메트릭 이름에서 핵심 키워드 추출
-        # 예: "(Cart 2) Cart add_25 Series (Visitor)" -> "CartaddSeries" 또는 "Cartadd"
-        import re
-        # 괄호, 숫자, 특수문자 제거 후 핵심 단어 추출
-        core_text = re.sub(r'[0-9_()>]', '', metric_label).strip()
-        # 공백 제거하여 단어 연결
-        core_words = ''.join(core_text.split())
-        core_words_clean = clean_label(core_words)
-        
-        if core_words_clean and len(core_words_clean) > 5:  # 최소 길이 체크
-            # 핵심 단어로 재시도
-            filtered = data_df[
-                data_df['A'].apply(clean_label).str.contains(core_words_clean, case=False, na=False, regex=False)
-            ]
-            
-            if debug and not filtered.empty:
-                print(f"DEBUG: 핵심 단어로 메트릭 찾음 - core_words: {core_words_clean}, 원본: {metric_label}")
-        
-        # 여전히 찾지 못하면, "Cart"와 "add" 같은 핵심 키워드로 재시도
-        if filtered.empty:
-            keywords = re.findall(r'\b\w+\b', metric_label.lower())
-            # "cart", "add" 같은 핵심 키워드 추출
-            important_keywords = [kw for kw in keywords if len(kw) > 3 and kw not in ['cart', 'series', 'visitor']]
-            if 'cart' in keywords and 'add' in keywords:
-                # "cartadd"로 검색
-                cartadd_clean = clean_label('cart add')
-                filtered = data_df[
-                    data_df['A'].apply(clean_label).str.contains(cartadd_clean, case=False, na=False, regex=False)
-                ]
-                if debug and not filtered.empty:
-                    print(f"DEBUG: 'cart add' 키워드로 메트릭 찾음 - 원본: {metric_label}")
-    
-    if filtered.empty:
+    if row_pos is None:
         if debug:
             print(f"DEBUG: 메트릭을 찾을 수 없음 - metric: {metric_label}, device_col: {device_col}")
-            print(f"  정리된 메트릭: {metric_clean}")
+            print(f"  정리된 메트릭: {clean_label(metric_label)}")
             # 사용 가능한 메트릭 샘플 출력
             if len(data_df) > 0:
                 sample_metrics = data_df['A'].dropna().unique()[:10]
                 print(f"  컬럼 A 메트릭 샘플: {list(sample_metrics)}")
                 # 유사한 메트릭 찾기 시도
-                metric_lower = metric_label.lower()
                 similar_metrics = [m for m in sample_metrics if 'cart' in str(m).lower() and 'add' in str(m).lower()]
                 if similar_metrics:
                     print(f"  유사한 메트릭 (Cart + Add 포함): {similar_metrics}")
         return None
     
     # 첫 번째 매칭 행의 해당 컬럼 값
-    value = filtered.iloc[0][device_col]
+    value = data_df[device_col].iat[row_pos]
+    
+    # 숫자로 변환 (문자열은 쉼표·공백 제거, 결측 표기는 None)
+    result = cell_to_float(value)
     
     if debug:
+        matched_row = data_df.iloc[row_pos]
         print(f"DEBUG: 메트릭 찾음 - country: {country}, metric: {metric_label}, device_col: {device_col}")
-        print(f"  매칭된 행: A={filtered.iloc[0]['A']}, B={filtered.iloc[0]['B']}, C={filtered.iloc[0]['C']}")
-        print(f"  원본 값: {value}, 타입: {type(value)}")
+        print(f"  매칭된 행: A={matched_row['A']}, B={matched_row['B']}, C={matched_row['C']}")
+        print(f"  원본 값: {value}, 타입: {type(value)} -> 변환된 값: {result}")
     
-    try:
-        # 숫자로 변환 시도
-        if pd.isna(value):
-            if debug:
-                print(f"  값이 NaN입니다.")
-            return None
-        
-        # 문자열인 경우 쉼표 제거 후 숫자 변환 시도
-        if isinstance(value, str):
-            # 쉼표와 공백 제거
-            value_clean = value.replace(',', '').replace(' ', '').strip()
-            if value_clean == '' or value_clean.lower() in ['nan', 'none', '-', 'n/a']:
-                return None
-            result = float(value_clean)
-        else:
-            result = float(value)
-        
-        if debug:
-            print(f"  변환된 값: {result}")
-        
-        return result
-    except (ValueError, TypeError) as e:
-        if debug:
-            print(f"DEBUG: 값 변환 실패 - {e}, value: {value}, type: {type(value)}")
-        return None
+    return result
 
 def detect_country(data_df):
     """
@@ -977,833 +1285,642 @@ def detect_country(data_df):
     """
     return 'UK'  # 기본값
 
-def compute_kpi(data_df, kpi_config, country='UK', segment_mapping=None, variation_count=1, debug=False, report_order=None):
+def kpi_metric_labels(kpi_config):
+    """KPI 타입별로 compute_kpi가 조회하는 메트릭 이름 (분자, 분모, 폴백용 Revenue/Visits)"""
+    kpi_type = kpi_config.get('type')
+    numerator = kpi_config.get('numerator') or ''
+    denominator = kpi_config.get('denominator') or ''
+    if kpi_type == 'rpv':
+        return ['Revenue', 'Visits']
+    if kpi_type in ('revenue', 'aop'):
+        # 분자가 비어 있으면 'Revenue' 메트릭으로 폴백
+        numerator = numerator or 'Revenue'
+    if kpi_type == 'revenue':
+        return [numerator]
+    return [label for label in (numerator, denominator) if label]
+
+
+def segment_metric_columns(segments):
+    """세그먼트 매핑의 Control/Variation 컬럼 목록 (중복 제거, 순서 유지)"""
+    columns = []
+    for seg_info in segments:
+        columns.extend(seg_info[1:3])
+    return list(dict.fromkeys(columns))
+
+
+def plan_metric_lookups(kpi_configs, segments):
     """
-    KPI 계산
-    segment_mapping: [('Segment Name', 'Control Col', 'Variation Col'), ...] 형식
-    variation_count: Variation 개수 (기본값: 1)
-    report_order: 리포트 순서 (메트릭을 찾지 못한 경우 에러 메시지에 포함)
+    여러 KPI가 공유하는 (메트릭, 컬럼) 조회를 한 번으로 묶는 계획.
+    반환: (메트릭 이름 목록, 컬럼 목록, KPI별로 따로 조회할 때의 조회 수)
     """
-    results = []
-    missing_metrics = []  # 찾지 못한 메트릭 정보 저장
-    
-    # 세그먼트 매핑이 제공되지 않으면 기본값 사용
-    if segment_mapping:
-        segments = segment_mapping
-    else:
-        # data_df에서 세그먼트 정보 가져오기
-        segment_names = getattr(data_df, 'attrs', {}).get('segment_names', {})
-        if segment_names:
-            segments = detect_segments(segment_names, variation_count)
-        else:
-            segments = [
-                ('All', 'D', 'E'),
-            ]
-    
-    # variation_count > 1인 경우, segment별로 그룹화
-    if variation_count > 1:
-        # segment별로 variation 결과를 그룹화
-        segment_groups = {}
-        base_segment_name = None
-        
-        for seg_info in segments:
-            # segments가 4개 요소를 가질 수 있음 (variation_count > 1인 경우)
-            if len(seg_info) == 4:
-                segment_name, control_col, variation_col, actual_segment_name = seg_info
-                base_segment_name = actual_segment_name
-            else:
-                segment_name, control_col, variation_col = seg_info
-                # segment_name이 실제 세그먼트 이름 (사용자가 입력한 세그먼트)
-                base_segment_name = segment_name
-                # 빈 문자열이나 None이면 'All' 사용
-                if not base_segment_name or base_segment_name.strip() == '' or base_segment_name.lower() in ['nan', 'none']:
-                    base_segment_name = 'All'
-            
-            if base_segment_name not in segment_groups:
-                segment_groups[base_segment_name] = {
-                    'segment_name': base_segment_name,
-                    'control_col': control_col,
-                    'variations': []
-                }
-            
-            # Variation 정보 추출
-            variation_num = None
-            if 'Variation' in segment_name:
-                try:
-                    variation_num = int(segment_name.split()[-1])
-                except:
-                    variation_num = len(segment_groups[base_segment_name]['variations']) + 1
-            
-            segment_groups[base_segment_name]['variations'].append({
-                'variation_num': variation_num,
-                'variation_col': variation_col,
-                'segment_name': segment_name
-            })
-        
-        # 각 segment별로 하나의 결과 객체 생성
-        for base_segment_name, group_data in segment_groups.items():
-            control_col = group_data['control_col']
-            variations = sorted(group_data['variations'], key=lambda x: x['variation_num'] or 0)
-            
-            # Control 값 계산
-            if kpi_config['type'] == 'rate' or kpi_config['type'] == 'simple':
-                if debug:
-                    print(f"DEBUG compute_kpi (variation_count > 1): KPI={kpi_config['name']}, segment={base_segment_name}, control_col={control_col}")
-                    print(f"  numerator={kpi_config['numerator']}, denominator={kpi_config.get('denominator', '')}")
-                
-                num_c = get_kpi_metric_value(data_df, kpi_config, 'numerator', control_col, debug)
-                
-                # denominator가 있으면 rate 계산, 없으면 값만 사용
-                den_label = kpi_config.get('denominator', '')
-                if den_label and den_label.strip():
-                    den_c = get_kpi_metric_value(data_df, kpi_config, 'denominator', control_col, debug)
-                else:
-                    den_c = None
-                
-                if debug:
-                    print(f"  Control 값: num_c={num_c}, den_c={den_c}")
-                
-                if num_c is None:
-                    if debug:
-                        print(f"  경고: Control 값이 None입니다. 건너뜁니다.")
-                    missing_metrics.append({
-                        'metric': kpi_config['numerator'],
-                        'segment': base_segment_name,
-                        'country': country,
-                        'reportOrder': report_order
-                    })
-                    continue
-                
-                # denominator가 있으면 rate 계산, 없으면 None
-                if den_c is not None and den_c > 0:
-                    rate_c = num_c / den_c
-                else:
-                    rate_c = None
-                
-                # 각 Variation별로 계산
-                variation_data = []
-                for var_info in variations:
-                    variation_col = var_info['variation_col']
-                    variation_num = var_info['variation_num']
-                    
-                    if debug:
-                        print(f"  Variation {variation_num} 처리: variation_col={variation_col}")
-                    
-                    num_v = get_kpi_metric_value(data_df, kpi_config, 'numerator', variation_col, debug)
-                    
-                    # denominator가 있으면 rate 계산, 없으면 값만 사용
-                    if den_label and den_label.strip():
-                        den_v = get_kpi_metric_value(data_df, kpi_config, 'denominator', variation_col, debug)
-                    else:
-                        den_v = None
-                    
-                    if debug:
-                        print(f"    Variation {variation_num} 값: num_v={num_v}, den_v={den_v}")
-                    
-                    if num_v is None:
-                        if debug:
-                            print(f"    경고: Variation {variation_num} 값이 None입니다. 건너뜁니다.")
-                        continue
-                    
-                    # denominator가 있으면 rate 계산, 없으면 None
-                    if den_v is not None and den_v > 0:
-                        rate_v = num_v / den_v
-                    else:
-                        rate_v = None
-                    
-                    # uplift 계산
-                    if rate_c is not None and rate_v is not None:
-                        uplift = ((rate_v - rate_c) / rate_c * 100) if rate_c > 0 else 0
-                        pC, confidence = compute_confidence_rate(num_c, den_c, num_v, den_v)
-                        verdict = compute_verdict(uplift, num_c, num_v, confidence)
-                        p_gt0, p_lt0, p_gt3, p_lt3, p_neutral, decision = compute_bayesian_probs(den_c, num_c, den_v, num_v)
-                    else:
-                        # denominator가 없으면 값만 비교
-                        uplift = ((num_v - num_c) / num_c * 100) if num_c > 0 else 0
-                        confidence = None
-                        verdict = compute_verdict(uplift, num_c, num_v, confidence=None)
-                        p_gt0, p_lt0, p_gt3, p_lt3, p_neutral, decision = None, None, None, None, None, None
-                    
-                    variation_data.append({
-                        'variationNum': var_info['variation_num'],
-                        'variationRate': rate_v,
-                        'uplift': uplift,
-                        'confidence': confidence,
-                        'verdict': verdict,
-                        'p_gt0': p_gt0,
-                        'p_lt0': p_lt0,
-                        'p_gt3': p_gt3,
-                        'p_lt3': p_lt3,
-                        'p_neutral': p_neutral,
-                        'decision': decision,
-                        'controlValue': num_c,
-                        'variationValue': num_v,
-                        'denominatorSizeControl': den_c if den_c is not None else 0,
-                        'denominatorSizeVariation': den_v if den_v is not None else 0,
-                    })
-                
-                if variation_data:
-                    results.append({
-                        'country': country or 'N/A',
-                        'device': base_segment_name,
-                        'kpiName': kpi_config['name'],
-                        'category': kpi_config.get('category', 'primary'),
-                        'numerator': kpi_config.get('numerator', ''),
-                        'denominator': kpi_config.get('denominator', ''),
-                        'controlRate': rate_c,
-                        'controlValue': num_c,
-                        'denominatorSizeControl': den_c if den_c is not None else 0,
-                        'variations': variation_data,
-                    })
-            elif kpi_config['type'] == 'revenue':
-                # Revenue 타입은 엑셀의 금액을 현지통화로 보고, 입력 환율로 USD 환산하여 표시합니다.
-                # 가정: 입력 환율(exchangeRate) = 현지통화 1 USD = exchangeRate
-                # => USD = 현지통화 / exchangeRate
-                exchange_rate_raw = kpi_config.get('exchangeRate', None)
-                try:
-                    exchange_rate = float(exchange_rate_raw) if exchange_rate_raw not in [None, ''] else 0.0
-                except Exception:
-                    exchange_rate = 0.0
-                if exchange_rate <= 0:
-                    exchange_rate = 1.0
+    columns = segment_metric_columns(segments)
+    labels = []
+    naive_count = 0
+    for kpi_config in kpi_configs:
+        kpi_labels = list(dict.fromkeys(kpi_metric_labels(kpi_config)))
+        naive_count += len(kpi_labels) * len(columns)
+        labels.extend(kpi_labels)
+    return list(dict.fromkeys(labels)), columns, naive_count
+
+
+# =============================
+# KPI 계산 엔진 (타입 레지스트리)
+# =============================
+# KPI 타입마다 피연산자(분자/분모 메트릭), 수식, 통계 입력, 결과 필드를 선언한다.
+# compute_kpi는 한 KPI의 모든 세그먼트 × Variation 셀을 numpy 배열로 한 번에 계산하고
+# 선언된 필드로 결과 dict를 만든다. 새 KPI 타입은 register_kpi_type 한 번으로 추가한다.
+KPI_TYPES = {}
+
+_BAYESIAN_KEYS = ('p_gt0', 'p_lt0', 'p_gt3', 'p_lt3', 'p_neutral', 'decision')
+# 결과 필드 목록에서 Bayesian 값을 그대로 쓰거나(_BAYESIAN_FIELDS) 비워 둘 때(_NO_BAYESIAN_FIELDS)
+_BAYESIAN_FIELDS = tuple((key, key) for key in _BAYESIAN_KEYS)
+_NO_BAYESIAN_FIELDS = tuple((key, None) for key in _BAYESIAN_KEYS)
+
+
+class KpiType:
+    """
+    KPI 타입 정의
+    operands: {이름: (kpi_config 필드, 폴백 메트릭 이름)}. 'denominator' 필드는 분모 이름이 있을 때만 조회
+    formulas(c, v, kpi_config): 셀별 Control/Variation 피연산자 배열 → 계산 값 dict (배열 또는 KPI 단위 스칼라)
+    control_operands: Control 컬럼에서 조회할 피연산자 (기본: 전부)
+    requires: 분모 이름이 없으면 KPI 전체를 건너뛰는 피연산자
+    control_required / variation_required: 값이 없으면 그룹/셀을 건너뛰는 피연산자
+    confidence: 신뢰도 z-test 입력 (성공 수, 시행 수) 피연산자, 없으면 None
+    verdict_counts: 모수 부족 판정에 쓰는 피연산자, 없으면 판정 안 함
+    bayesian: Bayesian 사후확률 입력 (분모, 분자) 피연산자, 없으면 None
+    stats_mask: 신뢰도/Bayesian을 계산할 셀 마스크 이름 (None이면 모든 셀)
+    row_fields: variation_count == 1 결과 필드 [(결과 키, 값 이름 또는 None)]
+    group_fields / variation_fields: variation_count > 1 세그먼트/Variation 결과 필드
+    row_missing / group_missing / variation_missing: 건너뛴 셀에서 기록할 [(메트릭 이름 함수, 값 이름들)]
+    """
+
+    def __init__(self, operands, formulas, row_fields, group_fields, variation_fields,
+                 control_operands=None, requires=(), control_required=(), variation_required=(),
+                 confidence=None, verdict_counts=None, bayesian=None, stats_mask=None,
+                 row_missing=(), group_missing=(), variation_missing=()):
+        self.operands = operands
+        self.formulas = formulas
+        self.row_fields = row_fields
+        self.group_fields = group_fields
+        self.variation_fields = variation_fields
+        self.control_operands = tuple(operands) if control_operands is None else control_operands
+        self.requires = requires
+        self.control_required = control_required
+        self.variation_required = variation_required
+        self.confidence = confidence
+        self.verdict_counts = verdict_counts
+        self.bayesian = bayesian
+        self.stats_mask = stats_mask
+        self.row_missing = row_missing
+        self.group_missing = group_missing
+        self.variation_missing = variation_missing
+
+
+def register_kpi_type(names, **spec):
+    """KPI 타입 등록 (같은 정의를 여러 이름으로 등록 가능)"""
+    kpi_type = KpiType(**spec)
+    for name in names:
+        KPI_TYPES[name] = kpi_type
+    return kpi_type
+
+
+def _has_label(label):
+    return bool(label) and bool(str(label).strip())
+
+
+def _kpi_exchange_rate(kpi_config):
+    """
+    입력 환율(exchangeRate): 현지통화 1 USD = exchangeRate  =>  USD = 현지통화 / exchangeRate
+    값이 없거나 0 이하이면 1.0
+    """
+    exchange_rate_raw = kpi_config.get('exchangeRate', None)
+    try:
+        exchange_rate = float(exchange_rate_raw) if exchange_rate_raw not in [None, ''] else 0.0
+    except Exception:
+        exchange_rate = 0.0
+    if exchange_rate <= 0:
+        exchange_rate = 1.0
+    return exchange_rate
+
+
+def _ratio(num, den, fill=np.nan):
+    """num / den (den > 0인 셀만, 나머지는 fill)"""
+    out = np.full(num.shape, fill, dtype=float)
+    return np.divide(num, den, out=out, where=den > 0)
+
+
+def _pct_change(new, base):
+    """(new - base) / base * 100 (base > 0인 셀만, 나머지는 0)"""
+    out = np.zeros(new.shape, dtype=float)
+    np.divide(new - base, base, out=out, where=base > 0)
+    return out * 100
+
+
+def _size_or_zero(values):
+    # 분모가 없는 셀은 기존 결과와 같이 정수 0 (있는 셀은 실수 그대로)
+    sizes = np.asarray(values, dtype=object)
+    sizes[np.isnan(values)] = 0
+    return sizes
+
+
+def _rate_formulas(c, v, kpi_config):
+    # 분모가 있으면 rate 비교, 없으면(simple) 값 자체를 비교
+    rate_c = _ratio(c['num'], c['den'])
+    rate_v = _ratio(v['num'], v['den'])
+    paired = ~np.isnan(rate_c) & ~np.isnan(rate_v)
+    return {
+        'rate_c': rate_c,
+        'rate_v': rate_v,
+        'paired': paired,
+        # 단일 Variation 결과는 양쪽 rate가 모두 있을 때만 rate를 표시
+        'paired_rate_c': np.where(paired, rate_c, np.nan),
+        'paired_rate_v': np.where(paired, rate_v, np.nan),
+        'uplift': np.where(paired, _pct_change(rate_v, rate_c), _pct_change(v['num'], c['num'])),
+        'den_size': _size_or_zero(c['den'] + v['den']),
+        'den_size_c': _size_or_zero(c['den']),
+        'den_size_v': _size_or_zero(v['den']),
+    }
+
+
+def _revenue_formulas(c, v, kpi_config):
+    # 금액은 현지통화로 비교하고 표시는 USD 환산 값
+    exchange_rate = _kpi_exchange_rate(kpi_config)
+    rev_c_usd = c['rev'] / exchange_rate
+    rev_v_usd = v['rev'] / exchange_rate
+    return {
+        'uplift': _pct_change(v['rev'], c['rev']),
+        'rev_c_usd': rev_c_usd,
+        'rev_v_usd': rev_v_usd,
+        'usd_size': rev_c_usd + rev_v_usd,
+        'kpi_type': kpi_config['type'],
+        'exchange_rate': exchange_rate,
+    }
+
+
+def _variation_only_formulas(c, v, kpi_config):
+    # Control 없이 Variation 값(과 분모가 있으면 rate)만 표시
+    return {
+        'rate_v': _ratio(v['num'], v['den']),
+        'den_size_v': _size_or_zero(v['den']),
+        'zero': 0,
+    }
+
+
+def _rpv_formulas(c, v, kpi_config):
+    rpv_c = _ratio(c['rev'], c['visits'], fill=0.0)
+    rpv_v = _ratio(v['rev'], v['visits'], fill=0.0)
+    return {
+        'rpv_c': rpv_c,
+        'rpv_v': rpv_v,
+        'uplift': _pct_change(rpv_v, rpv_c),
+        'visits_size': c['visits'] + v['visits'],
+    }
+
+
+def _aop_formulas(c, v, kpi_config):
+    # AOP = Revenue(현지통화) / 주문 수. 표시는 USD, uplift·신뢰도는 현지통화 기준
+    exchange_rate = _kpi_exchange_rate(kpi_config)
+    aop_c = _ratio(c['rev'], c['den'], fill=0.0)
+    aop_v = _ratio(v['rev'], v['den'], fill=0.0)
+    return {
+        'aop_c_usd': aop_c / exchange_rate,
+        'aop_v_usd': aop_v / exchange_rate,
+        'uplift': _pct_change(aop_v, aop_c),
+        'den_size': c['den'] + v['den'],
+        'kpi_type': kpi_config['type'],
+        'exchange_rate': exchange_rate,
+    }
+
+
+def _numerator_label(default):
+    return lambda kpi_config: kpi_config.get('numerator', default)
+
+
+def _fixed_label(label):
+    return lambda kpi_config: label
+
+
+register_kpi_type(
+    ('rate', 'simple'),
+    operands={'num': ('numerator', None), 'den': ('denominator', None)},
+    formulas=_rate_formulas,
+    control_required=('num',),
+    variation_required=('num',),
+    confidence=('num', 'den'),
+    verdict_counts='num',
+    bayesian=('den', 'num'),
+    stats_mask='paired',
+    row_fields=(
+        ('controlValue', 'num_c'), ('variationValue', 'num_v'),
+        ('controlRate', 'paired_rate_c'), ('variationRate', 'paired_rate_v'),
+        ('uplift', 'uplift'), ('confidence', 'confidence'), ('verdict', 'verdict'),
+        *_BAYESIAN_FIELDS,
+        ('denominatorSize', 'den_size'), ('denominatorSizeControl', 'den_size_c'),
+        ('denominatorSizeVariation', 'den_size_v'),
+    ),
+    group_fields=(
+        ('controlRate', 'rate_c'), ('controlValue', 'num_c'), ('denominatorSizeControl', 'den_size_c'),
+        ('variations', 'variations'),
+    ),
+    variation_fields=(
+        ('variationRate', 'rate_v'), ('uplift', 'uplift'), ('confidence', 'confidence'), ('verdict', 'verdict'),
+        *_BAYESIAN_FIELDS,
+        ('controlValue', 'num_c'), ('variationValue', 'num_v'),
+        ('denominatorSizeControl', 'den_size_c'), ('denominatorSizeVariation', 'den_size_v'),
+    ),
+    row_missing=(
+        (_numerator_label(None), ('num_c',)), (_numerator_label(None), ('num_v',)),
+        (lambda kpi_config: kpi_config.get('denominator'), ('den_c',)),
+        (lambda kpi_config: kpi_config.get('denominator'), ('den_v',)),
+    ),
+    group_missing=((_numerator_label(None), ('num_c',)),),
+)
+
+register_kpi_type(
+    ('revenue',),
+    operands={'rev': ('numerator', 'Revenue')},
+    formulas=_revenue_formulas,
+    control_required=('rev',),
+    variation_required=('rev',),
+    verdict_counts='rev',
+    row_fields=(
+        ('controlValue', 'rev_c_usd'), ('variationValue', 'rev_v_usd'),
+        ('controlRate', None), ('variationRate', None),
+        ('uplift', 'uplift'), ('confidence', None), ('verdict', 'verdict'),
+        *_NO_BAYESIAN_FIELDS,
+        ('denominatorSize', 'usd_size'), ('denominatorSizeControl', 'rev_c_usd'),
+        ('denominatorSizeVariation', 'rev_v_usd'),
+        ('kpiType', 'kpi_type'), ('exchangeRate', 'exchange_rate'),
+    ),
+    group_fields=(
+        ('controlValue', 'rev_c_usd'), ('variations', 'variations'),
+        ('kpiType', 'kpi_type'), ('exchangeRate', 'exchange_rate'),
+    ),
+    variation_fields=(
+        ('variationValue', 'rev_v_usd'), ('uplift', 'uplift'), ('confidence', None), ('verdict', 'verdict'),
+        ('controlValue', 'rev_c_usd'),
+    ),
+    row_missing=((_numerator_label('Revenue'), ('rev_c', 'rev_v')),),
+    group_missing=((_numerator_label('Revenue'), ('rev_c',)),),
+)
+
+register_kpi_type(
+    ('variation_only',),
+    operands={'num': ('numerator', None), 'den': ('denominator', None)},
+    formulas=_variation_only_formulas,
+    control_operands=(),
+    variation_required=('num',),
+    row_fields=(
+        ('controlValue', None), ('variationValue', 'num_v'),
+        ('controlRate', None), ('variationRate', 'rate_v'),
+        ('uplift', None), ('confidence', None), ('verdict', None),
+        *_NO_BAYESIAN_FIELDS,
+        ('denominatorSize', 'den_size_v'), ('denominatorSizeControl', 'zero'),
+        ('denominatorSizeVariation', 'den_size_v'),
+    ),
+    group_fields=(
+        ('controlValue', None), ('controlRate', None), *_NO_BAYESIAN_FIELDS, ('variations', 'variations'),
+    ),
+    variation_fields=(
+        ('variationValue', 'num_v'), ('variationRate', 'rate_v'),
+        ('uplift', None), ('confidence', None), ('verdict', None),
+        ('denominatorSizeVariation', 'den_size_v'),
+    ),
+    row_missing=((_numerator_label(''), ('num_v',)),),
+)
+
+register_kpi_type(
+    ('rpv',),
+    operands={'rev': (None, 'Revenue'), 'visits': (None, 'Visits')},
+    formulas=_rpv_formulas,
+    control_required=('rev', 'visits'),
+    variation_required=('rev', 'visits'),
+    confidence=('rev', 'visits'),
+    verdict_counts='rev',
+    bayesian=('visits', 'rev'),
+    row_fields=(
+        ('controlValue', 'rev_c'), ('variationValue', 'rev_v'),
+        ('controlRate', 'rpv_c'), ('variationRate', 'rpv_v'),
+        ('uplift', 'uplift'), ('confidence', 'confidence'), ('verdict', 'verdict'),
+        *_BAYESIAN_FIELDS,
+        ('denominatorSize', 'visits_size'),
+    ),
+    group_fields=(
+        ('controlRate', 'rpv_c'), ('controlValue', 'rev_c'), *_NO_BAYESIAN_FIELDS, ('variations', 'variations'),
+    ),
+    variation_fields=(
+        ('variationRate', 'rpv_v'), ('uplift', 'uplift'), ('confidence', 'confidence'), ('verdict', 'verdict'),
+        *_BAYESIAN_FIELDS,
+        ('controlValue', 'rev_c'), ('variationValue', 'rev_v'),
+    ),
+    row_missing=(
+        (_fixed_label('Revenue'), ('rev_c', 'rev_v')),
+        (_fixed_label('Visits'), ('visits_c', 'visits_v')),
+    ),
+    variation_missing=(
+        (_fixed_label('Revenue'), ('rev_v',)),
+        (_fixed_label('Visits'), ('visits_v',)),
+    ),
+)
+
+register_kpi_type(
+    ('aop',),
+    operands={'rev': ('numerator', 'Revenue'), 'den': ('denominator', None)},
+    formulas=_aop_formulas,
+    requires=('den',),
+    control_required=('rev', 'den'),
+    variation_required=('rev', 'den'),
+    confidence=('rev', 'den'),
+    verdict_counts='den',
+    row_fields=(
+        # controlValue/variationValue는 모수 부족 계산용 sample size(주문 수)
+        ('controlValue', 'den_c'), ('variationValue', 'den_v'),
+        ('controlRate', 'aop_c_usd'), ('variationRate', 'aop_v_usd'),
+        ('uplift', 'uplift'), ('confidence', 'confidence'), ('verdict', 'verdict'),
+        *_NO_BAYESIAN_FIELDS,
+        ('denominatorSize', 'den_size'), ('denominatorSizeControl', 'den_c'),
+        ('denominatorSizeVariation', 'den_v'),
+        ('kpiType', 'kpi_type'), ('exchangeRate', 'exchange_rate'),
+    ),
+    group_fields=(
+        ('controlRate', 'aop_c_usd'), ('controlValue', 'den_c'), *_NO_BAYESIAN_FIELDS,
+        ('variations', 'variations'), ('kpiType', 'kpi_type'), ('exchangeRate', 'exchange_rate'),
+        ('denominatorSizeControl', 'den_c'),
+    ),
+    variation_fields=(
+        ('variationRate', 'aop_v_usd'), ('variationValue', 'den_v'),
+        ('uplift', 'uplift'), ('confidence', 'confidence'), ('verdict', 'verdict'),
+        *_NO_BAYESIAN_FIELDS,
+        ('controlValue', 'den_c'), ('denominatorSizeVariation', 'den_v'),
+    ),
+)
+
+
+def _kpi_segment_groups(segments, variation_count):
+    """
+    세그먼트 매핑 → 결과 단위 그룹 목록 [{'name', 'control_col', 'variations': [...]}]
+    variation_count == 1: 세그먼트마다 그룹 하나 (Variation 하나)
+    variation_count > 1: 같은 세그먼트 이름의 Variation들을 묶고 Variation 번호순 정렬
+    """
+    if variation_count <= 1:
+        groups = []
+        for seg_info in segments:
+            # 4개 요소이면 마지막이 사용자가 입력한 세그먼트 이름
+            segment_name, control_col, variation_col = seg_info[:3]
+            display_segment_name = seg_info[3] if len(seg_info) == 4 else segment_name
+            groups.append({
+                'name': display_segment_name,
+                'control_col': control_col,
+                'variations': [{'variation_num': None, 'variation_col': variation_col, 'segment_name': segment_name}],
+            })
+        return groups
 
-                rev_c_local = get_kpi_metric_value(data_df, kpi_config, 'numerator', control_col, debug, fallback_label='Revenue')
-                
-                if rev_c_local is None:
-                    # 메트릭을 찾지 못한 경우 정보 저장
-                    missing_metrics.append({
-                        'metric': kpi_config.get('numerator', 'Revenue'),
-                        'segment': base_segment_name,
-                        'country': country,
-                        'reportOrder': report_order
-                    })
-                    continue
+    segment_groups = {}
+    for seg_info in segments:
+        segment_name, control_col, variation_col = seg_info[:3]
+        if len(seg_info) == 4:
+            base_segment_name = seg_info[3]
+        else:
+            # segment_name이 실제 세그먼트 이름 (빈 문자열이나 None이면 'All')
+            base_segment_name = segment_name
+            if not base_segment_name or base_segment_name.strip() == '' or base_segment_name.lower() in ['nan', 'none']:
+                base_segment_name = 'All'
+
+        group = segment_groups.setdefault(base_segment_name, {
+            'name': base_segment_name,
+            'control_col': control_col,
+            'variations': [],
+        })
 
-                rev_c_local = rev_c_local or 0.0
-                rev_c_usd = rev_c_local / exchange_rate
-                
-                variation_data = []
-                control_usd = rev_c_usd
-                for var_info in variations:
-                    variation_col = var_info['variation_col']
-                    rev_v_local = get_kpi_metric_value(data_df, kpi_config, 'numerator', variation_col, debug, fallback_label='Revenue')
-                    
-                    if rev_v_local is None:
-                        continue
-                    
-                    rev_v_local = rev_v_local or 0.0
-                    uplift = ((rev_v_local - rev_c_local) / rev_c_local * 100) if rev_c_local > 0 else 0
+        # Variation 번호 추출 ('... Variation 2' 형식)
+        variation_num = None
+        if 'Variation' in segment_name:
+            try:
+                variation_num = int(segment_name.split()[-1])
+            except:
+                variation_num = len(group['variations']) + 1
+        group['variations'].append({
+            'variation_num': variation_num,
+            'variation_col': variation_col,
+            'segment_name': segment_name,
+        })
 
-                    # verdict는 현지통화 기준의 '모수 부족' 판정(기존 로직)을 유지합니다.
-                    verdict = compute_verdict(uplift, rev_c_local, rev_v_local, confidence=None)
-                    rev_v_usd = rev_v_local / exchange_rate
-                    
-                    variation_data.append({
-                        'variationNum': var_info['variation_num'],
-                        'variationValue': rev_v_usd,
-                        'uplift': uplift,
-                        'confidence': None,
-                        'verdict': verdict,
-                        'controlValue': control_usd,
-                    })
-                
-                if variation_data:
-                    results.append({
-                        'country': country or 'N/A',
-                        'device': base_segment_name or 'All',
-                        'kpiName': kpi_config['name'],
-                        'category': kpi_config.get('category', 'primary'),
-                        'numerator': kpi_config.get('numerator', ''),
-                        'denominator': kpi_config.get('denominator', ''),
-                        'controlValue': rev_c_usd,
-                        'variations': variation_data,
-                        'kpiType': kpi_config['type'],
-                        'exchangeRate': exchange_rate,
-                    })
-            elif kpi_config['type'] == 'variation_only':
-                # Variation Only: Variation 값만 계산, uplift 계산 안 함
-                metric_label = kpi_config.get('numerator', '')
-                den_label = kpi_config.get('denominator', '')
-                
-                variation_data = []
-                for var_info in variations:
-                    variation_col = var_info['variation_col']
-                    variation_num = var_info['variation_num']
-                    
-                    val_v = get_kpi_metric_value(data_df, kpi_config, 'numerator', variation_col, debug)
-                    
-                    if val_v is None:
-                        continue
-                    
-                    # Denominator가 있으면 rate 계산, 없으면 값만 사용
-                    rate_v = None
-                    den_v = None
-                    if den_label and den_label.strip():
-                        den_v = get_kpi_metric_value(data_df, kpi_config, 'denominator', variation_col, debug)
-                        if den_v is not None and den_v > 0:
-                            rate_v = val_v / den_v
-                    
-                    variation_data.append({
-                        'variationNum': variation_num,
-                        'variationValue': val_v,
-                        'variationRate': rate_v,
-                        'uplift': None,  # Uplift 계산 안 함
-                        'confidence': None,  # Confidence 계산 안 함
-                        'verdict': None,  # Verdict 계산 안 함
-                        'denominatorSizeVariation': den_v if den_v is not None else 0,
-                    })
-                
-                if variation_data:
-                    results.append({
-                        'country': country or 'N/A',
-                        'device': base_segment_name or 'All',
-                        'kpiName': kpi_config['name'],
-                        'category': kpi_config.get('category', 'primary'),
-                        'numerator': kpi_config.get('numerator', ''),
-                        'denominator': kpi_config.get('denominator', ''),
-                        'controlValue': None,  # Control 값 없음
-                        'controlRate': None,  # Control rate 없음
-                        'p_gt0': None,
-                        'p_lt0': None,
-                        'p_gt3': None,
-                        'p_lt3': None,
-                        'p_neutral': None,
-                        'decision': None,
-                        'variations': variation_data,
-                    })
-            elif kpi_config['type'] == 'rpv':
-                rev_c = find_metric_value(data_df, 'Revenue', None, control_col, debug)
-                visits_c = find_metric_value(data_df, 'Visits', None, control_col, debug)
-                
-                if rev_c is None or visits_c is None:
-                    continue
-                
-                rpv_c = rev_c / visits_c if visits_c > 0 else 0
-                
-                variation_data = []
-                for var_info in variations:
-                    variation_col = var_info['variation_col']
-                    rev_v = find_metric_value(data_df, 'Revenue', None, variation_col, debug)
-                    visits_v = find_metric_value(data_df, 'Visits', None, variation_col, debug)
-                    
-                    if rev_v is None or visits_v is None:
-                        # 메트릭을 찾지 못한 경우 정보 저장
-                        if rev_v is None:
-                            missing_metrics.append({
-                                'metric': 'Revenue',
-                                'segment': base_segment_name,
-                                'country': country,
-                                'reportOrder': report_order
-                            })
-                        if visits_v is None:
-                            missing_metrics.append({
-                                'metric': 'Visits',
-                                'segment': base_segment_name,
-                                'country': country,
-                                'reportOrder': report_order
-                            })
-                        continue
-                    
-                    rpv_v = rev_v / visits_v if visits_v > 0 else 0
-                    uplift = ((rpv_v - rpv_c) / rpv_c * 100) if rpv_c > 0 else 0
-                    pC, confidence = compute_confidence_rate(rev_c, visits_c, rev_v, visits_v)
-                    verdict = compute_verdict(uplift, rev_c, rev_v, confidence)
-                    p_gt0, p_lt0, p_gt3, p_lt3, p_neutral, decision = compute_bayesian_probs(visits_c, rev_c, visits_v, rev_v)
-                    
-                    variation_data.append({
-                        'variationNum': var_info['variation_num'],
-                        'variationRate': rpv_v,
-                        'uplift': uplift,
-                        'confidence': confidence,
-                        'verdict': verdict,
-                        'p_gt0': p_gt0,
-                        'p_lt0': p_lt0,
-                        'p_gt3': p_gt3,
-                        'p_lt3': p_lt3,
-                        'p_neutral': p_neutral,
-                        'decision': decision,
-                        'controlValue': rev_c,
-                        'variationValue': rev_v,
-                    })
-                
-                if variation_data:
-                    results.append({
-                        'country': country or 'N/A',
-                        'device': base_segment_name,
-                        'kpiName': kpi_config['name'],
-                        'category': kpi_config.get('category', 'primary'),
-                        'numerator': kpi_config.get('numerator', ''),
-                        'denominator': kpi_config.get('denominator', ''),
-                        'controlRate': rpv_c,
-                        'controlValue': rev_c,
-                        'p_gt0': None,
-                        'p_lt0': None,
-                        'p_gt3': None,
-                        'p_lt3': None,
-                        'p_neutral': None,
-                        'decision': None,
-                        'variations': variation_data,
-                    })
-            elif kpi_config['type'] == 'aop':
-                # AOP: Average Order Price
-                # - numerator: Revenue(현지통화) 금액 (USD 환산은 표시용)
-                # - denominator: 주문 수(Order count 등)
-                metric_label = kpi_config.get('numerator', 'Revenue')
-                den_label = kpi_config.get('denominator', '')
-
-                exchange_rate_raw = kpi_config.get('exchangeRate', None)
-                try:
-                    exchange_rate = float(exchange_rate_raw) if exchange_rate_raw not in [None, ''] else 0.0
-                except Exception:
-                    exchange_rate = 0.0
-                if exchange_rate <= 0:
-                    exchange_rate = 1.0
+    groups = list(segment_groups.values())
+    for group in groups:
+        group['variations'] = sorted(group['variations'], key=lambda x: x['variation_num'] or 0)
+    return groups
 
-                if not den_label or not str(den_label).strip():
-                    continue
 
-                rev_c_local = get_kpi_metric_value(data_df, kpi_config, 'numerator', control_col, debug, fallback_label='Revenue')
-                den_c = get_kpi_metric_value(data_df, kpi_config, 'denominator', control_col, debug)
-                if rev_c_local is None or den_c is None:
-                    continue
+def _kpi_operand_values(data_df, kpi_config, field, fallback_label, columns, debug, metric_matrix):
+    """컬럼별 피연산자 값 배열 (없으면 NaN). 같은 컬럼은 한 번만 조회"""
+    looked_up = {}
+    for col in columns:
+        if col not in looked_up:
+            looked_up[col] = get_kpi_metric_value(
+                data_df, kpi_config, field, col, debug, fallback_label=fallback_label, metric_matrix=metric_matrix
+            )
+    return np.array([np.nan if looked_up[col] is None else looked_up[col] for col in columns], dtype=float)
 
-                rev_c_local = rev_c_local or 0.0
-                den_c = den_c or 0.0
-                aop_c_local = rev_c_local / den_c if den_c > 0 else 0.0
-                aop_c_usd = aop_c_local / exchange_rate
 
-                variation_data = []
-                for var_info in variations:
-                    variation_col = var_info['variation_col']
-                    variation_num = var_info['variation_num']
+def _kpi_cell_value(values, name, i):
+    """계산 값 dict에서 i번째 셀 값 (NaN은 None, numpy 실수는 float)"""
+    if name is None:
+        return None
+    value = values[name]
+    if isinstance(value, (np.ndarray, list)):
+        value = value[i]
+    if isinstance(value, (float, np.floating)):
+        return None if np.isnan(value) else float(value)
+    return value
 
-                    rev_v_local = get_kpi_metric_value(data_df, kpi_config, 'numerator', variation_col, debug, fallback_label='Revenue')
-                    den_v = get_kpi_metric_value(data_df, kpi_config, 'denominator', variation_col, debug)
-                    if rev_v_local is None or den_v is None:
-                        continue
 
-                    rev_v_local = rev_v_local or 0.0
-                    den_v = den_v or 0.0
-                    aop_v_local = rev_v_local / den_v if den_v > 0 else 0.0
-                    aop_v_usd = aop_v_local / exchange_rate
-
-                    uplift = ((aop_v_local - aop_c_local) / aop_c_local * 100) if aop_c_local > 0 else 0
-
-                    # 통계(신뢰도/판정)는 RPV처럼 "Revenue/Denominator 비율"을 rate로 보고 계산
-                    _, confidence = compute_confidence_rate(rev_c_local, den_c, rev_v_local, den_v)
-                    verdict = compute_verdict(uplift, den_c, den_v, confidence=confidence)
-
-                    variation_data.append({
-                        'variationNum': variation_num,
-                        'variationRate': aop_v_usd,   # 화면에 표시되는 USD AOP
-                        'variationValue': den_v,      # 모수 부족 계산용 sample size
-                        'uplift': uplift,
-                        'confidence': confidence,
-                        'verdict': verdict,
-                        'p_gt0': None,
-                        'p_lt0': None,
-                        'p_gt3': None,
-                        'p_lt3': None,
-                        'p_neutral': None,
-                        'decision': None,
-                        'controlValue': den_c,
-                        'denominatorSizeVariation': den_v,
-                    })
-
-                if variation_data:
-                    results.append({
-                        'country': country or 'N/A',
-                        'device': base_segment_name,
-                        'kpiName': kpi_config['name'],
-                        'category': kpi_config.get('category', 'primary'),
-                        'numerator': kpi_config.get('numerator', ''),
-                        'denominator': kpi_config.get('denominator', ''),
-                        'controlRate': aop_c_usd,
-                        'controlValue': den_c,  # 모수 부족 계산용 sample size
-                        'p_gt0': None,
-                        'p_lt0': None,
-                        'p_gt3': None,
-                        'p_lt3': None,
-                        'p_neutral': None,
-                        'decision': None,
-                        'variations': variation_data,
-                        'kpiType': kpi_config['type'],
-                        'exchangeRate': exchange_rate,
-                        'denominatorSizeControl': den_c,
-                    })
+def _kpi_cell_stats(kpi_type, values, included, cell_keys=None):
+    """
+    포함된 셀의 신뢰도, 판정, Bayesian 사후확률 (셀 배열 일괄 계산)
+    cell_keys: 셀별 난수열 키 (compute_bayesian_probs_batch 참고)
+    """
+    count = len(included)
+    cells = np.flatnonzero(included)
+    mask = values[kpi_type.stats_mask] if kpi_type.stats_mask else np.ones(count, dtype=bool)
+    stats_cells = cells[mask[cells]]
+
+    confidence = np.full(count, np.nan)
+    if kpi_type.confidence:
+        x, n = kpi_type.confidence
+        confidence[stats_cells] = confidence_rates(
+            values[f'{x}_c'][stats_cells], values[f'{n}_c'][stats_cells],
+            values[f'{x}_v'][stats_cells], values[f'{n}_v'][stats_cells],
+        )[3]
+
+    verdict = np.full(count, None, dtype=object)
+    if kpi_type.verdict_counts:
+        counts = kpi_type.verdict_counts
+        verdict[cells] = verdicts(
+            values['uplift'][cells], values[f'{counts}_c'][cells], values[f'{counts}_v'][cells], confidence[cells],
+        )
+
+    bayesian = [_BAYESIAN_NONE] * count
+    if kpi_type.bayesian:
+        d, n = kpi_type.bayesian
+        cell_probs = compute_bayesian_probs_batch(
+            values[f'{d}_c'][stats_cells], values[f'{n}_c'][stats_cells],
+            values[f'{d}_v'][stats_cells], values[f'{n}_v'][stats_cells],
+            cell_keys=None if cell_keys is None else [cell_keys[i] for i in stats_cells],
+        )
+        for i, probs in zip(stats_cells, cell_probs):
+            bayesian[i] = probs
+    stats = {'confidence': confidence, 'verdict': verdict}
+    for k, key in enumerate(_BAYESIAN_KEYS):
+        stats[key] = [probs[k] for probs in bayesian]
+    return stats
+
+
+def compute_kpi(data_df, kpi_config, country='UK', segment_mapping=None, variation_count=1, debug=False, report_order=None, metric_matrix=None):
+    """
+    KPI 계산 (KPI_TYPES에 등록된 타입 정의로 모든 세그먼트 × Variation 셀을 한 번에 계산)
+    segment_mapping: [('Segment Name', 'Control Col', 'Variation Col'), ...] 형식
+    variation_count: Variation 개수 (기본값: 1)
+    report_order: 리포트 순서 (메트릭을 찾지 못한 경우 에러 메시지에 포함)
+    metric_matrix: 미리 조회한 메트릭 행렬 (없으면 이 KPI의 분자/분모 × 세그먼트 컬럼을 한 번에 조회)
+    """
+    results = []
+    missing_metrics = []  # 찾지 못한 메트릭 정보 저장
+
+    # 세그먼트 매핑이 제공되지 않으면 기본값 사용
+    if segment_mapping:
+        segments = segment_mapping
     else:
-        # 기존 로직: variation_count = 1
-        for seg_info in segments:
-            # segments가 4개 요소를 가질 수 있음 (variation_count > 1인 경우 사용자 입력 세그먼트 사용)
-            if len(seg_info) == 4:
-                segment_name, control_col, variation_col, actual_segment_name = seg_info
-                # actual_segment_name이 사용자가 입력한 세그먼트 이름
-                display_segment_name = actual_segment_name
-            else:
-                segment_name, control_col, variation_col = seg_info
-                # segment_name이 사용자가 입력한 세그먼트 이름 (detect_segments_from_user_input에서 반환)
-                display_segment_name = segment_name
-            
-            if kpi_config['type'] == 'rate' or kpi_config['type'] == 'simple':
-                # Rate KPI: numerator / denominator
-                # Simple 타입도 rate와 동일하게 처리 (denominator는 선택사항)
-                # country 파라미터는 실제로 사용되지 않음 (새 구조에서는 국가 컬럼 없음)
-                num_c = get_kpi_metric_value(data_df, kpi_config, 'numerator', control_col, debug)
-                num_v = get_kpi_metric_value(data_df, kpi_config, 'numerator', variation_col, debug)
-                
-                # denominator가 있으면 rate 계산, 없으면 값만 사용
-                den_label = kpi_config.get('denominator', '')
-                if den_label and den_label.strip():
-                    den_c = get_kpi_metric_value(data_df, kpi_config, 'denominator', control_col, debug)
-                    den_v = get_kpi_metric_value(data_df, kpi_config, 'denominator', variation_col, debug)
-                else:
-                    den_c = None
-                    den_v = None
-            
-                if num_c is None or num_v is None:
-                    if debug:
-                        print(f"DEBUG: KPI 계산 실패 - {kpi_config['name']}, segment: {segment_name}")
-                        print(f"  num_c: {num_c}, num_v: {num_v}, den_c: {den_c}, den_v: {den_v}")
-                        # 메트릭을 찾지 못한 경우 정보 저장
-                        if num_c is None:
-                            missing_metrics.append({
-                                'metric': kpi_config['numerator'],
-                                'segment': display_segment_name,
-                                'country': country,
-                                'reportOrder': report_order
-                            })
-                        if num_v is None:
-                            missing_metrics.append({
-                                'metric': kpi_config['numerator'],
-                                'segment': display_segment_name,
-                                'country': country,
-                                'reportOrder': report_order
-                            })
-                        # denominator가 있는 경우에만 missing 체크
-                        if den_label and den_label.strip():
-                            if den_c is None:
-                                missing_metrics.append({
-                                    'metric': kpi_config['denominator'],
-                                    'segment': display_segment_name,
-                                    'country': country,
-                                    'reportOrder': report_order
-                                })
-                            if den_v is None:
-                                missing_metrics.append({
-                                    'metric': kpi_config['denominator'],
-                                    'segment': display_segment_name,
-                                    'country': country,
-                                    'reportOrder': report_order
-                                })
-                    continue
-            
-            # 디버그: 실제 값 출력
-            if debug and (kpi_config['type'] == 'rate' or kpi_config['type'] == 'simple'):
-                print(f"DEBUG: KPI 계산 - {kpi_config['name']}, segment: {segment_name}")
-                print(f"  numerator: {kpi_config['numerator']}, denominator: {kpi_config.get('denominator', '')}")
-                print(f"  num_c: {num_c}, num_v: {num_v}, den_c: {den_c}, den_v: {den_v}")
-            
-                # denominator가 있으면 rate 계산, 없으면 값만 사용
-                if den_c is not None and den_v is not None and den_c > 0 and den_v > 0:
-                    rate_c = num_c / den_c
-                    rate_v = num_v / den_v
-                    uplift = ((rate_v - rate_c) / rate_c * 100) if rate_c > 0 else 0
-                    pC, confidence = compute_confidence_rate(num_c, den_c, num_v, den_v)
-                    verdict = compute_verdict(uplift, num_c, num_v, confidence)
-                    p_gt0, p_lt0, p_gt3, p_lt3, p_neutral, decision = compute_bayesian_probs(den_c, num_c, den_v, num_v)
-                else:
-                    # denominator가 없으면 값만 사용 (simple 타입)
-                    rate_c = None
-                    rate_v = None
-                    uplift = ((num_v - num_c) / num_c * 100) if num_c > 0 else 0
-                    confidence = None
-                    verdict = compute_verdict(uplift, num_c, num_v, confidence=None)
-                    p_gt0, p_lt0, p_gt3, p_lt3, p_neutral, decision = None, None, None, None, None, None
-                
-                if debug:
-                    print(f"  rate_c: {rate_c}, rate_v: {rate_v}, uplift: {uplift}")
-                
-                results.append({
-                    'country': country or 'N/A',  # 국가 정보가 없을 수 있음
-                    'device': display_segment_name or 'All',  # 사용자가 입력한 세그먼트 이름 사용
-                    'kpiName': kpi_config['name'],
-                    'category': kpi_config.get('category', 'primary'),
-                    'numerator': kpi_config.get('numerator', ''),
-                    'denominator': kpi_config.get('denominator', ''),
-                    'controlValue': num_c,
-                    'variationValue': num_v,
-                    'controlRate': rate_c,
-                    'variationRate': rate_v,
-                    'uplift': uplift,
-                    'confidence': confidence,
-                    'verdict': verdict,
-                    'p_gt0': p_gt0,
-                    'p_lt0': p_lt0,
-                    'p_gt3': p_gt3,
-                    'p_lt3': p_lt3,
-                    'p_neutral': p_neutral,
-                    'decision': decision,
-                    'denominatorSize': (den_c + den_v) if (den_c is not None and den_v is not None) else 0,
-                    'denominatorSizeControl': den_c if den_c is not None else 0,
-                    'denominatorSizeVariation': den_v if den_v is not None else 0,
-                })
-            
-            elif kpi_config['type'] == 'variation_only':
-                # Variation Only: Variation 값만 계산, uplift 계산 안 함
-                metric_label = kpi_config.get('numerator', '')
-                den_label = kpi_config.get('denominator', '')
-                
-                # Variation 값만 추출
-                val_v = get_kpi_metric_value(data_df, kpi_config, 'numerator', variation_col, debug)
-                
-                if val_v is None:
-                    if debug:
-                        print(f"DEBUG: Variation Only KPI 계산 실패 - {kpi_config['name']}, segment: {segment_name}")
-                    missing_metrics.append({
-                        'metric': metric_label,
-                        'segment': display_segment_name,
-                        'country': country,
-                        'reportOrder': report_order
-                    })
-                    continue
-                
-                # Denominator가 있으면 rate 계산, 없으면 값만 사용
-                rate_v = None
-                den_v = None
-                if den_label and den_label.strip():
-                    den_v = get_kpi_metric_value(data_df, kpi_config, 'denominator', variation_col, debug)
-                    if den_v is not None and den_v > 0:
-                        rate_v = val_v / den_v
-                
-                # Variation Only는 uplift 계산 안 함
-                results.append({
-                    'country': country or 'N/A',
-                    'device': display_segment_name or 'All',
-                    'kpiName': kpi_config['name'],
-                    'category': kpi_config.get('category', 'primary'),
-                    'numerator': kpi_config.get('numerator', ''),
-                    'denominator': kpi_config.get('denominator', ''),
-                    'controlValue': None,  # Control 값 없음
-                    'variationValue': val_v,
-                    'controlRate': None,  # Control rate 없음
-                    'variationRate': rate_v,  # Denominator가 있으면 rate, 없으면 None
-                    'uplift': None,  # Uplift 계산 안 함
-                    'confidence': None,  # Confidence 계산 안 함
-                    'verdict': None,  # Verdict 계산 안 함
-                    'p_gt0': None,
-                    'p_lt0': None,
-                    'p_gt3': None,
-                    'p_lt3': None,
-                    'p_neutral': None,
-                    'decision': None,
-                    'denominatorSize': den_v if den_v is not None else 0,
-                    'denominatorSizeControl': 0,
-                    'denominatorSizeVariation': den_v if den_v is not None else 0,
-                })
-            
-            elif kpi_config['type'] == 'revenue':
-                # Revenue: numerator 값 사용
-                metric_label = kpi_config.get('numerator', 'Revenue')
+        # data_df에서 세그먼트 정보 가져오기
+        segment_names = getattr(data_df, 'attrs', {}).get('segment_names', {})
+        if segment_names:
+            segments = detect_segments(segment_names, variation_count)
+        else:
+            segments = [
+                ('All', 'D', 'E'),
+            ]
 
-                # 가정: 입력 환율(exchangeRate) = 현지통화 1 USD = exchangeRate
-                # => USD = 현지통화 / exchangeRate
-                exchange_rate_raw = kpi_config.get('exchangeRate', None)
-                try:
-                    exchange_rate = float(exchange_rate_raw) if exchange_rate_raw not in [None, ''] else 0.0
-                except Exception:
-                    exchange_rate = 0.0
-                if exchange_rate <= 0:
-                    exchange_rate = 1.0
-
-                rev_c_local = get_kpi_metric_value(data_df, kpi_config, 'numerator', control_col, debug, fallback_label='Revenue')
-                rev_v_local = get_kpi_metric_value(data_df, kpi_config, 'numerator', variation_col, debug, fallback_label='Revenue')
-                
-                if rev_c_local is None or rev_v_local is None:
-                    if debug:
-                        print(f"DEBUG: Revenue KPI 계산 실패 - {kpi_config['name']}, segment: {segment_name}")
-                        # 메트릭을 찾지 못한 경우 정보 저장
-                        if rev_c_local is None or rev_v_local is None:
-                            missing_metrics.append({
-                                'metric': metric_label,
-                                'segment': display_segment_name,
-                                'country': country,
-                                'reportOrder': report_order
-                            })
-                    continue
-                
-                rev_c_local = rev_c_local or 0.0
-                rev_v_local = rev_v_local or 0.0
-                uplift = ((rev_v_local - rev_c_local) / rev_c_local * 100) if rev_c_local > 0 else 0
-                
-                # Revenue는 variance 데이터가 없으므로 confidence 계산 불가
-                # 샘플 크기는 Revenue 값 자체(분자)를 기준으로 판단
-                rev_c_usd = rev_c_local / exchange_rate
-                rev_v_usd = rev_v_local / exchange_rate
-                
-                # Revenue는 confidence가 없으므로 None 전달
-                # 샘플 크기는 Revenue 값(분자) 기준
-                verdict = compute_verdict(uplift, rev_c_local, rev_v_local, confidence=None)
-                
-                results.append({
-                    'country': country or 'N/A',  # 국가 정보가 없을 수 있음
-                    'device': display_segment_name or 'All',  # 사용자가 입력한 세그먼트 이름 사용
-                    'kpiName': kpi_config['name'],
-                    'category': kpi_config.get('category', 'primary'),
-                    'numerator': kpi_config.get('numerator', ''),
-                    'denominator': kpi_config.get('denominator', ''),
-                    'controlValue': rev_c_usd,
-                    'variationValue': rev_v_usd,
-                    'controlRate': None,
-                    'variationRate': None,
-                    'uplift': uplift,
-                    'confidence': None,
-                    'verdict': verdict,
-                    'p_gt0': None,
-                    'p_lt0': None,
-                    'p_gt3': None,
-                    'p_lt3': None,
-                    'p_neutral': None,
-                    'decision': None,
-                    'denominatorSize': rev_c_usd + rev_v_usd,  # 표시용 USD 값 기준
-                    'denominatorSizeControl': rev_c_usd,
-                    'denominatorSizeVariation': rev_v_usd,
-                    'kpiType': kpi_config['type'],
-                    'exchangeRate': exchange_rate,
+    kpi_type = KPI_TYPES.get(kpi_config['type'])
+    if kpi_type is None:
+        if debug:
+            print(f"DEBUG: 알 수 없는 KPI 타입 - {kpi_config.get('name')}, type: {kpi_config['type']}")
+        return results, missing_metrics
+
+    # 분모 이름이 없으면 분모 피연산자는 조회하지 않음
+    has_denominator = _has_label(kpi_config.get('denominator', ''))
+    applicable = {
+        name for name, (field, _) in kpi_type.operands.items()
+        if field != 'denominator' or has_denominator
+    }
+    if any(name not in applicable for name in kpi_type.requires):
+        return results, missing_metrics
+
+    # 필요한 메트릭 × 컬럼 값을 한 번에 조회 (세그먼트·Variation마다 프레임을 다시 검색하지 않음)
+    if metric_matrix is None:
+        metric_matrix = resolve_metric_matrix(data_df, kpi_metric_labels(kpi_config), segment_metric_columns(segments))
+
+    groups = _kpi_segment_groups(segments, variation_count)
+    cell_groups = np.array([g for g, group in enumerate(groups) for _ in group['variations']], dtype=int)
+    variation_cols = [var_info['variation_col'] for group in groups for var_info in group['variations']]
+    control_cols = [group['control_col'] for group in groups]
+
+    # 피연산자 배열: Control은 그룹 단위로 조회 후 셀로 펼침
+    c, v = {}, {}
+    for name, (field, fallback_label) in kpi_type.operands.items():
+        group_values = np.full(len(groups), np.nan)
+        if name in applicable and name in kpi_type.control_operands:
+            group_values = _kpi_operand_values(data_df, kpi_config, field, fallback_label, control_cols, debug, metric_matrix)
+        c[name] = group_values[cell_groups]
+        v[name] = np.full(len(variation_cols), np.nan)
+        if name in applicable:
+            v[name] = _kpi_operand_values(data_df, kpi_config, field, fallback_label, variation_cols, debug, metric_matrix)
+
+    values = kpi_type.formulas(c, v, kpi_config)
+    for name in kpi_type.operands:
+        values[f'{name}_c'] = c[name]
+        values[f'{name}_v'] = v[name]
+
+    control_ok = np.ones(len(cell_groups), dtype=bool)
+    for name in kpi_type.control_required:
+        control_ok &= ~np.isnan(c[name])
+    variation_ok = np.ones(len(cell_groups), dtype=bool)
+    for name in kpi_type.variation_required:
+        variation_ok &= ~np.isnan(v[name])
+    included = control_ok & variation_ok
+    cell_keys = [
+        (country, report_order, kpi_config['name'], group['name'], var_info['variation_num'])
+        for group in groups for var_info in group['variations']
+    ]
+    values.update(_kpi_cell_stats(kpi_type, values, included, cell_keys))
+
+    if debug:
+        print(f"DEBUG compute_kpi: KPI={kpi_config['name']}, type={kpi_config['type']}, "
+              f"세그먼트 {len(groups)}개, 셀 {len(cell_groups)}개 중 계산 {int(included.sum())}개")
+        print(f"  numerator={kpi_config.get('numerator', '')}, denominator={kpi_config.get('denominator', '')}")
+
+    def record_missing(rules, i, segment):
+        for metric_label, names in rules:
+            if any(name.rsplit('_', 1)[0] in applicable and np.isnan(values[name][i]) for name in names):
+                missing_metrics.append({
+                    'metric': metric_label(kpi_config),
+                    'segment': segment,
+                    'country': country,
+                    'reportOrder': report_order
                 })
-            
-            elif kpi_config['type'] == 'aop':
-                # AOP: Average Order Price
-                # - 입력 환율로 Revenue(현지통화)를 USD로 변환해서 표시합니다.
-                # - 신뢰도/판정은 기존 RPV처럼 (환율로 스케일하기 전) revenue/local 값을 사용합니다.
-                metric_label = kpi_config.get('numerator', 'Revenue')
-                den_label = kpi_config.get('denominator', '')
-
-                exchange_rate_raw = kpi_config.get('exchangeRate', None)
-                try:
-                    exchange_rate = float(exchange_rate_raw) if exchange_rate_raw not in [None, ''] else 0.0
-                except Exception:
-                    exchange_rate = 0.0
-                if exchange_rate <= 0:
-                    exchange_rate = 1.0
 
-                if not den_label or not str(den_label).strip():
-                    continue
+    def build(fields, i, extra=None):
+        result = {}
+        for key, name in fields:
+            result[key] = extra[key] if extra and key in extra else _kpi_cell_value(values, name, i)
+        return result
 
-                rev_c_local = get_kpi_metric_value(data_df, kpi_config, 'numerator', control_col, debug, fallback_label='Revenue')
-                rev_v_local = get_kpi_metric_value(data_df, kpi_config, 'numerator', variation_col, debug, fallback_label='Revenue')
-                den_c = get_kpi_metric_value(data_df, kpi_config, 'denominator', control_col, debug)
-                den_v = get_kpi_metric_value(data_df, kpi_config, 'denominator', variation_col, debug)
+    header = {
+        'country': country or 'N/A',
+        'kpiName': kpi_config['name'],
+        'category': kpi_config.get('category', 'primary'),
+        'numerator': kpi_config.get('numerator', ''),
+        'denominator': kpi_config.get('denominator', ''),
+    }
 
-                if rev_c_local is None or rev_v_local is None or den_c is None or den_v is None:
-                    continue
+    for g, group in enumerate(groups):
+        cells = np.flatnonzero(cell_groups == g)
+        if variation_count <= 1:
+            i = cells[0]
+            if not included[i]:
+                if debug:
+                    print(f"DEBUG: KPI 계산 실패 - {kpi_config['name']}, segment: {group['variations'][0]['segment_name']}")
+                record_missing(kpi_type.row_missing, i, group['name'])
+                continue
+            if debug:
+                print(f"DEBUG: KPI 계산 - {kpi_config['name']}, segment: {group['variations'][0]['segment_name']}, "
+                      f"uplift: {values['uplift'][i] if 'uplift' in values else None}")
+            result = {'country': header['country'], 'device': group['name'] or 'All'}
+            result.update({key: header[key] for key in ('kpiName', 'category', 'numerator', 'denominator')})
+            result.update(build(kpi_type.row_fields, i))
+            results.append(result)
+            continue
+
+        if len(cells) == 0 or not control_ok[cells[0]]:
+            if debug:
+                print(f"  경고: Control 값이 없습니다. 건너뜁니다. segment={group['name']}")
+            if len(cells):
+                record_missing(kpi_type.group_missing, cells[0], group['name'])
+            continue
+        variation_data = []
+        for var_info, i in zip(group['variations'], cells):
+            if not variation_ok[i]:
+                if debug:
+                    print(f"    경고: Variation {var_info['variation_num']} 값이 없습니다. 건너뜁니다.")
+                record_missing(kpi_type.variation_missing, i, group['name'])
+                continue
+            variation = {'variationNum': var_info['variation_num']}
+            variation.update(build(kpi_type.variation_fields, i))
+            variation_data.append(variation)
+        if variation_data:
+            result = {'country': header['country'], 'device': group['name'] or 'All'}
+            result.update({key: header[key] for key in ('kpiName', 'category', 'numerator', 'denominator')})
+            result.update(build(kpi_type.group_fields, cells[0], extra={'variations': variation_data}))
+            results.append(result)
 
-                rev_c_local = rev_c_local or 0.0
-                rev_v_local = rev_v_local or 0.0
-                den_c = den_c or 0.0
-                den_v = den_v or 0.0
-
-                aop_c_local = rev_c_local / den_c if den_c > 0 else 0.0
-                aop_v_local = rev_v_local / den_v if den_v > 0 else 0.0
-
-                aop_c_usd = aop_c_local / exchange_rate
-                aop_v_usd = aop_v_local / exchange_rate
-
-                uplift = ((aop_v_local - aop_c_local) / aop_c_local * 100) if aop_c_local > 0 else 0
-
-                # Confidence/판정은 local 값 기준
-                _, confidence = compute_confidence_rate(rev_c_local, den_c, rev_v_local, den_v)
-                verdict = compute_verdict(uplift, den_c, den_v, confidence=confidence)
-
-                results.append({
-                    'country': country or 'N/A',
-                    'device': display_segment_name or 'All',
-                    'kpiName': kpi_config['name'],
-                    'category': kpi_config.get('category', 'primary'),
-                    'numerator': kpi_config.get('numerator', ''),
-                    'denominator': kpi_config.get('denominator', ''),
-                    'controlValue': den_c,        # 모수부족 계산용 sample size
-                    'variationValue': den_v,
-                    'controlRate': aop_c_usd,     # 화면에 표시되는 USD AOP
-                    'variationRate': aop_v_usd,
-                    'uplift': uplift,
-                    'confidence': confidence,
-                    'verdict': verdict,
-                    'p_gt0': None,
-                    'p_lt0': None,
-                    'p_gt3': None,
-                    'p_lt3': None,
-                    'p_neutral': None,
-                    'decision': None,
-                    'denominatorSize': den_c + den_v,
-                    'denominatorSizeControl': den_c,
-                    'denominatorSizeVariation': den_v,
-                    'kpiType': kpi_config['type'],
-                    'exchangeRate': exchange_rate,
-                })
-            
-            elif kpi_config['type'] == 'rpv':
-                # RPV: Revenue / Visits
-                rev_c = find_metric_value(data_df, 'Revenue', None, control_col, debug)
-                rev_v = find_metric_value(data_df, 'Revenue', None, variation_col, debug)
-                visits_c = find_metric_value(data_df, 'Visits', None, control_col, debug)
-                visits_v = find_metric_value(data_df, 'Visits', None, variation_col, debug)
-                
-                if rev_c is None or rev_v is None or visits_c is None or visits_v is None:
-                    if debug:
-                        print(f"DEBUG: RPV KPI 계산 실패 - {kpi_config['name']}, segment: {segment_name}")
-                        # 메트릭을 찾지 못한 경우 정보 저장
-                        if rev_c is None or rev_v is None:
-                            missing_metrics.append({
-                                'metric': 'Revenue',
-                                'segment': display_segment_name,
-                                'country': country,
-                                'reportOrder': report_order
-                            })
-                        if visits_c is None or visits_v is None:
-                            missing_metrics.append({
-                                'metric': 'Visits',
-                                'segment': display_segment_name,
-                                'country': country,
-                                'reportOrder': report_order
-                            })
-                    continue
-                
-                rpv_c = rev_c / visits_c if visits_c > 0 else 0
-                rpv_v = rev_v / visits_v if visits_v > 0 else 0
-                
-                uplift = ((rpv_v - rpv_c) / rpv_c * 100) if rpv_c > 0 else 0
-                
-                # RPV는 revenue와 visits의 비율이므로 confidence 계산 복잡
-                # 간단히 visits를 기준으로 계산
-                pC, confidence = compute_confidence_rate(rev_c, visits_c, rev_v, visits_v)
-                
-                # 샘플 크기는 Revenue 값(분자) 기준
-                verdict = compute_verdict(uplift, rev_c, rev_v, confidence)
-                p_gt0, p_lt0, p_gt3, p_lt3, p_neutral, decision = compute_bayesian_probs(visits_c, rev_c, visits_v, rev_v)
-                
-                results.append({
-                    'country': country or 'N/A',  # 국가 정보가 없을 수 있음
-                    'device': display_segment_name or 'All',  # 사용자가 입력한 세그먼트 이름 사용
-                    'kpiName': kpi_config['name'],
-                    'category': kpi_config.get('category', 'primary'),
-                    'numerator': kpi_config.get('numerator', ''),
-                    'denominator': kpi_config.get('denominator', ''),
-                    'controlValue': rev_c,
-                    'variationValue': rev_v,
-                    'controlRate': rpv_c,
-                    'variationRate': rpv_v,
-                    'uplift': uplift,
-                    'confidence': confidence,
-                    'verdict': verdict,
-                    'p_gt0': p_gt0,
-                    'p_lt0': p_lt0,
-                    'p_gt3': p_gt3,
-                    'p_lt3': p_lt3,
-                    'p_neutral': p_neutral,
-                    'decision': decision,
-                    'denominatorSize': visits_c + visits_v,
-                })
-    
     return results, missing_metrics
 
 def compute_secondary_kpi(data_df, kpi_label, country='UK', segment_mapping=None, debug=False):
@@ -2099,15 +2216,236 @@ def generate_insights(primary_results, use_ai=False):
     
     return insights
 
+def get_parse_cache(config):
+    """
+    파싱 결과 디스크 캐시 생성. config의 parseCache=false 또는 환경변수 PARSE_CACHE=0이면 None.
+    캐시 위치: PARSE_CACHE_DIR (기본: 프로젝트 tmp/parse_cache)
+    """
+    if not config.get('parseCache', True) or os.getenv('PARSE_CACHE', '1') == '0':
+        return None
+    cache_dir = os.getenv('PARSE_CACHE_DIR') or (Path(__file__).parent.parent / 'tmp' / 'parse_cache')
+    try:
+        max_mb = float(os.getenv('PARSE_CACHE_MAX_MB', PARSE_CACHE_DEFAULT_MAX_MB))
+    except ValueError:
+        max_mb = PARSE_CACHE_DEFAULT_MAX_MB
+    return ParseCache(cache_dir, PARSER_VERSION, int(max_mb * 1024 * 1024))
+
+
+def parse_excel_cached(file_path, parse_cache=None):
+    """
+    캐시가 있으면 파일 내용이 같은 이전 파싱 결과를 재사용하는 parse_excel.
+    반환: (parse_excel 결과, 캐시 적중 여부)
+    """
+    if parse_cache is None:
+        return parse_excel(file_path), False
+    result, hit = parse_cache.get_or_parse(file_path, parse_excel)
+    print(f"DEBUG: 파싱 캐시 {'적중' if hit else '미스'}: {Path(file_path).name}")
+    return result, hit
+
+
+def _parse_cache_summary(parse_cache, hit_flags):
+    if parse_cache is None:
+        return ""
+    hits = sum(1 for hit in hit_flags if hit)
+    return f" (캐시 적중 {hits}, 미스 {len(hit_flags) - hits})"
+
+
+def _available_cpu_count():
+    """현재 프로세스가 사용할 수 있는 CPU 수 (컨테이너 CPU 제한 반영)"""
+    if hasattr(os, 'sched_getaffinity'):
+        return max(1, len(os.sched_getaffinity(0)))
+    return os.cpu_count() or 1
+
+
+def get_parse_backend(config, file_count):
+    """
+    다중 파일 파싱 백엔드 선택. 반환: ('thread' | 'process', 워커 수)
+    config의 parseBackend 또는 환경변수 PARSE_BACKEND (auto/thread/process, 기본 auto).
+    openpyxl 파싱은 GIL에 묶여 스레드로는 거의 빨라지지 않으므로, auto는 파일이
+    PROCESS_POOL_MIN_FILES개 이상이고 CPU가 2개 이상일 때 프로세스 풀을 사용한다.
+    """
+    backend = str(config.get('parseBackend') or os.getenv('PARSE_BACKEND') or 'auto').lower()
+    if backend not in PARSE_BACKENDS:
+        print(f"DEBUG: 알 수 없는 파싱 백엔드 '{backend}', auto로 처리")
+        backend = 'auto'
+    cpus = _available_cpu_count()
+    if backend == 'auto':
+        backend = 'process' if file_count >= PROCESS_POOL_MIN_FILES and cpus > 1 else 'thread'
+    if backend == 'process':
+        return 'process', max(1, min(cpus, file_count))
+    return 'thread', max(1, min(THREAD_POOL_MAX_WORKERS, file_count))
+
+
 def _parse_one_file(args):
-    """한 개 파일 파싱 (병렬 실행용). (idx, file_info) -> (idx, file_info, data_df, segment_names, error)."""
-    idx, file_info = args
+    """
+    한 개 파일 파싱 (병렬 실행용, 프로세스 풀 워커에서도 실행).
+    (idx, file_info, parse_cache) -> (idx, data_df, segment_names, cache_hit, error)
+    프로세스 간 전달량을 줄이기 위해 main()에서 쓰는 값만 돌려준다.
+    """
+    idx, file_info, parse_cache = args
     file_path = file_info['path']
     try:
-        data_df, segment_names, detected_country, is_multi_country, countries = parse_excel(file_path)
-        return (idx, file_info, data_df, segment_names, None)
+        result, hit = parse_excel_cached(file_path, parse_cache)
+        data_df, segment_names = result[0], result[1]
+        return (idx, data_df, segment_names, hit, None)
     except Exception as e:
-        return (idx, file_info, None, None, e)
+        return (idx, None, None, False, e)
+
+
+def parse_files_parallel(files_config, parse_cache, backend, max_workers):
+    """
+    files_config의 파일들을 병렬 파싱. 반환: {idx: (data_df, segment_names, cache_hit, error)}
+    프로세스 풀을 만들 수 없는 환경이면 스레드 풀로 대체하고,
+    작업 중 워커가 죽으면(OOM 등) 끝나지 않은 파일만 스레드 풀로 다시 파싱한다.
+    """
+    tasks = [(idx, fi, parse_cache) for idx, fi in enumerate(files_config)]
+    if backend == 'process':
+        try:
+            executor = ProcessPoolExecutor(max_workers=max_workers)
+        except (OSError, NotImplementedError) as e:
+            print(f"DEBUG: 프로세스 풀 생성 실패, 스레드 풀로 파싱: {e}")
+            backend = 'thread'
+            max_workers = min(THREAD_POOL_MAX_WORKERS, len(tasks))
+    if backend != 'process':
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    results_by_idx = {}
+
+    def run(executor, pending):
+        with executor:
+            futures = [executor.submit(_parse_one_file, task) for task in pending]
+            for future in as_completed(futures):
+                idx, data_df, segment_names, hit, err = future.result()
+                results_by_idx[idx] = (data_df, segment_names, hit, err)
+
+    try:
+        run(executor, tasks)
+    except BrokenProcessPool as e:
+        remaining = [task for task in tasks if task[0] not in results_by_idx]
+        print(f"DEBUG: 파싱 워커 비정상 종료, 남은 파일 {len(remaining)}개를 스레드 풀로 파싱: {e}")
+        run(ThreadPoolExecutor(max_workers=max(1, min(THREAD_POOL_MAX_WORKERS, len(remaining)))), remaining)
+    return results_by_idx
+
+
+def partition_combinations(combined_data_df):
+    """
+    합쳐진 프레임을 (Report Order, Country) 조합별로 한 번에 분할.
+    반환: [(report_order, country, data_df)] (조합이 처음 나온 순서, 값이 빈 조합 제외)
+    data_df는 Segment를 A열, 나머지를 B, C, D...열로 이름 붙인 연속 행 구간 (복사하지 않은 뷰).
+    파일별 행은 concat으로 이미 연속해 있으므로 보통 정렬 없이 구간만 자른다.
+    """
+    keys = combined_data_df[['Report Order', 'Country']]
+    group_codes = keys.groupby(['Report Order', 'Country'], sort=False).ngroup()
+    group_count = int(group_codes.max()) + 1 if group_codes.notna().any() else 0
+    # 값이 빈(NaN) 조합의 행은 맨 뒤 그룹으로 보내 분할 대상에서 제외
+    codes = group_codes.fillna(group_count).to_numpy(dtype=np.int64)
+    data = combined_data_df.drop(columns=['Report Order', 'Country'])
+    data.columns = column_labels(len(data.columns))
+    if np.any(np.diff(codes) < 0):
+        # 같은 조합의 행이 떨어져 있으면 한 번만 안정 정렬
+        order = np.argsort(codes, kind='stable')
+        data, keys, codes = data.take(order), keys.take(order), codes[order]
+
+    group_ids = np.arange(group_count)
+    starts = np.searchsorted(codes, group_ids, side='left')
+    stops = np.searchsorted(codes, group_ids, side='right')
+    return [
+        (keys.iat[start, 0], keys.iat[start, 1], data.iloc[start:stop])
+        for start, stop in zip(starts, stops)
+    ]
+
+
+def _peak_memory_summary():
+    """최대 메모리 사용량(RSS) 요약 문자열. resource 모듈이 없는 환경(Windows)은 '측정 불가'"""
+    try:
+        import resource
+    except ImportError:
+        return "최대 메모리 측정 불가"
+    # Linux는 KB, macOS는 바이트 단위
+    unit = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit
+    workers = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / unit
+    return f"최대 메모리 {own:.0f}MB (종료된 워커 최대 {workers:.0f}MB)"
+
+
+def get_analysis_backend(config, combination_count):
+    """
+    (Report Order, Country) 조합 KPI 분석 백엔드 선택. 반환: ('sequential' | 'process', 워커 수)
+    config의 analysisBackend 또는 환경변수 ANALYSIS_BACKEND (auto/sequential/process, 기본 auto).
+    auto는 조합이 ANALYSIS_POOL_MIN_COMBINATIONS개 이상이고 CPU가 2개 이상일 때 프로세스 풀을 사용한다.
+    """
+    backend = str(config.get('analysisBackend') or os.getenv('ANALYSIS_BACKEND') or 'auto').lower()
+    if backend not in ANALYSIS_BACKENDS:
+        print(f"DEBUG: 알 수 없는 분석 백엔드 '{backend}', auto로 처리")
+        backend = 'auto'
+    cpus = _available_cpu_count()
+    if backend == 'auto':
+        backend = 'process' if combination_count >= ANALYSIS_POOL_MIN_COMBINATIONS and cpus > 1 else 'sequential'
+    if backend == 'process' and combination_count > 1:
+        return 'process', max(1, min(cpus, combination_count))
+    return 'sequential', 1
+
+
+def _analyze_combination(args):
+    """
+    (Report Order, Country) 조합 하나의 KPI 분석 (프로세스 풀 워커에서도 실행).
+    (step, data_df, segment_names, country, is_multi_country, countries, config, report_order)
+    -> (step, primary 결과)
+    """
+    step, data_df, segment_names, country, is_multi_country, countries, config, report_order = args
+    country_results = process_single_file(
+        data_df, segment_names, country, is_multi_country, countries, country, config, report_order
+    )
+    return step, country_results['primary']
+
+
+def _analyze_combination_in_worker(args):
+    """
+    프로세스 풀 워커용 _analyze_combination. 워커의 Bayesian 캐시 새 항목도 함께 돌려줘서
+    디스크 저장은 부모 프로세스가 작업 끝에 한 번만 하도록 한다.
+    -> (step, primary 결과, [(캐시 키, 결과)])
+    """
+    step, primary = _analyze_combination(args)
+    cache = get_bayesian_cache()
+    return step, primary, (cache.take_pending() if cache is not None else [])
+
+
+def analyze_combinations(tasks, backend, max_workers, on_progress=None):
+    """
+    _analyze_combination 작업들을 실행. 반환: tasks 순서대로 정렬한 primary 결과 목록.
+    on_progress(완료 수, 전체 수)는 결과가 도착할 때마다 호출 (완료 순서와 무관하게 완료 수는 단조 증가).
+    Bayesian 난수는 셀 키로 만든 난수열을 쓰므로 워커 배치와 무관하게 같은 결과가 나온다.
+    프로세스 풀을 만들 수 없는 환경이면 순차 실행으로 대체하고,
+    작업 중 워커가 죽으면(OOM 등) 끝나지 않은 조합만 순차 실행한다.
+    """
+    results_by_step = {}
+    cache = get_bayesian_cache()
+
+    def collect(step, primary, cache_items=()):
+        results_by_step[step] = primary
+        if cache is not None:
+            cache.put_many(cache_items)
+        if on_progress:
+            on_progress(len(results_by_step), len(tasks))
+
+    executor = None
+    if backend == 'process':
+        try:
+            executor = ProcessPoolExecutor(max_workers=max_workers)
+        except (OSError, NotImplementedError) as e:
+            print(f"DEBUG: 프로세스 풀 생성 실패, 조합을 순차 분석: {e}")
+    if executor is not None:
+        try:
+            with executor:
+                futures = [executor.submit(_analyze_combination_in_worker, task) for task in tasks]
+                for future in as_completed(futures):
+                    collect(*future.result())
+        except BrokenProcessPool as e:
+            print(f"DEBUG: 분석 워커 비정상 종료, 남은 조합 {len(tasks) - len(results_by_step)}개를 순차 분석: {e}")
+    for task in tasks:
+        if task[0] not in results_by_step:
+            collect(*_analyze_combination(task))
+    return [results_by_step[step] for step in range(len(tasks))]
 
 
 def calculate_days_from_config(config, country, report_order):
@@ -2175,6 +2513,147 @@ def clean_results_for_json(results):
         return None
     return results
 
+def label_parsed_data(frames, file_infos, config):
+    """
+    파싱 데이터에 사용자 세그먼트/Variation 개수로 열 이름을 붙인 프레임 (분석 프레임은 바꾸지 않음).
+    file_infos가 None이면 단일 파일(frames[0]), 아니면 파일별 Report Order/Country를 붙여 합친다.
+    """
+    if file_infos is None:
+        return _label_single_parsed_data(frames[0], config)
+    return _label_combined_parsed_data(frames, file_infos, config)
+
+
+def _label_combined_parsed_data(frames, file_infos, config):
+    """여러 파일: Report Order, Country, Segment + 세그먼트별 Control/Variation 열 이름"""
+    all_parsed_data = []
+    for data_df, file_info in zip(frames, file_infos):
+        data_df_with_metadata = data_df.rename(columns={'A': 'Segment'})
+        data_df_with_metadata.insert(0, 'Report Order', file_info.get('reportOrder', '1st report'))
+        data_df_with_metadata.insert(1, 'Country', file_info.get('country', 'UK'))
+        all_parsed_data.append(data_df_with_metadata)
+    combined_data_df = pd.concat(all_parsed_data, ignore_index=True)
+    
+    # 사용자가 입력한 세그먼트와 Variation 개수로 열 이름 생성
+    user_segments = config.get('segments', [])
+    if not user_segments:
+        user_segments = ['All Visits']
+    variation_count = config.get('variationCount', 1)
+    
+    # 열 이름 생성
+    column_names = ['Report Order', 'Country', 'Segment']  # 처음 3개 컬럼
+    
+    # 각 세그먼트에 대해 Control과 Variation들 추가
+    for segment_name in user_segments:
+        if segment_name and segment_name.strip():
+            segment_name = segment_name.strip()
+            # Control 추가
+            column_names.append(f"{segment_name} - Control")
+            # Variation들 추가
+            for var_idx in range(1, variation_count + 1):
+                column_names.append(f"{segment_name} - Variation {var_idx}")
+    
+    # 기존 데이터프레임의 컬럼 수 확인
+    existing_cols = list(combined_data_df.columns)
+    # 열 이름이 기존 컬럼 수와 맞지 않으면 조정
+    if len(column_names) < len(existing_cols):
+        # 부족한 열은 기존 이름 유지
+        for i in range(len(column_names), len(existing_cols)):
+            column_names.append(existing_cols[i])
+    elif len(column_names) > len(existing_cols):
+        # 열 이름이 더 많으면 필요한 만큼만 사용
+        column_names = column_names[:len(existing_cols)]
+    
+    # 열 이름 적용
+    combined_data_df.columns = column_names[:len(combined_data_df.columns)]
+    return combined_data_df
+
+
+def _label_single_parsed_data(data_df, config):
+    """단일 파일: Segment + 세그먼트별 Control/Variation 열 이름"""
+    # 사용자가 입력한 세그먼트와 Variation 개수로 열 이름 생성
+    user_segments = config.get('segments', [])
+    if not user_segments:
+        user_segments = ['All Visits']
+    variation_count = config.get('variationCount', 1)
+    
+    # 열 이름 생성
+    column_names = ['Segment']  # A열
+    
+    # 각 세그먼트에 대해 Control과 Variation들 추가
+    for segment_name in user_segments:
+        if segment_name and segment_name.strip():
+            segment_name = segment_name.strip()
+            # Control 추가
+            column_names.append(f"{segment_name} - Control")
+            # Variation들 추가
+            for var_idx in range(1, variation_count + 1):
+                column_names.append(f"{segment_name} - Variation {var_idx}")
+    
+    # 기존 데이터프레임의 컬럼 수에 맞춰 조정
+    existing_cols = list(data_df.columns)
+    new_column_names = []
+    new_column_names.append('Segment')  # A열을 Segment로 변경
+    
+    # B열부터 새로운 이름으로 변경
+    data_col_idx = 0
+    for col_idx in range(1, len(existing_cols)):  # B열부터 (인덱스 1부터)
+        if data_col_idx < len(column_names) - 1:  # Segment 제외
+            new_column_names.append(column_names[data_col_idx + 1])  # +1은 Segment 제외
+            data_col_idx += 1
+        else:
+            # 이름이 부족하면 기존 컬럼 이름 유지
+            new_column_names.append(existing_cols[col_idx])
+    
+    # 열 이름이 부족한 경우 처리
+    if len(new_column_names) < len(existing_cols):
+        for i in range(len(new_column_names), len(existing_cols)):
+            new_column_names.append(existing_cols[i])
+    
+    # 열 이름 적용 (분석에 쓴 data_df는 그대로 두고 새 프레임에 적용)
+    parsed_export = data_df.set_axis(new_column_names[:len(data_df.columns)], axis=1)
+    print(f"열 이름 설정 완료: {len(parsed_export.columns)}개 컬럼")
+    print(f"처음 5개 열 이름: {list(parsed_export.columns[:5])}")
+    return parsed_export
+
+
+def rebuild_parsed_data(source_paths, recipe):
+    """
+    일부 컬럼만 읽은 분석 프레임 대신 원본 파일을 전체 컬럼으로 다시 파싱해 내보내기 프레임 생성
+    (export_parsed_data.py가 /api/parsed-data 요청 시 호출). recipe는 export_parsed_data가 저장한 설정.
+    """
+    frames = [parse_excel(path, full_width=True)[0] for path in source_paths]
+    return label_parsed_data(frames, recipe.get('files'), recipe)
+
+
+def export_parsed_data(frames, source_paths, file_infos, config, labeled_df=None):
+    """
+    파싱 데이터 내보내기 단계 (작업당 한 번). XLSX는 /api/parsed-data 요청 시 export_parsed_data.py가 만든다.
+    - 모든 프레임이 전체 컬럼이면 열 이름을 붙인 프레임을 중간 파일(tmp/parsed_data.pkl)로 저장
+    - 일부 컬럼만 읽은 프레임이 있으면 원본 파일 링크와 열 이름 설정만 저장 (XLSX 생성 시 전체 컬럼으로 다시 파싱)
+    labeled_df: 이미 label_parsed_data로 만든 프레임 (있으면 재사용). 반환: 중간 파일 경로
+    """
+    if not frames:
+        return None
+    started = time.perf_counter()
+    tmp_dir = Path(os.getcwd()) / 'tmp'
+    if all(df.attrs.get('full_width', True) for df in frames):
+        data_df = labeled_df if labeled_df is not None else label_parsed_data(frames, file_infos, config)
+        path = save_parsed_data(data_df, tmp_dir)
+        print(f"Parsed data saved to {path} ({len(data_df)}행, {time.perf_counter() - started:.3f}초)")
+        return path
+    recipe = {
+        'segments': config.get('segments', []),
+        'variationCount': config.get('variationCount', 1),
+        'files': None if file_infos is None else [
+            {'reportOrder': fi.get('reportOrder', '1st report'), 'country': fi.get('country', 'UK')}
+            for fi in file_infos
+        ],
+    }
+    path = save_parsed_data_sources(source_paths, recipe, tmp_dir)
+    print(f"Parsed data sources saved to {path} (파일 {len(source_paths)}개, {time.perf_counter() - started:.3f}초)")
+    return path
+
+
 def main():
     if len(sys.argv) < 3:
         print("Usage: python analyze.py <excel_file> <config_json>")
@@ -2219,21 +2698,21 @@ def main():
             print(f"\n=== 여러 파일 처리 시작: 총 {len(files_config)}개 파일 (병렬 파싱) ===")
         all_primary_results = []
         all_parsed_data = []  # 모든 파일의 파싱된 데이터를 저장할 리스트
+        parsed_files = []  # all_parsed_data와 같은 순서의 파일 정보
         first_segment_names = None  # 첫 번째 파일의 segment_names 저장
         
         report_progress(10, "파일 파싱 중")
-        max_workers = min(6, len(files_config))
-        results_by_idx = {}
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = {executor.submit(_parse_one_file, (idx, fi)): idx for idx, fi in enumerate(files_config)}
-            for future in as_completed(futures):
-                idx, file_info, data_df, segment_names, err = future.result()
-                results_by_idx[idx] = (file_info, data_df, segment_names, err)
+        parse_cache = get_parse_cache(config)
+        backend, max_workers = get_parse_backend(config, len(files_config))
+        if debug:
+            print(f"파싱 백엔드: {backend} (워커 {max_workers}개)")
+        results_by_idx = parse_files_parallel(files_config, parse_cache, backend, max_workers)
         
-        report_progress(25, "파일 파싱 완료")
+        hit_flags = [hit for _, _, hit, err in results_by_idx.values() if err is None]
+        report_progress(25, "파일 파싱 완료" + _parse_cache_summary(parse_cache, hit_flags))
         # 순서대로 결과 적용
-        for idx in range(len(files_config)):
-            file_info, data_df, segment_names, err = results_by_idx[idx]
+        for idx, file_info in enumerate(files_config):
+            data_df, segment_names, _, err = results_by_idx[idx]
             file_country = file_info.get('country', 'UK')
             report_order = file_info.get('reportOrder', '1st report')
             if err:
@@ -2244,11 +2723,8 @@ def main():
                 continue
             if idx == 0:
                 first_segment_names = segment_names
-            data_df_with_metadata = data_df.copy()
-            data_df_with_metadata = data_df_with_metadata.rename(columns={'A': 'Segment'})
-            data_df_with_metadata.insert(0, 'Report Order', report_order)
-            data_df_with_metadata.insert(1, 'Country', file_country)
-            all_parsed_data.append(data_df_with_metadata)
+            all_parsed_data.append(data_df)
+            parsed_files.append(file_info)
             if debug:
                 print(f"파일 {idx + 1}/{len(files_config)} 파싱 완료: {len(data_df)}행")
         
@@ -2257,43 +2733,9 @@ def main():
         
         # 모든 파일의 파싱된 데이터를 하나로 합치기
         if all_parsed_data:
-            combined_data_df = pd.concat(all_parsed_data, ignore_index=True)
+            combined_data_df = label_parsed_data(all_parsed_data, parsed_files, config)
             if debug:
                 print(f"\n=== 파싱된 데이터 합치기: 총 {len(combined_data_df)}행 (파일 {len(all_parsed_data)}개) ===")
-            
-            # 사용자가 입력한 세그먼트와 Variation 개수로 열 이름 생성
-            user_segments = config.get('segments', [])
-            if not user_segments:
-                user_segments = ['All Visits']
-            variation_count = config.get('variationCount', 1)
-            
-            # 열 이름 생성
-            column_names = ['Report Order', 'Country', 'Segment']  # 처음 3개 컬럼
-            
-            # 각 세그먼트에 대해 Control과 Variation들 추가
-            for segment_name in user_segments:
-                if segment_name and segment_name.strip():
-                    segment_name = segment_name.strip()
-                    # Control 추가
-                    column_names.append(f"{segment_name} - Control")
-                    # Variation들 추가
-                    for var_idx in range(1, variation_count + 1):
-                        column_names.append(f"{segment_name} - Variation {var_idx}")
-            
-            # 기존 데이터프레임의 컬럼 수 확인
-            existing_cols = list(combined_data_df.columns)
-            # 열 이름이 기존 컬럼 수와 맞지 않으면 조정
-            if len(column_names) < len(existing_cols):
-                # 부족한 열은 기존 이름 유지
-                for i in range(len(column_names), len(existing_cols)):
-                    column_names.append(existing_cols[i])
-            elif len(column_names) > len(existing_cols):
-                # 열 이름이 더 많으면 필요한 만큼만 사용
-                column_names = column_names[:len(existing_cols)]
-            
-            # 열 이름 적용
-            combined_data_df.columns = column_names[:len(combined_data_df.columns)]
-            if debug:
                 print(f"열 이름 설정 완료: {len(combined_data_df.columns)}개 컬럼")
             
             # 결과 초기화
@@ -2301,8 +2743,9 @@ def main():
             
             # 파싱된 데이터의 Country와 Report Order 컬럼에서 고유한 조합 추출
             if 'Country' in combined_data_df.columns and 'Report Order' in combined_data_df.columns:
-                # 리포트 순서와 국가의 고유한 조합 추출
-                unique_combinations = combined_data_df[['Report Order', 'Country']].drop_duplicates()
+                # 리포트 순서와 국가 조합별로 한 번에 분할 (조합마다 필터링·복사하지 않음)
+                partition_started = time.perf_counter()
+                combinations = partition_combinations(combined_data_df)
                 unique_countries = combined_data_df['Country'].dropna().unique().tolist()
                 unique_report_orders = combined_data_df['Report Order'].dropna().unique().tolist()
                 
@@ -2310,80 +2753,53 @@ def main():
                     print(f"\n=== 파싱된 데이터에서 발견된 리포트 순서와 국가 ===")
                     print(f"고유한 리포트 순서: {unique_report_orders}")
                     print(f"고유한 국가 목록: {unique_countries}")
-                    print(f"총 조합 개수: {len(unique_combinations)}")
+                    print(f"총 조합 개수: {len(combinations)}")
+                    print(f"DEBUG: 조합 분할 - {len(combined_data_df)}행 → 조합 {len(combinations)}개, "
+                          f"{time.perf_counter() - partition_started:.3f}초, {_peak_memory_summary()}")
                 
                 # 세그먼트 이름은 첫 번째 파일에서 저장된 것을 재사용 (중복 호출 제거)
                 segment_names = first_segment_names if first_segment_names is not None else {}
                 
                 # 리포트 순서와 국가 조합별로 결과 생성
-                if len(unique_combinations) > 0:
+                if len(combinations) > 0:
                     if debug:
                         print(f"\n=== 리포트 순서와 국가 조합별로 분석을 수행합니다 ===")
                     
-                    n_combos = len(unique_combinations)
-                    for step, (idx, row) in enumerate(unique_combinations.iterrows()):
-                        report_order = row['Report Order']
-                        country = row['Country']
-                        pct = 25 + int(40 * (step + 1) / n_combos) if n_combos else 65
-                        report_progress(min(pct, 65), "KPI 분석 중")
-                        if debug:
-                            print(f"\n=== 리포트 순서: {report_order}, 국가: {country} 처리 중 ===")
+                    # 여러 국가인지 확인 (전체 국가 목록 기준)
+                    is_multi_country = len(unique_countries) > 1
+                    tasks = [
+                        (step, country_data, segment_names, country, is_multi_country, unique_countries, config, report_order)
+                        for step, (report_order, country, country_data) in enumerate(combinations)
+                    ]
+                    
+                    # 조합별 분석 (프로세스 풀이면 병렬), 결과는 원래 조합 순서대로 합침
+                    analysis_backend, analysis_workers = get_analysis_backend(config, len(tasks))
+                    if debug:
+                        print(f"KPI 분석 백엔드: {analysis_backend} (워커 {analysis_workers}개, 조합 {len(tasks)}개)")
+                    
+                    def on_combination_done(done, total):
+                        report_progress(25 + int(40 * done / total), "KPI 분석 중")
+                    
+                    analysis_started = time.perf_counter()
+                    combination_results = analyze_combinations(
+                        tasks, analysis_backend, analysis_workers, on_combination_done
+                    )
+                    if debug:
+                        print(f"DEBUG: 조합 분석 - {time.perf_counter() - analysis_started:.3f}초, {_peak_memory_summary()}")
+                    for task, primary in zip(tasks, combination_results):
+                        country, report_order = task[3], task[7]
+                        # days 값 계산 및 추가
+                        date_info = calculate_days_from_config(config, country, report_order)
+                        if date_info:
+                            for r in primary:
+                                r['days'] = date_info.get('days')
+                                r['startDate'] = date_info.get('startDate')
+                                r['endDate'] = date_info.get('endDate')
                         
-                        # 해당 리포트 순서와 국가의 데이터만 필터링
-                        filtered_data = combined_data_df[
-                            (combined_data_df['Report Order'] == report_order) & 
-                            (combined_data_df['Country'] == country)
-                        ].copy()
+                        if debug:
+                            print(f"  리포트 순서 {report_order}, 국가 {country} KPI: {len(primary)}개")
                         
-                        if len(filtered_data) > 0:
-                            # Country, Report Order, Segment 컬럼을 제외한 데이터만 사용
-                            # Segment 컬럼을 A로, 나머지 컬럼을 B, C, D...로 변환
-                            country_data_original = filtered_data.copy()
-                            
-                            # Segment 컬럼을 A로 변경
-                            if 'Segment' in country_data_original.columns:
-                                country_data_original = country_data_original.rename(columns={'Segment': 'A'})
-                            
-                            # Report Order와 Country 컬럼 제거
-                            columns_to_drop = []
-                            if 'Report Order' in country_data_original.columns:
-                                columns_to_drop.append('Report Order')
-                            if 'Country' in country_data_original.columns:
-                                columns_to_drop.append('Country')
-                            
-                            if columns_to_drop:
-                                country_data_original = country_data_original.drop(columns=columns_to_drop)
-                            
-                            # 컬럼 이름을 A, B, C, D...로 변경
-                            new_columns = ['A'] + [chr(66 + i) for i in range(len(country_data_original.columns) - 1)]
-                            country_data_original.columns = new_columns[:len(country_data_original.columns)]
-                            
-                            # 여러 국가인지 확인 (전체 국가 목록 기준)
-                            is_multi_country = len(unique_countries) > 1
-                            
-                            # 해당 조합에 대한 결과 생성
-                            if debug:
-                                print(f"  리포트 순서 {report_order}, 국가 {country}에 대한 결과 생성 중...")
-                            country_results = process_single_file(
-                                country_data_original, segment_names, country, is_multi_country, unique_countries,
-                                country, config, report_order
-                            )
-                            
-                            # days 값 계산 및 추가
-                            date_info = calculate_days_from_config(config, country, report_order)
-                            if date_info:
-                                for r in country_results['primary']:
-                                    r['days'] = date_info.get('days')
-                                    r['startDate'] = date_info.get('startDate')
-                                    r['endDate'] = date_info.get('endDate')
-                            
-                            if debug:
-                                print(f"  KPI: {len(country_results['primary'])}개")
-                            
-                            all_primary_results.extend(country_results['primary'])
-                        else:
-                            if debug:
-                                print(f"  경고: 리포트 순서 {report_order}, 국가 {country}에 대한 데이터가 없습니다.")
+                        all_primary_results.extend(primary)
                     
                     if debug:
                         print(f"\n=== 모든 리포트 순서와 국가 조합에 대한 결과 생성 완료: 총 KPI {len(all_primary_results)}개 ===")
@@ -2413,7 +2829,7 @@ def main():
                         combined_data_original = combined_data_original.drop(columns=columns_to_drop)
                     
                     # 컬럼 이름을 A, B, C, D...로 변경
-                    new_columns = ['A'] + [chr(66 + i) for i in range(len(combined_data_original.columns) - 1)]
+                    new_columns = column_labels(len(combined_data_original.columns))
                     combined_data_original.columns = new_columns[:len(combined_data_original.columns)]
                     
                     # 단일 국가에 대한 결과 생성
@@ -2439,16 +2855,6 @@ def main():
                         print(f"  KPI: {len(country_results['primary'])}개")
                     all_primary_results.extend(country_results['primary'])
             
-            # 합쳐진 데이터를 Excel로 저장
-            import os
-            cwd = os.getcwd()
-            tmp_dir = Path(cwd) / 'tmp'
-            tmp_dir.mkdir(exist_ok=True)
-            parsed_data_path = tmp_dir / 'parsed_data.xlsx'
-            combined_data_df.to_excel(parsed_data_path, index=False, engine='openpyxl')
-            if debug:
-                print(f"합쳐진 파싱 데이터 저장 완료: {parsed_data_path}")
-            
             report_progress(70, "분석 완료")
             # 결과 저장 및 인사이트 생성
             save_results_and_insights(all_primary_results, config)
@@ -2457,7 +2863,10 @@ def main():
     else:
         # 단일 파일 처리 (기존 로직)
         report_progress(15, "파일 파싱 중")
-        data_df, segment_names, detected_country, is_multi_country, countries = parse_excel(file_path)
+        parse_cache = get_parse_cache(config)
+        parsed, cache_hit = parse_excel_cached(file_path, parse_cache)
+        data_df, segment_names, detected_country, is_multi_country, countries = parsed
+        report_progress(25, "파일 파싱 완료" + _parse_cache_summary(parse_cache, [cache_hit]))
         report_progress(35, "KPI 분석 중")
         
         # 설정에서 국가 가져오기 (없으면 감지된 국가 사용)
@@ -2473,64 +2882,25 @@ def main():
         # 결과 저장 및 인사이트 생성
         save_results_and_insights(primary_results, config)
     
-    # 파싱된 데이터를 Excel로 저장
+    # 파싱 데이터 내보내기 (작업당 한 번, XLSX는 /api/parsed-data 요청 시 생성)
     if files_config and len(files_config) > 0:
-        # 여러 파일의 경우 이미 합쳐진 데이터가 combined_data_df에 저장됨
-        # 위에서 이미 저장했으므로 여기서는 건너뜀
-        pass
+        # 여러 파일: 열 이름을 붙인 합쳐진 데이터 (없으면 내보내지 않음)
+        export_parsed_data(all_parsed_data, [fi['path'] for fi in parsed_files], parsed_files, config, combined_data_df)
     else:
-        # 단일 파일인 경우
-        data_df, _, _, _, _ = parse_excel(file_path)
-        
-        # 사용자가 입력한 세그먼트와 Variation 개수로 열 이름 생성
-        user_segments = config.get('segments', [])
-        if not user_segments:
-            user_segments = ['All Visits']
-        variation_count = config.get('variationCount', 1)
-        
-        # 열 이름 생성
-        column_names = ['Segment']  # A열
-        
-        # 각 세그먼트에 대해 Control과 Variation들 추가
-        for segment_name in user_segments:
-            if segment_name and segment_name.strip():
-                segment_name = segment_name.strip()
-                # Control 추가
-                column_names.append(f"{segment_name} - Control")
-                # Variation들 추가
-                for var_idx in range(1, variation_count + 1):
-                    column_names.append(f"{segment_name} - Variation {var_idx}")
-        
-        # 기존 데이터프레임의 컬럼 수에 맞춰 조정
-        existing_cols = list(data_df.columns)
-        new_column_names = []
-        new_column_names.append('Segment')  # A열을 Segment로 변경
-        
-        # B열부터 새로운 이름으로 변경
-        data_col_idx = 0
-        for col_idx in range(1, len(existing_cols)):  # B열부터 (인덱스 1부터)
-            if data_col_idx < len(column_names) - 1:  # Segment 제외
-                new_column_names.append(column_names[data_col_idx + 1])  # +1은 Segment 제외
-                data_col_idx += 1
-            else:
-                # 이름이 부족하면 기존 컬럼 이름 유지
-                new_column_names.append(existing_cols[col_idx])
-        
-        # 열 이름이 부족한 경우 처리
-        if len(new_column_names) < len(existing_cols):
-            for i in range(len(new_column_names), len(existing_cols)):
-                new_column_names.append(existing_cols[i])
-        
-        # 열 이름 적용
-        data_df.columns = new_column_names[:len(data_df.columns)]
-        
-        tmp_dir = Path(__file__).parent.parent / 'tmp'
-        tmp_dir.mkdir(exist_ok=True)
-        parsed_data_path = tmp_dir / 'parsed_data.xlsx'
-        data_df.to_excel(parsed_data_path, index=False, engine='openpyxl')
-        print(f"Parsed data saved to {parsed_data_path}")
-        print(f"열 이름 설정 완료: {len(data_df.columns)}개 컬럼")
-        print(f"처음 5개 열 이름: {list(data_df.columns[:5])}")
+        # 단일 파일: 위에서 파싱한 data_df 사용 (다시 파싱하지 않음)
+        export_parsed_data([data_df], [file_path], None, config)
+    flush_bayesian_cache()
+
+def build_planned_metric_matrix(data_df, kpi_configs, segment_mapping):
+    """프레임 하나에서 모든 Primary KPI의 메트릭을 한 번씩만 조회한 행렬"""
+    # process_single_file이 건너뛰는 KPI(name, numerator 모두 없음)는 계획에서 제외
+    kpi_configs = [kpi for kpi in kpi_configs if kpi.get('name') or kpi.get('numerator')]
+    labels, columns, naive_count = plan_metric_lookups(kpi_configs, segment_mapping)
+    metric_matrix = resolve_metric_matrix(data_df, labels, columns)
+    print(f"DEBUG: 메트릭 조회 계획 - KPI {len(kpi_configs)}개, 메트릭 {len(labels)}개 × 컬럼 {len(columns)}개 "
+          f"= {len(labels) * len(columns)}회 (KPI별 조회 시 {naive_count}회)")
+    return metric_matrix
+
 
 def process_single_file(data_df, segment_names, detected_country, is_multi_country, countries, country, config, report_order):
     """단일 파일 처리 함수"""
@@ -2569,7 +2939,9 @@ def process_single_file(data_df, segment_names, detected_country, is_multi_count
     # 세그먼트 매핑 생성 (사용자 입력 세그먼트 사용)
     print(f"원본 세그먼트 이름: {segment_names}")
     print(f"Variation 개수: {variation_count}")
-    segment_mapping = detect_segments_from_user_input(user_segments, variation_count, segment_names)
+    segment_mapping = detect_segments_from_user_input(
+        user_segments, variation_count, segment_names, column_count=len(data_df.columns)
+    )
     print(f"생성된 세그먼트 매핑: {segment_mapping}")
     print(f"세그먼트 매핑 개수: {len(segment_mapping)}")
     if len(segment_mapping) == 0:
@@ -2586,14 +2958,11 @@ def process_single_file(data_df, segment_names, detected_country, is_multi_count
         segment_mapping = detect_segments(segment_names, variation_count)
     if not segment_mapping:
         print("경고: 자동 감지도 실패했습니다. B열부터 순차 폴백을 사용합니다.")
-        segment_mapping = detect_segments_from_user_input(user_segments, variation_count)
+        segment_mapping = detect_segments_from_user_input(
+            user_segments, variation_count, column_count=len(data_df.columns)
+        )
     
-    # 파싱된 데이터를 Excel로 저장 (분석용)
-    tmp_dir = Path(__file__).parent.parent / 'tmp'
-    tmp_dir.mkdir(exist_ok=True)
-    parsed_data_path = tmp_dir / 'parsed_data.xlsx'
-    data_df.to_excel(parsed_data_path, index=False, engine='openpyxl')
-    print(f"Parsed data saved to {parsed_data_path}")
+    # 파싱 데이터 저장은 main()에서 작업당 한 번 (export_parsed_data)
     print(f"파싱된 데이터 행 수: {len(data_df)}")
     
     # 디버그 모드 (환경 변수로 제어 가능)
@@ -2628,8 +2997,9 @@ def process_single_file(data_df, segment_names, detected_country, is_multi_count
         country_segment_mapping = segment_mapping
         print(f"  사용할 세그먼트 매핑 (사용자 입력): {country_segment_mapping}")
         
-        # 전체 데이터를 사용 (컬럼 매핑만 다르게 적용)
-        country_data_df = data_df.copy()
+        # 전체 데이터를 사용 (컬럼 매핑만 다르게 적용, 읽기만 하므로 복사하지 않음)
+        country_data_df = data_df
+        metric_matrix = build_planned_metric_matrix(country_data_df, config.get('primaryKPIs', []), country_segment_mapping)
     
         # Primary KPI 계산
         print(f"\n=== Primary KPI 계산 시작 (여러 국가) ===")
@@ -2673,7 +3043,7 @@ def process_single_file(data_df, segment_names, detected_country, is_multi_count
             print(f"  [필터링 결과] has_required_fields = {has_required_fields}")
             
             if has_required_fields:
-                results, missing_metrics = compute_kpi(country_data_df, kpi_config, selected_country, country_segment_mapping, variation_count, debug=True, report_order=report_order)
+                results, missing_metrics = compute_kpi(country_data_df, kpi_config, selected_country, country_segment_mapping, variation_count, debug=True, report_order=report_order, metric_matrix=metric_matrix)
                 # report_order 추가
                 if report_order:
                     for r in results:
@@ -2710,6 +3080,7 @@ def process_single_file(data_df, segment_names, detected_country, is_multi_count
     else:
         # 단일 국가 처리 (기존 로직)
         primary_results = []
+        metric_matrix = build_planned_metric_matrix(data_df, config.get('primaryKPIs', []), segment_mapping)
         print(f"\n=== Primary KPI 계산 시작 (단일 국가) ===")
         print(f"config 키 목록: {list(config.keys())}")
         print(f"config.get('primaryKPIs') 개수: {len(config.get('primaryKPIs', []))}")
@@ -2757,7 +3128,7 @@ def process_single_file(data_df, segment_names, detected_country, is_multi_count
                 # 사용자가 선택한 국가 사용
                 selected_country = country or 'N/A'
                 print(f"    사용할 국가: {selected_country}")
-                results, missing_metrics = compute_kpi(data_df, kpi_config, selected_country, segment_mapping, variation_count, debug, report_order=report_order)
+                results, missing_metrics = compute_kpi(data_df, kpi_config, selected_country, segment_mapping, variation_count, debug, report_order=report_order, metric_matrix=metric_matrix)
                 # report_order 추가
                 if report_order:
                     for r in results:
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Bayesian 사후확률 추출 방식 벤치마크
+
+- 기본: Monte Carlo ↔ Sobol 준난수. decision 경계(0.8/0.9) 근처 셀에서 추출 수별로 반복 실행해
+  해석적 계산 대비 오차 분산(RMSE²)과 실행 시간을 비교한다.
+- --batch: 셀 단위 Monte Carlo 루프(셀마다 Control/Variation 추출 후 uplift 계산) ↔ mc_uplift_probs
+  배치 추출의 실행 시간. Control 하나당 Variation 수별로 비교하고, 추출만 하는 시간(하한)도 함께 출력한다.
+
+사용법: python bench_bayesian.py [--reps 30] [--draws 1024 4096 16384 65536]
+        python bench_bayesian.py --batch [--reps 5] [--cells 300] [--variations 1 3] [--draws 50000]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from core.bayesian import mc_uplift_probs, qmc_uplift_probs, uplift_probs
+
+UPLIFT_TH = 0.03
+EPS = 1e-12
+
+# (cd, cn, vd, vn): p_gt3/p_lt3가 0.8~0.9 근처인 셀
+BENCH_CELLS = [
+    (10000, 300, 10100, 352),
+    (10000, 300, 10000, 271),
+    (50000, 1500, 50000, 1600),
+    (200000, 4000, 200000, 4190),
+]
+
+
+def _posteriors(cells):
+    cd, cn, vd, vn = (np.array(x, dtype=float) for x in zip(*cells))
+    return 1.0 + cn, 1.0 + cd - cn, 1.0 + vn, 1.0 + vd - vn
+
+
+def run(reps, draw_counts):
+    posteriors = _posteriors(BENCH_CELLS)
+    exact = np.column_stack(uplift_probs(*posteriors, UPLIFT_TH))
+    samplers = (('mc', mc_uplift_probs), ('qmc', qmc_uplift_probs))
+
+    print(f"셀 {len(BENCH_CELLS)}개, 반복 {reps}회 (오차 분산 = 해석적 계산 대비 평균 제곱 오차, 5개 확률 평균)")
+    print(f"{'draws':>8} {'sampler':>8} {'variance':>12} {'draws×var':>12} {'sec/rep':>9}")
+    for n_sims in draw_counts:
+        variances = {}
+        for name, sampler in samplers:
+            errors = []
+            start = time.perf_counter()
+            for rep in range(reps):
+                probs = np.column_stack(sampler(*posteriors, UPLIFT_TH, n_sims, np.random.default_rng(rep)))
+                errors.append(probs - exact)
+            elapsed = (time.perf_counter() - start) / reps
+            variances[name] = float(np.mean(np.square(errors)))
+            print(f"{n_sims:>8} {name:>8} {variances[name]:>12.3e} {n_sims * variances[name]:>12.3e} {elapsed:>9.4f}")
+        print(f"{'':>8} {'mc/qmc':>8} {variances['mc'] / variances['qmc']:>12.1f}")
+
+
+def _per_cell_mc(a_c, b_c, a_v, b_v, n_sims, rng):
+    """배치 추출 이전의 셀 단위 루프 (셀마다 Control → Variation 추출)"""
+    probs = []
+    for cell in zip(a_c, b_c, a_v, b_v):
+        p_c = rng.beta(cell[0], cell[1], n_sims)
+        p_v = rng.beta(cell[2], cell[3], n_sims)
+        uplift = (p_v - p_c) / np.clip(p_c, EPS, None)
+        probs.append((np.mean(uplift > 0), np.mean(uplift < 0), np.mean(uplift > UPLIFT_TH),
+                      np.mean(uplift < -UPLIFT_TH), np.mean(np.abs(uplift) <= UPLIFT_TH)))
+    return probs
+
+
+def _draws_only(a_c, b_c, a_v, b_v, n_sims, rng):
+    """셀 단위 루프의 추출만 (Control 공유 없이 도달할 수 있는 하한)"""
+    for cell in zip(a_c, b_c, a_v, b_v):
+        rng.beta(cell[0], cell[1], n_sims)
+        rng.beta(cell[2], cell[3], n_sims)
+
+
+def _batch_cells(n_cells, variations, seed=0):
+    """Control n_cells / variations개 × Variation variations개 셀의 사후분포 모수"""
+    rng = np.random.default_rng(seed)
+    n_controls = max(1, n_cells // variations)
+    cn = rng.integers(100, 3000, n_controls)
+    a_c = np.repeat(cn + 1.0, variations)
+    b_c = np.repeat(cn * 29 + 1.0, variations)
+    a_v = np.round(a_c * rng.uniform(0.95, 1.1, len(a_c)))
+    return a_c, b_c, a_v, b_c.copy()
+
+
+def run_batch(reps, n_cells, variation_counts, n_sims):
+    print(f"셀 {n_cells}개, 추출 {n_sims}개, 반복 {reps}회 (최소 시간, 초)")
+    print(f"{'variations':>10} {'per-cell':>9} {'batch':>9} {'speedup':>8} {'draws':>9}")
+    for variations in variation_counts:
+        posteriors = _batch_cells(n_cells, variations)
+        kernels = (
+            ('per-cell', lambda rng: _per_cell_mc(*posteriors, n_sims, rng)),
+            ('batch', lambda rng: mc_uplift_probs(*posteriors, UPLIFT_TH, n_sims, rng, eps=EPS)),
+            ('draws', lambda rng: _draws_only(*posteriors, n_sims, rng)),
+        )
+        best = {name: float('inf') for name, _ in kernels}
+        # 부하 변동이 한쪽에 몰리지 않도록 방식을 번갈아 실행
+        for rep in range(reps):
+            for name, kernel in kernels:
+                start = time.perf_counter()
+                kernel(np.random.default_rng(rep))
+                best[name] = min(best[name], time.perf_counter() - start)
+        print(f"{variations:>10} {best['per-cell']:>9.3f} {best['batch']:>9.3f} "
+              f"{best['per-cell'] / best['batch']:>7.2f}x {best['draws']:>9.3f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--batch', action='store_true', help='셀 단위 루프 ↔ 배치 추출 실행 시간 비교')
+    parser.add_argument('--reps', type=int, default=None)
+    parser.add_argument('--draws', type=int, nargs='+', default=None)
+    parser.add_argument('--cells', type=int, default=300)
+    parser.add_argument('--variations', type=int, nargs='+', default=[1, 3])
+    args = parser.parse_args()
+    if args.batch:
+        run_batch(args.reps or 5, args.cells, args.variations, (args.draws or [50_000])[0])
+    else:
+        run(args.reps or 30, args.draws or [1024, 4096, 16384, 65536])
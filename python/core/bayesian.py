@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Beta 사후분포 uplift 확률 계산 (해석적 계산, 일괄 Monte Carlo)
+
+Control/Variation 전환율 p_c ~ Beta(a_c, b_c), p_v ~ Beta(a_v, b_v)일 때
+uplift = (p_v - p_c) / p_c > t  ⇔  p_v > (1 + t) p_c 이므로
+P(uplift > t) = P(p_v > k p_c) (k = 1 + t)를 1차원 적분으로 구한다.
+- 표준편차가 작은(좁은) 사후분포를 바깥 변수로 두고, 평균 ± QUADRATURE_SPAN σ 구간에서
+  Gauss-Legendre 적분 (안쪽 분포의 CDF는 이 구간에서 완만하므로 적은 노드로 충분)
+- 네 형상 모수가 모두 NORMAL_APPROX_MIN 이상이면 정규근사 (오차 1e-4 미만)
+모든 함수는 셀 배열을 받아 한 번에 계산한다. Monte Carlo 추출(mc_uplift_probs)과
+조기 종료 Monte Carlo(adaptive_mc_uplift_probs), scrambled Sobol 준난수 추출(qmc_uplift_probs)도
+같은 형태로 제공한다.
+추출 함수의 rng는 Generator 하나(모든 셀이 공유) 또는 CellStreams(셀별 독립 난수열)이다.
+CellStreams를 쓰면 셀 결과가 호출 순서·함께 계산한 셀과 무관하게 같다.
+"""
+
+import hashlib
+import json
+
+import numpy as np
+from scipy.special import betainc, betaincc, betaincinv, betaln, ndtr
+from scipy.stats import qmc
+
+QUADRATURE_NODES = 128
+QUADRATURE_SPAN = 12.0
+NORMAL_APPROX_MIN = 100_000
+# Monte Carlo 한 번에 추출하는 난수 개수 상한 (Control + Variation, float64 기준 16MB)
+MC_BLOCK_ELEMENTS = 1 << 21
+# 조기 종료 Monte Carlo: 한 번에 추가하는 추출 수, decision 경계와의 거리 기준 (표준오차 배수)
+MC_ADAPTIVE_STEP = 2_500
+MC_ADAPTIVE_Z = 4.0
+# 준난수(Sobol) 추출 기본 점 개수 (2의 거듭제곱)
+QMC_SIMS = 1 << 12
+
+_NODES, _WEIGHTS = np.polynomial.legendre.leggauss(QUADRATURE_NODES)
+
+
+def beta_moments(a, b):
+    """Beta(a, b)의 평균과 분산"""
+    total = a + b
+    return a / total, a * b / (total * total * (total + 1))
+
+
+def _exceed_probs_quadrature(a_c, b_c, a_v, b_v, ks):
+    """P(p_v > k p_c) 수치 적분 (k마다 셀 배열 하나)"""
+    a_c, b_c, a_v, b_v = (x[:, None] for x in (a_c, b_c, a_v, b_v))
+    _, var_c = beta_moments(a_c, b_c)
+    _, var_v = beta_moments(a_v, b_v)
+    control_outer = var_c <= var_v
+    a_out = np.where(control_outer, a_c, a_v)
+    b_out = np.where(control_outer, b_c, b_v)
+    a_in = np.where(control_outer, a_v, a_c)
+    b_in = np.where(control_outer, b_v, b_c)
+
+    mean, var = beta_moments(a_out, b_out)
+    half_width = QUADRATURE_SPAN * np.sqrt(var)
+    lo = np.clip(mean - half_width, 0.0, 1.0)
+    hi = np.clip(mean + half_width, 0.0, 1.0)
+    x = lo + (hi - lo) * (_NODES + 1) / 2
+    with np.errstate(divide='ignore'):
+        log_pdf = (a_out - 1) * np.log(x) + (b_out - 1) * np.log1p(-x) - betaln(a_out, b_out)
+    weights = (hi - lo) / 2 * _WEIGHTS * np.exp(log_pdf)
+    # 구간 밖 꼬리 확률(1e-30 수준)을 무시한 만큼 정규화
+    total = weights.sum(axis=1)
+
+    probs = []
+    for k in ks:
+        # 바깥이 Control: E_c[P(p_v > k x)], 바깥이 Variation: E_v[P(p_c < x / k)]
+        inner = np.where(
+            control_outer,
+            betaincc(a_in, b_in, np.minimum(k * x, 1.0)),
+            betainc(a_in, b_in, np.minimum(x / k, 1.0)),
+        )
+        probs.append((weights * inner).sum(axis=1) / total)
+    return probs
+
+
+def _exceed_probs_normal(a_c, b_c, a_v, b_v, ks):
+    """P(p_v > k p_c) 정규근사: p_v - k p_c ~ N(μ_v - k μ_c, σ_v² + k² σ_c²)"""
+    mean_c, var_c = beta_moments(a_c, b_c)
+    mean_v, var_v = beta_moments(a_v, b_v)
+    return [ndtr((mean_v - k * mean_c) / np.sqrt(var_v + k * k * var_c)) for k in ks]
+
+
+def exceed_probs(a_c, b_c, a_v, b_v, ks, normal_min=NORMAL_APPROX_MIN):
+    """
+    셀별 P(p_v > k p_c) (ks의 k마다 배열 하나).
+    형상 모수가 모두 normal_min 이상인 셀은 정규근사, 나머지는 수치 적분.
+    """
+    a_c, b_c, a_v, b_v = (np.atleast_1d(np.asarray(x, dtype=float)) for x in (a_c, b_c, a_v, b_v))
+    probs = [np.empty(a_c.shape) for _ in ks]
+    use_normal = np.minimum.reduce([a_c, b_c, a_v, b_v]) >= normal_min
+    for mask, kernel in ((use_normal, _exceed_probs_normal), (~use_normal, _exceed_probs_quadrature)):
+        if mask.any():
+            for out, values in zip(probs, kernel(a_c[mask], b_c[mask], a_v[mask], b_v[mask], ks)):
+                out[mask] = values
+    return probs
+
+
+def uplift_probs(a_c, b_c, a_v, b_v, threshold, normal_min=NORMAL_APPROX_MIN):
+    """
+    셀별 (p_gt0, p_lt0, p_gt_th, p_lt_th, p_neutral) 배열
+    p_gt_th = P(uplift > threshold), p_lt_th = P(uplift < -threshold),
+    p_neutral = P(|uplift| <= threshold)
+    """
+    p_gt0, p_gt_th, p_above_neg = exceed_probs(
+        a_c, b_c, a_v, b_v, (1.0, 1.0 + threshold, 1.0 - threshold), normal_min
+    )
+    p_gt0 = np.clip(p_gt0, 0.0, 1.0)
+    p_gt_th = np.clip(p_gt_th, 0.0, 1.0)
+    p_lt_th = np.clip(1.0 - p_above_neg, 0.0, 1.0)
+    p_neutral = np.clip(1.0 - p_gt_th - p_lt_th, 0.0, 1.0)
+    return p_gt0, 1.0 - p_gt0, p_gt_th, p_lt_th, p_neutral
+
+
+def stream_seed(seed, key):
+    """작업 시드 + 안정적인 키(JSON 직렬화 가능한 값 목록) → SeedSequence (생성 순서와 무관)"""
+    payload = json.dumps(list(key), ensure_ascii=False, separators=(',', ':'), default=str)
+    digest = hashlib.sha256(payload.encode('utf-8')).digest()
+    words = tuple(int.from_bytes(digest[i:i + 4], 'little') for i in range(0, 16, 4))
+    return np.random.SeedSequence(seed, spawn_key=words)
+
+
+class CellStreams:
+    """
+    셀별 난수열. control_keys가 같은 셀끼리 Control 난수열(추출값)을 공유하고,
+    Variation 난수열은 셀마다 variation_keys로 따로 만든다.
+    control_keys가 같은 셀은 Control 사후분포(a_c, b_c)도 같아야 한다 (키에 포함해 보장).
+    """
+
+    def __init__(self, seed, control_keys, variation_keys):
+        unique = {}
+        self.control_of = np.array([unique.setdefault(tuple(key), len(unique)) for key in control_keys], dtype=int)
+        self.controls = [np.random.default_rng(stream_seed(seed, key)) for key in unique]
+        self.variations = [np.random.default_rng(stream_seed(seed, key)) for key in variation_keys]
+
+    def subset(self, cells):
+        """일부 셀만 남긴 CellStreams (Generator 객체를 공유하므로 이어서 추출)"""
+        streams = CellStreams.__new__(CellStreams)
+        streams.controls = self.controls
+        streams.control_of = self.control_of[cells]
+        streams.variations = [self.variations[cell] for cell in cells]
+        return streams
+
+    def groups(self):
+        """(Control 난수열, 해당 셀 인덱스 배열) 목록"""
+        for group, rng in enumerate(self.controls):
+            cells = np.flatnonzero(self.control_of == group)
+            if len(cells):
+                yield rng, cells
+
+
+def _uplift_bounds(p_c, threshold, eps):
+    """
+    Control 추출값 p_c에서 uplift = (p_v - p_c) / max(p_c, eps)가 ±threshold가 되는 p_v 경계 (above, below).
+    경계를 Control 추출값에서 한 번만 계산하면 셀마다 uplift(나눗셈, 셀 크기 임시 배열)를 만들지 않아도 된다.
+    """
+    if p_c.min() >= eps:
+        return p_c * (1 + threshold), p_c * (1 - threshold)
+    margin = threshold * np.maximum(p_c, eps)
+    return p_c + margin, p_c - margin
+
+
+def _uplift_counts(p_v, p_c, above, below):
+    """
+    행별 (uplift > 0, < 0, > t, < -t, |uplift| <= t) 개수 (5 × 행 수 배열, p_v가 1-D이면 5 × 1).
+    p_c, above, below는 p_v에 브로드캐스트되는 Control 추출값과 _uplift_bounds 경계.
+    """
+    # 1-D는 axis 없이 세야 빠른 경로를 탄다 (axis를 주면 bool 합계로 계산)
+    axis = -1 if p_v.ndim > 1 else None
+    gt_th = np.count_nonzero(p_v > above, axis=axis)
+    lt_th = np.count_nonzero(p_v < below, axis=axis)
+    return np.array([
+        np.count_nonzero(p_v > p_c, axis=axis),
+        np.count_nonzero(p_v < p_c, axis=axis),
+        gt_th,
+        lt_th,
+        p_v.shape[-1] - gt_th - lt_th,
+    ]).reshape(5, -1)
+
+
+def _control_groups(a_c, b_c, rng):
+    """
+    (Control 난수열, 셀 인덱스 배열, 셀별 Variation 난수열) 목록.
+    rng가 Generator이면 같은 Control 사후분포(a_c, b_c)의 셀끼리 묶고 모두 rng에서 추출,
+    CellStreams이면 Control 난수열 그룹별로 묶고 Variation은 셀별 난수열에서 추출한다.
+    """
+    if isinstance(rng, CellStreams):
+        return [(control_rng, cells, [rng.variations[cell] for cell in cells]) for control_rng, cells in rng.groups()]
+    _, control_of = np.unique(np.column_stack([a_c, b_c]), axis=0, return_inverse=True)
+    control_of = control_of.ravel()
+    order = np.argsort(control_of, kind='stable')
+    starts = np.flatnonzero(np.diff(control_of[order], prepend=-1))
+    return [(rng, cells, [rng] * len(cells)) for cells in np.split(order, starts[1:])]
+
+
+def _mc_counts(a_c, b_c, a_v, b_v, threshold, n_sims, rng, eps, block_elements):
+    """
+    셀별 (uplift > 0, < 0, > t, < -t, |uplift| <= t) 추출 횟수 (5 × 셀 수 배열).
+    Control 그룹마다 Control을 한 번 추출하고 경계를 구한 뒤, 그룹의 셀마다 Variation을 추출해 바로 비교한다.
+    한 번에 추출하는 수를 block_elements / 2 이하로 나눠 (Control + Variation 추출값) 메모리 상한 유지.
+    1-D 추출값이 캐시에 남아 있는 동안 비교하므로 2-D 블록보다 빠르고, Control이 하나인 셀은
+    셀 단위 추출(Control → Variation)과 같은 난수열을 쓴다.
+    """
+    counts = np.zeros((5, len(a_c)))
+    if len(a_c) == 0:
+        return counts
+    sims_block = max(1, min(n_sims, block_elements // 2))
+    for control_rng, cells, variation_rngs in _control_groups(a_c, b_c, rng):
+        drawn = 0
+        while drawn < n_sims:
+            size = min(sims_block, n_sims - drawn)
+            p_c = control_rng.beta(a_c[cells[0]], b_c[cells[0]], size)
+            above, below = _uplift_bounds(p_c, threshold, eps)
+            for cell, variation_rng in zip(cells, variation_rngs):
+                p_v = variation_rng.beta(a_v[cell], b_v[cell], size)
+                counts[:, cell] += _uplift_counts(p_v, p_c, above, below)[:, 0]
+            drawn += size
+    return counts
+
+
+def mc_uplift_probs(a_c, b_c, a_v, b_v, threshold, n_sims, rng, eps=1e-12, block_elements=MC_BLOCK_ELEMENTS):
+    """
+    Monte Carlo로 셀별 (p_gt0, p_lt0, p_gt_th, p_lt_th, p_neutral) 배열 계산.
+    - 같은 Control 사후분포(a_c, b_c)를 쓰는 셀은 Control 추출값을 공유
+    - 한 번에 추출하는 수를 block_elements / 2 이하로 나눠 메모리 상한 유지
+    Control마다 Variation이 하나이면 셀 순서(Control 사후분포 순)대로 Control → Variation을
+    n_sims개씩 추출 (셀 단위 추출과 같은 난수열).
+    """
+    a_c, b_c, a_v, b_v = (np.atleast_1d(np.asarray(x, dtype=float)) for x in (a_c, b_c, a_v, b_v))
+    return tuple(_mc_counts(a_c, b_c, a_v, b_v, threshold, n_sims, rng, eps, block_elements) / n_sims)
+
+
+def _decision_settled(hits, draws, decision_thresholds, z):
+    """
+    추정 확률 hits / draws가 모든 decision 경계에서 z 표준오차 이상 떨어져 있는지.
+    표준오차는 (hits + 1) / (draws + 2)로 계산해 확률이 0/1일 때도 0이 되지 않게 한다.
+    """
+    p = hits / draws
+    p_smooth = (hits + 1) / (draws + 2)
+    se = np.sqrt(p_smooth * (1 - p_smooth) / draws)
+    return np.logical_and.reduce([np.abs(p - th) >= z * se for th in decision_thresholds])
+
+
+def adaptive_mc_uplift_probs(a_c, b_c, a_v, b_v, threshold, decision_thresholds, max_sims, rng,
+                             step=MC_ADAPTIVE_STEP, z=MC_ADAPTIVE_Z, eps=1e-12, block_elements=MC_BLOCK_ELEMENTS):
+    """
+    조기 종료 Monte Carlo. step개씩 추가 추출하다가 p_gt_th, p_lt_th가 decision_thresholds
+    (decision 경계)의 어느 쪽인지 z 표준오차 안에서 확정되면 그 셀은 추출을 멈춘다 (최대 max_sims).
+    반환: ((p_gt0, p_lt0, p_gt_th, p_lt_th, p_neutral) 배열, 셀별 추출 횟수 배열)
+    """
+    a_c, b_c, a_v, b_v = (np.atleast_1d(np.asarray(x, dtype=float)) for x in (a_c, b_c, a_v, b_v))
+    counts = np.zeros((5, len(a_c)))
+    draws = np.zeros(len(a_c), dtype=np.int64)
+    active = np.ones(len(a_c), dtype=bool)
+    while active.any():
+        cells = np.flatnonzero(active)
+        size = int(min(step, max_sims - draws[cells].max()))
+        cell_rng = rng.subset(cells) if isinstance(rng, CellStreams) else rng
+        counts[:, cells] += _mc_counts(a_c[cells], b_c[cells], a_v[cells], b_v[cells], threshold, size, cell_rng,
+                                       eps, block_elements)
+        draws[cells] += size
+        settled = (
+            _decision_settled(counts[2, cells], draws[cells], decision_thresholds, z)
+            & _decision_settled(counts[3, cells], draws[cells], decision_thresholds, z)
+        )
+        active[cells] = ~settled & (draws[cells] < max_sims)
+    return tuple(counts / np.maximum(draws, 1)), draws
+
+
+def qmc_uplift_probs(a_c, b_c, a_v, b_v, threshold, n_sims, rng, eps=1e-12, block_elements=MC_BLOCK_ELEMENTS):
+    """
+    Scrambled Sobol 준난수로 셀별 (p_gt0, p_lt0, p_gt_th, p_lt_th, p_neutral) 배열 계산.
+    2차원 Sobol 점 (u_c, u_v)를 Beta 역 CDF에 넣어 p_c, p_v를 만든다 (같은 정확도에 필요한 점 수가
+    의사난수 추출보다 훨씬 적다). n_sims는 2의 거듭제곱으로 올림 (Sobol 균형 성질 유지).
+    모든 셀이 같은 점 집합을 쓰고, Control 역변환은 고유 (a_c, b_c)마다 한 번만 한다.
+    rng가 CellStreams이면 Control 난수열 그룹마다 점 집합을 따로 섞는다.
+    """
+    a_c, b_c, a_v, b_v = (np.atleast_1d(np.asarray(x, dtype=float)) for x in (a_c, b_c, a_v, b_v))
+    counts = np.zeros((5, len(a_c)))
+    if len(a_c) == 0:
+        return tuple(counts)
+
+    m = max(0, int(np.ceil(np.log2(n_sims))))
+    if isinstance(rng, CellStreams):
+        for control_rng, cells in rng.groups():
+            u_c, u_v = qmc.Sobol(d=2, scramble=True, seed=control_rng).random_base2(m).T
+            p_c = betaincinv(a_c[cells[0]], b_c[cells[0]], u_c)
+            p_v = betaincinv(a_v[cells][:, None], b_v[cells][:, None], u_v)
+            counts[:, cells] = _uplift_counts(p_v, p_c, *_uplift_bounds(p_c, threshold, eps))
+        return tuple(counts / 2 ** m)
+
+    u_c, u_v = qmc.Sobol(d=2, scramble=True, seed=rng).random_base2(m).T
+    controls, control_of = np.unique(np.column_stack([a_c, b_c]), axis=0, return_inverse=True)
+    control_of = control_of.ravel()
+    p_c = betaincinv(controls[:, 0][:, None], controls[:, 1][:, None], u_c)
+    above, below = _uplift_bounds(p_c, threshold, eps)
+
+    rows = max(1, block_elements // len(u_v))
+    for start in range(0, len(a_c), rows):
+        cells = np.arange(start, min(start + rows, len(a_c)))
+        p_v = betaincinv(a_v[cells][:, None], b_v[cells][:, None], u_v)
+        rows_of = control_of[cells]
+        counts[:, cells] = _uplift_counts(p_v, p_c[rows_of], above[rows_of], below[rows_of])
+    return tuple(counts / len(u_v))
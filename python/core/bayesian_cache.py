@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Bayesian 사후확률 결과 캐시
+
+같은 (cd, cn, vd, vn) 조합은 같은 테스트 재실행, 분자/분모를 공유하는 KPI, 리포트 재생성에서
+반복해서 나온다. 계산 설정(계산 방식, prior, uplift 기준, 추출 수 등)과 값 4개를 키로
+compute_bayesian_probs 결과를 재사용한다.
+mc/adaptive/qmc 모드는 셀별 난수열 키(국가·리포트 순서·KPI·세그먼트·Variation)도 키에 포함되므로
+같은 셀을 다시 계산할 때(재실행·리포트 재생성)만 적중한다. 분자/분모를 공유하는 다른 KPI끼리는
+analytic 모드에서만 결과를 공유한다.
+- 프로세스 내부: max_entries 크기의 LRU
+- 디스크(선택): JSON 파일 하나, 실행 간 공유. 새 항목은 모아 두었다가 flush()에서
+  한 번에 저장 (작업 끝에 한 번). 저장 시 다른 프로세스가 저장한 항목과 합침.
+  계산 설정 문자열은 파일에 한 번만 쓰고 항목에는 설정 번호 + 셀 키(값 4개, 난수열 키)만 둔다:
+  {"settings": [설정 키, ...], "entries": [[설정 번호, 셀 키, 결과], ...]} (entries는 오래 안 쓴 순서)
+"""
+
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+
+
+def bayesian_settings_key(**settings):
+    """결과에 영향을 주는 계산 설정을 정규화한 문자열 (설정이 바뀌면 키가 달라짐)"""
+    return json.dumps(settings, sort_keys=True, separators=(',', ':'))
+
+
+def bayesian_cell_key(settings_key, cd, cn, vd, vn, stream_key=None):
+    """
+    캐시 키 (설정 키, 셀 키). 셀 키는 값 4개로 만들고 셀별 난수열을 쓰면 그 키도 포함.
+    설정 키는 같은 작업의 모든 셀이 같은 문자열을 공유하므로 디스크에는 한 번만 저장된다.
+    """
+    cell = f"{float(cd)!r}|{float(cn)!r}|{float(vd)!r}|{float(vn)!r}"
+    if stream_key is not None:
+        cell += '|' + json.dumps(list(stream_key), ensure_ascii=False, separators=(',', ':'), default=str)
+    return settings_key, cell
+
+
+class BayesianCache:
+    """캐시 키 → (p_gt0, p_lt0, p_gt3, p_lt3, p_neutral, decision) LRU 캐시 (스레드 안전)"""
+
+    def __init__(self, max_entries, path=None):
+        self.max_entries = max_entries
+        self.path = Path(path) if path else None
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        # 디스크에 아직 저장하지 않은 새 항목
+        self._pending = OrderedDict()
+        if self.path is not None:
+            self._entries.update(self._read_file())
+            self._evict()
+
+    def _read_file(self):
+        """디스크 저장소의 항목 {(설정 키, 셀 키): 결과} (오래 안 쓴 순서)"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+            settings = stored['settings']
+            return OrderedDict(((settings[index], cell), value) for index, cell, value in stored['entries'])
+        except FileNotFoundError:
+            return OrderedDict()
+        except Exception as e:
+            # 손상된 캐시 파일(이전 형식 포함)은 무시하고 새로 만듦
+            print(f"DEBUG: Bayesian 캐시 읽기 실패, 초기화: {self.path.name} ({e})")
+            return OrderedDict()
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get_many(self, keys):
+        """키 목록의 결과 (없으면 None)"""
+        results = []
+        with self._lock:
+            for key in keys:
+                value = self._entries.get(key)
+                if value is None:
+                    self.misses += 1
+                    results.append(None)
+                else:
+                    self.hits += 1
+                    self._entries.move_to_end(key)
+                    results.append(tuple(value))
+        return results
+
+    def put_many(self, items):
+        """(키, 결과) 목록 저장. 디스크 저장소가 있으면 flush() 때 파일에 반영."""
+        items = list(items)
+        if not items:
+            return
+        with self._lock:
+            for key, value in items:
+                self._entries[key] = list(value)
+                self._entries.move_to_end(key)
+                if self.path is not None:
+                    self._pending[key] = list(value)
+            self._evict()
+
+    def take_pending(self):
+        """디스크에 저장하지 않은 새 항목 [(키, 결과)]을 꺼냄 (프로세스 풀 워커 → 부모로 전달용)"""
+        with self._lock:
+            items = list(self._pending.items())
+            self._pending.clear()
+        return items
+
+    def flush(self):
+        """모아 둔 새 항목을 디스크 저장소에 한 번에 저장. 반환: 저장한 항목 수"""
+        with self._lock:
+            if self.path is None or not self._pending:
+                return 0
+            items = list(self._pending.items())
+            self._pending.clear()
+            self._write_file(items)
+        return len(items)
+
+    def _write_file(self, items):
+        # 다른 프로세스가 그사이 저장한 항목을 잃지 않도록 파일 내용과 합친 뒤 저장
+        entries = self._read_file()
+        for key, value in items:
+            entries.pop(key, None)
+            entries[key] = list(value)
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+        settings = {}
+        rows = [[settings.setdefault(settings_key, len(settings)), cell, value]
+                for (settings_key, cell), value in entries.items()]
+        stored = {'settings': list(settings), 'entries': rows}
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_name(f"{self.path.name}.{uuid.uuid4().hex}.tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(stored, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            # 캐시 저장 실패는 분석 결과에 영향 없음
+            print(f"DEBUG: Bayesian 캐시 저장 실패: {e}")
+
+    def hit_rate_summary(self):
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 0.0
+        return f"적중 {self.hits}/{total} ({rate:.0f}%), 항목 {len(self._entries)}개"
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Excel 컬럼 주소 변환
+
+파싱된 프레임의 컬럼 이름은 Excel 열 문자(A, B, ..., Z, AA, AB, ...)를 따른다.
+내부 계산은 0-based 정수 위치로 하고, 프레임 컬럼 이름·세그먼트 매핑처럼
+밖으로 드러나는 곳에서만 이 모듈로 문자 주소로 바꾼다.
+"""
+
+
+def col_index_to_letter(col_idx):
+    """0-based 컬럼 인덱스를 Excel 컬럼 문자로 변환 (0=A, 25=Z, 26=AA, 701=ZZ, 702=AAA)"""
+    if col_idx < 0:
+        raise ValueError(f"컬럼 인덱스는 0 이상이어야 합니다: {col_idx}")
+    letters = ''
+    number = col_idx + 1
+    while number:
+        number, rem = divmod(number - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def col_letter_to_index(col_letter):
+    """Excel 컬럼 문자를 0-based 컬럼 인덱스로 변환 (A=0, B=1, ..., AA=26)"""
+    number = 0
+    for ch in col_letter.upper():
+        number = number * 26 + (ord(ch) - 64)
+    return number - 1
+
+
+def column_labels(count):
+    """앞에서부터 count개 컬럼의 문자 주소 목록 (A, B, ..., Z, AA, ...)"""
+    return [col_index_to_letter(i) for i in range(count)]
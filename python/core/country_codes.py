@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+사이트(국가) 코드 목록과 코드 매처
+
+parse_excel, detect_countries_from_b_column, detect_country_from_excel,
+detect_country_with_ai가 같은 목록과 같은 매칭 규칙을 쓰도록 한 곳에 모아둔다.
+사이트를 추가할 때는 COUNTRY_CODES만 수정하면 된다.
+"""
+
+import re
+
+import pandas as pd
+
+COUNTRY_CODES = (
+    'N_AFRICA', 'AFRICA_EN', 'AFRICA_PT', 'AFRICA_FR', 'EG', 'ZA', 'AU', 'CN', 'HK', 'HK_EN', 'TW',
+    'IN', 'ID', 'JP', 'SEC', 'MY', 'MM', 'NZ', 'PH', 'SG', 'TH', 'VN', 'BD', 'MN', 'AL', 'AT', 'AZ',
+    'BE', 'BE_FR', 'BG', 'BA', 'HR', 'CZ', 'DK', 'EE', 'FI', 'FR', 'DE', 'GR', 'HU', 'IE', 'IL', 'IT',
+    'KZ_KZ', 'KZ_RU', 'LV', 'LT', 'NL', 'NO', 'MK', 'PL', 'PT', 'RO', 'RS', 'SK', 'SI', 'ES', 'SE',
+    'CH', 'CH_FR', 'TR', 'UA', 'UK', 'UZ_UZ', 'UZ_RU', 'GE', 'AR', 'LATIN_EN', 'LATIN', 'BR', 'CL',
+    'CO', 'MX', 'PE', 'PY', 'UY', 'PK', 'AE_AR', 'AE', 'IRAN', 'LEVANT', 'LEVANT_AR', 'SA', 'SA_EN',
+    'IQ_AR', 'IQ_KU', 'KB', 'CA', 'CA_FR', 'US', 'PS',
+)
+
+# 여러 셀을 한 문자열로 이어 붙일 때 쓰는 구분자 (코드 경계 역할도 함)
+_CELL_SEPARATOR = '\x1f'
+
+
+class CountryCodeMatcher:
+    """
+    텍스트에서 사이트 코드를 찾는 매처 (코드 전체를 하나의 정규식으로 컴파일).
+    - 코드는 영문/숫자로 이어지지 않는 위치에서만 일치 ('ALL VISITS'의 AL, 'VISITS'의 IT는 불일치)
+    - 같은 위치에서는 가장 긴 코드가 우선 ('CH_FR'은 CH가 아닌 CH_FR, 'UK_MO'는 UK)
+    - 한 텍스트에 여러 코드가 있으면 가장 앞의 코드
+    """
+
+    def __init__(self, codes=COUNTRY_CODES):
+        self.codes = tuple(codes)
+        alternatives = '|'.join(re.escape(code) for code in sorted(self.codes, key=len, reverse=True))
+        self._pattern = re.compile(rf'(?<![A-Z0-9])(?:{alternatives})(?![A-Z0-9])')
+
+    def match(self, text):
+        """텍스트(대소문자 무시)에서 찾은 첫 번째 코드 (없으면 None)"""
+        if text is None or (not isinstance(text, str) and pd.isna(text)):
+            return None
+        found = self._pattern.search(str(text).upper())
+        return found.group(0) if found else None
+
+    def match_cells(self, values):
+        """
+        셀 값 목록(헤더 행 등)을 한 번에 검사해 셀별 첫 번째 코드 목록 반환 (빈 셀은 None).
+        셀들을 구분자로 이어 붙인 문자열을 한 번만 스캔한다.
+        """
+        texts = ['' if value is None or (not isinstance(value, str) and pd.isna(value)) else str(value).upper()
+                 for value in values]
+        result = [None] * len(texts)
+        # 각 셀 시작 위치 → 셀 번호
+        starts = []
+        pos = 0
+        for text in texts:
+            starts.append(pos)
+            pos += len(text) + len(_CELL_SEPARATOR)
+        cell = 0
+        for found in self._pattern.finditer(_CELL_SEPARATOR.join(texts)):
+            while cell + 1 < len(starts) and starts[cell + 1] <= found.start():
+                cell += 1
+            if result[cell] is None:
+                result[cell] = found.group(0)
+        return result
+
+
+COUNTRY_MATCHER = CountryCodeMatcher()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+헤더 레이아웃 지문 캐시
+
+내보내기 파일은 몇 개의 저장된 Workspace 템플릿에서 나오므로 Segments 행 주변 헤더 구조가
+파일마다 같다. 세그먼트/국가 감지가 읽는 입력(헤더 3행 텍스트, 샘플 행 숫자 여부,
+컬럼 수, Segments 행 위치)을 해시한 지문으로 이전 감지 결과를 재사용한다.
+- 저장 형식: JSON 파일 하나 ({지문: 감지 결과})
+- 만료 정책: max_entries를 넘으면 가장 먼저 저장된 항목부터 삭제
+"""
+
+import hashlib
+import json
+import os
+import threading
+import uuid
+from pathlib import Path
+
+
+def layout_fingerprint(parser_version, header_texts, numeric_mask, segments_row):
+    """
+    감지 입력을 정규화한 지문.
+    header_texts: Segments 행과 위 2행의 셀 텍스트 (행 단위 목록, 빈 셀은 '')
+    numeric_mask: 컬럼별 샘플 데이터 숫자 여부
+    """
+    payload = json.dumps(
+        {
+            'parser_version': str(parser_version),
+            'segments_row': int(segments_row),
+            'columns': len(numeric_mask),
+            'header': header_texts,
+            'numeric': [bool(flag) for flag in numeric_mask],
+        },
+        ensure_ascii=False,
+        separators=(',', ':'),
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LayoutCache:
+    """지문 → 감지 결과(JSON 직렬화 가능한 dict)를 저장하는 로컬 캐시 (스레드 안전)"""
+
+    def __init__(self, path, max_entries):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = self._read_file()
+
+    def _read_file(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            # 손상된 캐시 파일은 무시하고 새로 만듦
+            print(f"DEBUG: 레이아웃 캐시 읽기 실패, 초기화: {self.path.name} ({e})")
+            return {}
+        return entries if isinstance(entries, dict) else {}
+
+    def get(self, fingerprint):
+        with self._lock:
+            layout = self._entries.get(fingerprint)
+            if layout is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return layout
+
+    def put(self, fingerprint, layout):
+        with self._lock:
+            # 다른 프로세스가 그사이 저장한 항목을 잃지 않도록 파일 내용과 합친 뒤 저장
+            entries = self._read_file()
+            entries.update(self._entries)
+            entries.pop(fingerprint, None)
+            entries[fingerprint] = layout
+            while len(entries) > self.max_entries:
+                entries.pop(next(iter(entries)))
+            self._entries = entries
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = self.path.with_name(f"{self.path.name}.{uuid.uuid4().hex}.tmp")
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(entries, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+            except Exception as e:
+                # 캐시 저장 실패는 파싱 결과에 영향 없음
+                print(f"DEBUG: 레이아웃 캐시 저장 실패: {e}")
+
+    def hit_rate_summary(self):
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 0.0
+        return f"적중 {self.hits}/{total} ({rate:.0f}%)"
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+A열 메트릭 라벨 검색 인덱스
+
+find_metric_value는 KPI × 분자/분모 × 세그먼트 × Variation × 국가 조합마다 호출되므로,
+A열 라벨 정리(clean_label)를 프레임당 한 번만 하고 포함 검색은 인덱스로 처리한다.
+- 정확 일치: dict (라벨 → 첫 행 위치)
+- 포함 검색: 3-gram 역색인으로 후보 행을 좁힌 뒤 앞에서부터 확인
+- 같은 검색어는 결과를 기억해 두 번째부터 O(1)
+검색 결과는 기존 ``str.contains(query, case=False, regex=False)`` 의 첫 번째 일치 행과 같다.
+
+resolve_metric_matrix는 여러 메트릭 × 여러 컬럼 값을 한 번에 조회해 float 행렬로 돌려준다.
+"""
+
+import re
+import threading
+import weakref
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+NGRAM_SIZE = 3
+# 핵심 단어 검색 시 메트릭 이름에서 지우는 문자 (숫자, _, 괄호, >)
+_CORE_WORD_STRIP = re.compile(r'[0-9_()>]')
+_WORD = re.compile(r'\b\w+\b')
+# 값이 문자열일 때 결측으로 보는 표기
+_MISSING_TEXTS = ('nan', 'none', '-', 'n/a')
+
+# resolve()가 돌려주는 일치 방식
+MATCH_LABEL = 'label'
+MATCH_CORE_WORDS = 'core_words'
+MATCH_CART_ADD = 'cart_add'
+
+
+def clean_label(label):
+    """라벨 정리 (공백, 언더스코어, 특수문자 제거)"""
+    if pd.isna(label):
+        return ''
+    # 언더스코어, 공백, 특수문자 제거하여 매칭 정확도 향상
+    cleaned = str(label).strip().replace('_', '').replace(' ', '').replace('>', '').replace('-', '').replace('(', '').replace(')', '')
+    return cleaned
+
+
+class MetricIndex:
+    """정리된 A열 라벨의 포함 검색 인덱스 (대소문자 무시)"""
+
+    def __init__(self, labels):
+        # str.contains(case=False, regex=False)와 같게 대문자로 비교
+        self.labels = [clean_label(label).upper() for label in labels]
+        self._exact = {}
+        self._grams = defaultdict(list)
+        for pos, label in enumerate(self.labels):
+            self._exact.setdefault(label, pos)
+            for gram in {label[i:i + NGRAM_SIZE] for i in range(len(label) - NGRAM_SIZE + 1)}:
+                self._grams[gram].append(pos)
+        self._memo = {}
+        self._resolved = {}
+
+    def __len__(self):
+        return len(self.labels)
+
+    def first_containing(self, query):
+        """정리된 검색어를 포함하는 첫 번째 행 위치 (없으면 None)"""
+        key = query.upper()
+        if key not in self._memo:
+            self._memo[key] = self._search(key)
+        return self._memo[key]
+
+    def resolve(self, metric_label):
+        """
+        find_metric_value의 검색 순서로 메트릭 행 위치 찾기.
+        1) 정리된 라벨 포함
+        2) 숫자·괄호 등을 뺀 핵심 단어(6자 이상) 포함
+        3) 'cart'와 'add' 키워드가 모두 있으면 'cartadd' 포함
+        반환: (행 위치 또는 None, 일치 방식 또는 None)
+        """
+        if metric_label not in self._resolved:
+            self._resolved[metric_label] = self._resolve(metric_label)
+        return self._resolved[metric_label]
+
+    def _resolve(self, metric_label):
+        row_pos = self.first_containing(clean_label(metric_label))
+        if row_pos is not None:
+            return row_pos, MATCH_LABEL
+        core_words = clean_label(''.join(_CORE_WORD_STRIP.sub('', metric_label).strip().split()))
+        if core_words and len(core_words) > 5:
+            row_pos = self.first_containing(core_words)
+            if row_pos is not None:
+                return row_pos, MATCH_CORE_WORDS
+        keywords = _WORD.findall(metric_label.lower())
+        if 'cart' in keywords and 'add' in keywords:
+            row_pos = self.first_containing(clean_label('cart add'))
+            if row_pos is not None:
+                return row_pos, MATCH_CART_ADD
+        return None, None
+
+    def _search(self, query):
+        exact = self._exact.get(query)
+        if len(query) < NGRAM_SIZE:
+            # 짧은 검색어('' 포함)는 역색인으로 좁힐 수 없으므로 순차 확인 (결과는 기억됨)
+            return next((pos for pos, label in enumerate(self.labels) if query in label), None)
+        postings = [self._grams.get(query[i:i + NGRAM_SIZE], ())
+                    for i in range(len(query) - NGRAM_SIZE + 1)]
+        candidates = min(postings, key=len)
+        for pos in candidates:
+            if exact is not None and pos > exact:
+                return exact
+            if query in self.labels[pos]:
+                return pos
+        return exact
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_metric_index(data_df):
+    """
+    data_df의 A열 MetricIndex (프레임마다 한 번 생성 후 재사용).
+    A열이 다시 할당되면 새로 만든다. 프레임이 해제되면 인덱스도 함께 삭제된다.
+    """
+    labels = data_df['A'].to_numpy()
+    key = id(data_df)
+    with _indexes_lock:
+        entry = _indexes.get(key)
+        if entry is not None and entry[0]() is data_df and entry[1] is labels:
+            return entry[2]
+        index = MetricIndex(labels)
+        frame_ref = weakref.ref(data_df, lambda _, key=key: _indexes.pop(key, None))
+        _indexes[key] = (frame_ref, labels, index)
+        return index
+
+
+def cell_to_float(value):
+    """
+    메트릭 셀 값을 float로 변환 (결측·변환 불가 시 None).
+    문자열은 천단위 콤마·공백을 지우고 'nan', 'none', '-', 'n/a'는 결측으로 본다.
+    """
+    try:
+        if pd.isna(value):
+            return None
+        if isinstance(value, str):
+            value_clean = value.replace(',', '').replace(' ', '').strip()
+            if value_clean == '' or value_clean.lower() in _MISSING_TEXTS:
+                return None
+            return float(value_clean)
+        return float(value)
+    except (ValueError, TypeError):
+        return None
+
+
+class MetricMatrix:
+    """메트릭 라벨 × 컬럼 값 행렬. 찾지 못했거나 숫자가 아닌 값은 missing(NaN)."""
+
+    def __init__(self, labels, columns, values):
+        self.labels = list(labels)
+        self.columns = list(columns)
+        self.values = values
+        self.missing = np.isnan(values)
+        self._rows = {label: i for i, label in enumerate(self.labels)}
+        self._cols = {col: j for j, col in enumerate(self.columns)}
+
+    def __contains__(self, key):
+        label, column = key
+        return label in self._rows and column in self._cols
+
+    def get(self, label, column):
+        """(label, column) 값 (결측이면 None). 행렬에 없는 조합이면 KeyError."""
+        i, j = self._rows[label], self._cols[column]
+        if self.missing[i, j]:
+            return None
+        return float(self.values[i, j])
+
+
+def _block_to_float(block):
+    """DataFrame 블록을 float 2-D 배열로 (숫자형 컬럼만 있으면 한 번에, 아니면 셀 단위 변환)"""
+    if all(pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype) for dtype in block.dtypes):
+        return block.to_numpy(dtype=float, na_value=np.nan)
+    cells = block.to_numpy(dtype=object)
+    converted = [cell_to_float(value) for value in cells.ravel()]
+    return np.array([np.nan if value is None else value for value in converted], dtype=float).reshape(cells.shape)
+
+
+def resolve_metric_matrix(data_df, labels, columns):
+    """
+    labels의 각 메트릭 행(find_metric_value와 같은 검색 규칙)에서 columns 값을 한 번에 조회.
+    찾지 못한 메트릭은 missing. 프레임에 없는 컬럼은 행렬에서 빠진다 (호출 측 폴백 대상).
+    """
+    labels = list(dict.fromkeys(label for label in labels if label))
+    columns = list(dict.fromkeys(col for col in columns if col and col in data_df.columns))
+    values = np.full((len(labels), len(columns)), np.nan)
+    if len(data_df) > 0 and 'A' in data_df.columns:
+        index = get_metric_index(data_df)
+        positions = [index.resolve(label)[0] for label in labels]
+        found = [i for i, pos in enumerate(positions) if pos is not None]
+        if found and columns:
+            block = data_df.iloc[
+                [positions[i] for i in found],
+                [data_df.columns.get_loc(col) for col in columns],
+            ]
+            values[found, :] = _block_to_float(block)
+    return MetricMatrix(labels, columns, values)
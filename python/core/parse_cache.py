@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+파싱 결과 디스크 캐시 (내용 주소 기반)
+
+같은 내보내기 파일을 KPI 설정만 바꿔 다시 분석할 때 openpyxl 파싱을 건너뛰기 위해
+parse_excel 결과를 파일 내용 SHA-256 + 파서 버전을 키로 저장한다.
+- 저장 형식: pickle(protocol 5) - DataFrame 블록(numpy 배열)과 attrs를 그대로 보존
+- 만료 정책: 전체 용량 상한을 넘으면 가장 오래 사용하지 않은(mtime 기준) 항목부터 삭제
+"""
+
+import hashlib
+import os
+import pickle
+import uuid
+from pathlib import Path
+
+HASH_CHUNK_BYTES = 1024 * 1024
+CACHE_SUFFIX = '.pkl'
+
+
+def file_sha256(file_path):
+    """파일 내용의 SHA-256 (청크 단위로 읽어 큰 파일도 메모리 사용 없이 계산)"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ParseCache:
+    """
+    parse_excel 반환값을 저장하는 크기 제한 LRU 디스크 캐시.
+    상태가 설정값뿐이라 프로세스 풀 워커에도 그대로 전달할 수 있다.
+    """
+
+    def __init__(self, cache_dir, parser_version, max_bytes):
+        self.cache_dir = Path(cache_dir)
+        self.parser_version = str(parser_version)
+        self.max_bytes = max_bytes
+
+    def _entry_path(self, key):
+        return self.cache_dir / f"v{self.parser_version}-{key}{CACHE_SUFFIX}"
+
+    def get_or_parse(self, file_path, parse_fn):
+        """
+        캐시에 있으면 저장된 결과를, 없으면 parse_fn(file_path) 결과를 저장 후 반환.
+        반환: (result, hit)
+        """
+        key = file_sha256(file_path)
+        entry = self._entry_path(key)
+        result = self._load(entry)
+        if result is not None:
+            return result, True
+
+        result = parse_fn(file_path)
+        self._store(entry, result)
+        return result, False
+
+    def _load(self, entry):
+        try:
+            with open(entry, 'rb') as f:
+                result = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            # 손상된 항목은 삭제하고 다시 파싱
+            print(f"DEBUG: 파싱 캐시 항목 읽기 실패, 삭제: {entry.name} ({e})")
+            entry.unlink(missing_ok=True)
+            return None
+        # LRU 갱신: 마지막 사용 시각을 mtime으로 기록
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+        return result
+
+    def _store(self, entry, result):
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            # 다른 프로세스가 읽는 중일 수 있으므로 임시 파일에 쓴 뒤 교체
+            tmp_path = entry.with_name(f"{entry.name}.{uuid.uuid4().hex}.tmp")
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(result, f, protocol=5)
+            os.replace(tmp_path, entry)
+        except Exception as e:
+            # 캐시 저장 실패는 분석 결과에 영향 없음
+            print(f"DEBUG: 파싱 캐시 저장 실패: {e}")
+            return
+        self._evict()
+
+    def _evict(self):
+        """전체 용량이 max_bytes를 넘으면 오래된 항목부터 삭제 (동시 실행 중 삭제된 항목은 무시)"""
+        entries = []
+        for path in self.cache_dir.glob(f"*{CACHE_SUFFIX}"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
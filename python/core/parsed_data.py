@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+파싱 데이터 내보내기
+
+분석 작업마다 파싱 데이터를 한 번만 저장한다.
+- 분석 중: pickle(protocol 5) 중간 파일 (tmp/parsed_data.pkl) - openpyxl 직렬화 없이 바로 저장
+  분석 프레임이 일부 컬럼만 읽은 경우에는 프레임 대신 원본 파일 링크(tmp/parsed_data_sources/)와
+  열 이름 설정(recipe)만 저장하고, XLSX를 만들 때 원본을 전체 컬럼으로 다시 파싱한다.
+- XLSX (tmp/parsed_data.xlsx): /api/parsed-data 요청 시 export_parsed_data.py가 중간 파일에서 생성.
+  중간 파일보다 오래된 XLSX는 다시 만든다.
+"""
+
+import os
+import pickle
+import shutil
+import uuid
+from pathlib import Path
+
+PARSED_DATA_NAME = 'parsed_data'
+# 다시 파싱할 원본 파일 링크를 두는 디렉터리 (업로드 파일은 분석 후 삭제되므로 링크로 유지)
+PARSED_DATA_SOURCES_DIR = 'parsed_data_sources'
+
+
+def parsed_data_paths(tmp_dir):
+    """(중간 파일, XLSX) 경로"""
+    tmp_dir = Path(tmp_dir)
+    return tmp_dir / f"{PARSED_DATA_NAME}.pkl", tmp_dir / f"{PARSED_DATA_NAME}.xlsx"
+
+
+def _atomic_write(path, write_fn):
+    """임시 파일에 쓴 뒤 교체 (읽는 쪽이 쓰다 만 파일을 보지 않도록)"""
+    tmp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        write_fn(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+
+def _link_or_copy(src, dst):
+    """같은 파일 시스템이면 하드 링크 (복사 없음), 아니면 복사"""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+def _write_payload(payload, tmp_dir, keep_sources=None):
+    """중간 파일 저장 후 이전 작업의 XLSX와 원본 링크 삭제. 반환: 중간 파일 경로"""
+    pickle_path, xlsx_path = parsed_data_paths(tmp_dir)
+    pickle_path.parent.mkdir(parents=True, exist_ok=True)
+
+    def write(path):
+        with open(path, 'wb') as f:
+            pickle.dump(payload, f, protocol=5)
+
+    _atomic_write(pickle_path, write)
+    xlsx_path.unlink(missing_ok=True)
+    sources_root = Path(tmp_dir) / PARSED_DATA_SOURCES_DIR
+    if sources_root.exists():
+        for entry in sources_root.iterdir():
+            if entry.name != keep_sources:
+                shutil.rmtree(entry, ignore_errors=True)
+    return pickle_path
+
+
+def save_parsed_data(data_df, tmp_dir):
+    """파싱 데이터를 중간 파일로 저장하고 이전 작업의 XLSX를 삭제. 반환: 중간 파일 경로"""
+    return _write_payload(data_df, tmp_dir)
+
+
+def save_parsed_data_sources(source_paths, recipe, tmp_dir):
+    """
+    파싱 데이터 대신 원본 파일 링크와 recipe(열 이름 설정 등)를 중간 파일로 저장.
+    XLSX 생성 시 load_parsed_data의 rebuild(source_paths, recipe)로 프레임을 만든다. 반환: 중간 파일 경로
+    """
+    job_dir = uuid.uuid4().hex
+    sources_dir = Path(tmp_dir) / PARSED_DATA_SOURCES_DIR / job_dir
+    sources_dir.mkdir(parents=True)
+    names = []
+    for i, source_path in enumerate(source_paths):
+        name = f"{i}{Path(source_path).suffix}"
+        _link_or_copy(source_path, sources_dir / name)
+        names.append(name)
+    payload = {'sources_dir': job_dir, 'sources': names, 'recipe': recipe}
+    return _write_payload(payload, tmp_dir, keep_sources=job_dir)
+
+
+def load_parsed_data(tmp_dir, rebuild=None):
+    """
+    중간 파일의 파싱 데이터 (없으면 None).
+    원본 링크로 저장된 경우 rebuild(source_paths, recipe)로 프레임을 만든다 (rebuild가 없으면 ValueError).
+    """
+    pickle_path, _ = parsed_data_paths(tmp_dir)
+    try:
+        with open(pickle_path, 'rb') as f:
+            payload = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    if not isinstance(payload, dict):
+        return payload
+    if rebuild is None:
+        raise ValueError("원본 파일로 저장된 파싱 데이터는 rebuild 함수가 필요합니다.")
+    sources_dir = Path(tmp_dir) / PARSED_DATA_SOURCES_DIR / payload['sources_dir']
+    return rebuild([str(sources_dir / name) for name in payload['sources']], payload['recipe'])
+
+
+def export_parsed_data_xlsx(tmp_dir, rebuild=None):
+    """
+    중간 파일로 XLSX 생성 (이미 최신 XLSX가 있으면 그대로 사용).
+    rebuild: 원본 링크로 저장된 경우 프레임을 다시 만드는 함수 (load_parsed_data 참고).
+    반환: XLSX 경로 (중간 파일도 XLSX도 없으면 None)
+    """
+    pickle_path, xlsx_path = parsed_data_paths(tmp_dir)
+    if not pickle_path.exists():
+        return xlsx_path if xlsx_path.exists() else None
+    if xlsx_path.exists() and xlsx_path.stat().st_mtime >= pickle_path.stat().st_mtime:
+        return xlsx_path
+
+    data_df = load_parsed_data(tmp_dir, rebuild)
+    _atomic_write(xlsx_path, lambda path: data_df.to_excel(path, index=False, engine='openpyxl'))
+    return xlsx_path
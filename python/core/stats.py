@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+빈도주의 통계 일괄 계산
+
+KPI × 세그먼트 × Variation 셀 전체의 신뢰도(two-sided z-test, unpooled)와 판정을
+배열로 한 번에 계산한다. analyze.py의 compute_confidence_rate / compute_verdict는
+이 함수들을 원소 하나로 호출한 것과 같다. 결측(None)은 NaN으로 표현한다.
+"""
+
+import numpy as np
+from scipy.special import ndtr
+
+# 판정 기준 (compute_verdict 문서 참고)
+VERDICT_MIN_COUNT = 100      # Control/Variation 분자 최소 모수
+CONFIDENCE_STRONG = 95.0     # 우세
+CONFIDENCE_SOFT = 90.0       # 우세 (유보)
+UPLIFT_THRESHOLD = 3.0       # uplift(%) 기준
+
+VERDICT_INSUFFICIENT = '모수 부족'
+VERDICT_NO_DIFFERENCE = '차이 없음'
+
+
+def confidence_rates(xC, nC, xV, nV):
+    """
+    비율 신뢰도 일괄 계산 (two-sided z-test, unpooled)
+    반환: (pC, z, p_value, confidence) 배열
+    - nC 또는 nV가 0, 두 비율이 모두 0, 표준오차가 0이면 confidence 0.0 (pC, z, p_value는 NaN)
+    - 계산 결과가 NaN/inf이면 모두 NaN
+    """
+    xC, nC, xV, nV = (np.asarray(a, dtype=float) for a in (xC, nC, xV, nV))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pC = np.where(nC > 0, xC / nC, 0.0)
+        pV = np.where(nV > 0, xV / nV, 0.0)
+        se = np.sqrt((pV * (1 - pV) / nV) + (pC * (1 - pC) / nC))
+        z = (pV - pC) / se
+    # 양측 p-value = 2 × 정규분포 생존함수(|z|)
+    p_value = 2 * ndtr(-np.abs(z))
+    confidence = (1 - p_value) * 100
+
+    degenerate = (nC == 0) | (nV == 0) | ((pC == 0) & (pV == 0)) | (se == 0)
+    invalid = ~degenerate & ~np.isfinite(confidence)
+    undefined = degenerate | invalid
+    confidence = np.where(degenerate, 0.0, np.where(invalid, np.nan, confidence))
+    pC = np.where(undefined, np.nan, pC)
+    z = np.where(undefined, np.nan, z)
+    p_value = np.where(undefined, np.nan, p_value)
+    return pC, z, p_value, confidence
+
+
+def verdicts(uplift, num_c, num_v, confidence):
+    """
+    판정 일괄 계산 (confidence가 NaN이면 신뢰도 없음으로 처리)
+    반환: 판정 문자열 object 배열
+    """
+    uplift, num_c, num_v, confidence = (np.asarray(a, dtype=float) for a in (uplift, num_c, num_v, confidence))
+    insufficient = (num_c < VERDICT_MIN_COUNT) | (num_v < VERDICT_MIN_COUNT)
+    strong = confidence >= CONFIDENCE_STRONG
+    soft = ~strong & (confidence >= CONFIDENCE_SOFT)
+    up = uplift >= UPLIFT_THRESHOLD
+    down = uplift <= -UPLIFT_THRESHOLD
+    return np.select(
+        [insufficient, strong & up, strong & down, soft & up, soft & down],
+        [VERDICT_INSUFFICIENT, 'Variation 우세', 'Control 우세', 'Variation 우세 (유보)', 'Control 우세 (유보)'],
+        default=VERDICT_NO_DIFFERENCE,
+    ).astype(object)
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Excel/CSV 워크북 읽기 헬퍼
+
+같은 파일을 여러 번 부분적으로 읽을 수 있도록 파일 핸들(ExcelFile)과
+CSV 인코딩 감지 결과를 재사용한다.
+- 1단계: 상단 N행만 읽어 헤더(Segments 행 주변)를 확인
+- 2단계: 필요한 행/컬럼만 skiprows/usecols로 읽기
+
+CSV 인코딩은 파일 앞부분 바이트로 한 번만 판별하고(BOM → UTF-8 유효성 → cp949),
+판별된 인코딩으로 한 번에 디코딩한다. 판별이 틀렸으면(뒤쪽에만 다른 인코딩 문자가 있거나
+인코딩이 섞인 파일) 다른 후보로 다시 읽고, 모두 실패하면 디코딩 안 되는 바이트만 치환한다.
+큰 CSV는 pyarrow가 설치되어 있으면 멀티스레드 엔진으로 읽을 수 있다 (환경변수 CSV_ENGINE=auto/c/pyarrow).
+"""
+
+import codecs
+import importlib.util
+import os
+import time
+from pathlib import Path
+
+import pandas as pd
+
+SUPPORTED_EXTENSIONS = ('.xlsx', '.xls', '.csv')
+# 판별한 인코딩으로 디코딩이 실패했을 때 다시 시도하는 인코딩
+CSV_FALLBACK_ENCODINGS = ('utf-8', 'cp949')
+# 인코딩 판별 시 한 번에 읽는 바이트 수 (앞부분이 모두 ASCII면 비ASCII 바이트가 나올 때까지 이어서 읽음)
+ENCODING_SNIFF_BYTES = 64 * 1024
+# 인코딩 판별 시 최대로 읽는 바이트 수 (이 범위가 모두 ASCII면 utf-8로 판단, 대용량 파일 전체를 훑지 않음)
+ENCODING_SNIFF_MAX_BYTES = 4 * 1024 * 1024
+# CSV_ENGINE=auto일 때 pyarrow 엔진을 쓰기 시작하는 파일 크기
+PYARROW_CSV_MIN_BYTES = 32 * 1024 * 1024
+CSV_ENGINES = ('auto', 'c', 'pyarrow')
+BOM_ENCODINGS = (
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+
+def _decodes_as(sample, encoding):
+    """sample이 encoding으로 디코딩되는지 (끝에서 잘린 멀티바이트 문자는 허용)"""
+    try:
+        codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+def sniff_csv_encoding(file_path, sample_bytes=ENCODING_SNIFF_BYTES, max_bytes=ENCODING_SNIFF_MAX_BYTES):
+    """
+    CSV 파일 인코딩 판별: BOM → UTF-8 유효성 → cp949 → latin-1 순.
+    ASCII만 있는 구간은 판별에 쓸모가 없으므로 첫 비ASCII 바이트가 있는 구간을 검사한다 (최대 max_bytes까지).
+    """
+    return _sniff_csv_encoding(file_path, sample_bytes, max_bytes)[0]
+
+
+def _sniff_csv_encoding(file_path, sample_bytes, max_bytes):
+    """반환: (encoding, BOM이나 비ASCII 바이트로 판별했는지 - False면 ASCII뿐이라 utf-8로 가정)"""
+    with open(file_path, 'rb') as f:
+        sample = f.read(sample_bytes)
+        for bom, encoding in BOM_ENCODINGS:
+            if sample.startswith(bom):
+                return encoding, True
+        scanned = len(sample)
+        while sample and sample.isascii() and scanned < max_bytes:
+            sample = f.read(sample_bytes)
+            scanned += len(sample)
+        if not sample or sample.isascii():
+            # 전체(또는 판별 범위)가 ASCII (UTF-8의 부분집합). 뒤쪽이 다른 인코딩이면 읽을 때 다시 시도
+            return 'utf-8', False
+        # 앞 구간이 ASCII였으므로 sample 시작은 문자 경계. 끝에서 잘린 문자까지 포함되도록 조금 더 읽음
+        sample += f.read(4)
+    start = next(i for i, byte in enumerate(sample) if byte >= 0x80)
+    sample = sample[start:]
+    for encoding in ('utf-8', 'cp949'):
+        if _decodes_as(sample, encoding):
+            return encoding, True
+    return 'latin-1', True
+
+
+def _pyarrow_available():
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+class WorkbookReader:
+    """Excel 첫 번째 시트 또는 CSV 파일을 header=None으로 읽는 리더"""
+
+    def __init__(self, file_path):
+        self.file_path = str(file_path)
+        self.ext = Path(file_path).suffix.lower()
+        if self.ext not in SUPPORTED_EXTENSIONS:
+            raise ValueError(f"지원하지 않는 파일 형식입니다: {self.ext}. .xlsx, .xls, .csv만 지원합니다.")
+        self._excel = None
+        self._encoding = None
+        self._encoding_sniffed = False
+        self._csv_engine = None
+
+    @property
+    def is_csv(self):
+        return self.ext == '.csv'
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        if self._excel is not None:
+            self._excel.close()
+            self._excel = None
+
+    def read(self, nrows=None, skiprows=None, usecols=None, dtype=None):
+        """
+        시트를 header=None으로 읽기.
+        nrows: 앞에서부터 읽을 행 수 (None이면 전체)
+        skiprows: 건너뛸 앞쪽 행 수
+        usecols: 읽을 0-based 컬럼 인덱스 목록 (None이면 전체)
+        """
+        kwargs = {'header': None, 'nrows': nrows, 'skiprows': skiprows, 'usecols': usecols, 'dtype': dtype}
+        if self.is_csv:
+            return self._read_csv(**kwargs)
+        if self._excel is None:
+            self._excel = pd.ExcelFile(self.file_path)
+        return self._excel.parse(0, **kwargs)
+
+    def _sniff_encoding(self):
+        self._encoding, self._encoding_sniffed = _sniff_csv_encoding(
+            self.file_path, ENCODING_SNIFF_BYTES, ENCODING_SNIFF_MAX_BYTES
+        )
+
+    def csv_decode_attempts(self):
+        """
+        CSV 디코딩 시도 순서 [(encoding, encoding_errors)]: 판별한 인코딩 → 나머지 후보 →
+        판별한 인코딩으로 읽되 디코딩 안 되는 바이트만 치환 (인코딩이 섞인 파일도 읽히도록).
+        비ASCII 바이트로 판별한 경우는 다른 인코딩으로 읽으면 앞쪽 문자가 깨지므로 후보를 건너뛴다.
+        """
+        if self._encoding is None:
+            self._sniff_encoding()
+            print(f"DEBUG: CSV 인코딩 {self._encoding}: {Path(self.file_path).name}")
+        fallbacks = []
+        if not self._encoding_sniffed:
+            fallbacks = [(enc, 'strict') for enc in CSV_FALLBACK_ENCODINGS if enc != self._encoding]
+        return [(self._encoding, 'strict')] + fallbacks + [(self._encoding, 'replace')]
+
+    def read_csv_chunks(self, chunksize, encoding, encoding_errors='strict', usecols=None, dtype=None):
+        """
+        CSV를 header=None으로 chunksize행씩 읽는 이터레이터 (C 엔진, 대용량 스트리밍용).
+        청크 인덱스는 파일 전체 기준 행 번호로 이어진다.
+        encoding/encoding_errors는 csv_decode_attempts()의 한 항목 (디코딩 실패 시 호출 측에서 다음 항목으로 다시 읽음)
+        """
+        with pd.read_csv(self.file_path, encoding=encoding, encoding_errors=encoding_errors, header=None,
+                         usecols=usecols, dtype=dtype, chunksize=chunksize) as chunks:
+            yield from chunks
+
+    def _choose_csv_engine(self):
+        """CSV_ENGINE 환경변수(auto/c/pyarrow)와 파일 크기로 전체 읽기용 엔진 결정"""
+        requested = os.getenv('CSV_ENGINE', 'auto').lower()
+        if requested not in CSV_ENGINES:
+            requested = 'auto'
+        if requested == 'c' or not _pyarrow_available():
+            return 'c'
+        if requested == 'pyarrow' or os.path.getsize(self.file_path) >= PYARROW_CSV_MIN_BYTES:
+            return 'pyarrow'
+        return 'c'
+
+    def _read_csv(self, **kwargs):
+        if self._encoding is None:
+            started = time.perf_counter()
+            self._sniff_encoding()
+            self._csv_engine = self._choose_csv_engine()
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            print(f"DEBUG: CSV 인코딩 {self._encoding}, 엔진 {self._csv_engine} "
+                  f"(판별 {elapsed_ms:.1f}ms): {Path(self.file_path).name}")
+
+        # pyarrow 엔진은 nrows/skiprows를 지원하지 않으므로 전체 읽기에만 사용
+        if self._csv_engine == 'pyarrow' and kwargs['nrows'] is None and kwargs['skiprows'] is None:
+            started = time.perf_counter()
+            try:
+                df = pd.read_csv(self.file_path, encoding=self._encoding, engine='pyarrow', **kwargs)
+            except Exception as e:
+                print(f"DEBUG: pyarrow CSV 읽기 실패, C 엔진으로 재시도: {e}")
+                self._csv_engine = 'c'
+            else:
+                print(f"DEBUG: CSV 전체 읽기 (pyarrow) {(time.perf_counter() - started) * 1000:.1f}ms")
+                return df
+
+        # 앞부분 판별이 틀렸을 때(판별 범위 뒤쪽에만 다른 인코딩 문자가 있는 경우)만 나머지 인코딩으로 재시도
+        for encoding, errors in self.csv_decode_attempts():
+            started = time.perf_counter()
+            try:
+                df = pd.read_csv(self.file_path, encoding=encoding, encoding_errors=errors, **kwargs)
+            except UnicodeDecodeError as e:
+                print(f"DEBUG: CSV 디코딩 실패 ({encoding}), 다른 인코딩으로 재시도: {e}")
+                continue
+            if errors == 'strict' and encoding != self._encoding:
+                # 다른 후보로 읽혔으면 이후 읽기(스트리밍 포함)도 그 인코딩 사용
+                self._encoding, self._encoding_sniffed = encoding, True
+            elif errors != 'strict':
+                print(f"DEBUG: CSV 디코딩할 수 없는 바이트를 치환해서 읽음 ({encoding})")
+            if kwargs['nrows'] is None:
+                print(f"DEBUG: CSV 전체 읽기 ({encoding}) {(time.perf_counter() - started) * 1000:.1f}ms")
+            return df
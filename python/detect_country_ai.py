@@ -9,6 +9,12 @@ import json
 import requests
 import pandas as pd
 
+from core.country_codes import COUNTRY_CODES, COUNTRY_MATCHER
+from core.workbook_reader import WorkbookReader
+
+# Segments 탐색(50행) + Visits 탐색(100행) + Visits 아래 문맥(10행)을 덮는 행 수
+CONTEXT_SCAN_ROWS = 50 + 1 + 100 + 10
+
 def detect_country_with_ai(file_path, api_key=None):
     """
     AI를 사용하여 Excel 파일에서 국가 추출
@@ -27,9 +33,10 @@ def detect_country_with_ai(file_path, api_key=None):
         print("Warning: GEMINI_API_KEY 환경 변수가 설정되지 않았습니다.", file=sys.stderr)
         return None
     
-    # Excel 파일 읽기
+    # Excel 파일 읽기 (국가 문맥은 A열 상단만 사용하므로 필요한 범위만 읽음)
     try:
-        df = pd.read_excel(file_path, header=None)
+        with WorkbookReader(file_path) as reader:
+            df = reader.read(nrows=CONTEXT_SCAN_ROWS, usecols=[0])
     except Exception as e:
         print(f"Excel 파일 읽기 오류: {e}", file=sys.stderr)
         return None
@@ -75,15 +82,6 @@ def detect_country_with_ai(file_path, api_key=None):
     if not context_texts:
         return None
     
-    # 가능한 국가 코드 리스트
-    country_codes = ['N_AFRICA', 'AFRICA_EN', 'AFRICA_PT', 'AFRICA_FR', 'EG', 'ZA', 'AU', 'CN', 'HK', 'HK_EN', 'TW', 
-                     'IN', 'ID', 'JP', 'SEC', 'MY', 'MM', 'NZ', 'PH', 'SG', 'TH', 'VN', 'BD', 'MN', 'AL', 'AT', 'AZ', 
-                     'BE', 'BE_FR', 'BG', 'BA', 'HR', 'CZ', 'DK', 'EE', 'FI', 'FR', 'DE', 'GR', 'HU', 'IE', 'IL', 'IT', 
-                     'KZ_KZ', 'KZ_RU', 'LV', 'LT', 'NL', 'NO', 'MK', 'PL', 'PT', 'RO', 'RS', 'SK', 'SI', 'ES', 'SE', 
-                     'CH', 'CH_FR', 'TR', 'UA', 'UK', 'UZ_UZ', 'UZ_RU', 'GE', 'AR', 'LATIN_EN', 'LATIN', 'BR', 'CL', 
-                     'CO', 'MX', 'PE', 'PY', 'UY', 'PK', 'AE_AR', 'AE', 'IRAN', 'LEVANT', 'LEVANT_AR', 'SA', 'SA_EN', 
-                     'IQ_AR', 'IQ_KU', 'KB', 'CA', 'CA_FR', 'US', 'PS']
-    
     # 프롬프트 생성
     context = '\n'.join(context_texts[:20])  # 최대 20개 텍스트만 사용
     prompt = f"""다음은 Adobe Analytics A/B 테스트 Excel 파일에서 추출한 텍스트입니다:
@@ -91,7 +89,7 @@ def detect_country_with_ai(file_path, api_key=None):
 {context}
 
 위 텍스트에서 국가 코드를 찾아주세요. 가능한 국가 코드 목록은 다음과 같습니다:
-{', '.join(country_codes)}
+{', '.join(COUNTRY_CODES)}
 
 텍스트에서 정확히 일치하는 국가 코드를 찾아서 답변해주세요. 국가 코드만 답변해주세요. (예: UK, US, JP, KR 등)
 찾지 못하면 "NOT_FOUND"를 답변해주세요."""
@@ -121,14 +119,10 @@ def detect_country_with_ai(file_path, api_key=None):
             if parts and len(parts) > 0:
                 ai_response = parts[0].get('text', '').strip().upper()
                 
-                # AI 응답에서 국가 코드 추출
-                for code in country_codes:
-                    if code in ai_response or ai_response == code:
-                        return code
-                
-                # NOT_FOUND가 아닌 경우 응답 자체를 국가 코드로 사용 시도
-                if ai_response != 'NOT_FOUND' and ai_response in country_codes:
-                    return ai_response
+                # AI 응답에서 국가 코드 추출 (NOT_FOUND는 코드와 일치하지 않음)
+                code = COUNTRY_MATCHER.match(ai_response)
+                if code:
+                    return code
         
         return None
         
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+파싱 데이터 XLSX 생성 (/api/parsed-data 요청 시 실행)
+
+analyze.py가 저장한 중간 파일(tmp/parsed_data.pkl)로 tmp/parsed_data.xlsx를 만든다.
+중간 파일이 원본 파일 링크로 저장된 경우 원본을 전체 컬럼으로 다시 파싱한다 (analyze.rebuild_parsed_data).
+이미 최신 XLSX가 있으면 다시 만들지 않는다.
+
+사용법: python export_parsed_data.py [tmp_dir]
+"""
+
+import os
+import sys
+from pathlib import Path
+
+from analyze import rebuild_parsed_data
+from core.parsed_data import export_parsed_data_xlsx
+
+
+def main():
+    tmp_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else Path(os.getcwd()) / 'tmp'
+    xlsx_path = export_parsed_data_xlsx(tmp_dir, rebuild_parsed_data)
+    if xlsx_path is None:
+        print(f"파싱 데이터가 없습니다: {tmp_dir}")
+        sys.exit(1)
+    print(f"Parsed data exported to {xlsx_path}")
+
+
+if __name__ == '__main__':
+    main()
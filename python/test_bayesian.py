@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Bayesian 사후확률 테스트 (해석적 계산 ↔ Monte Carlo 회귀 비교)
+"""
+
+import numpy as np
+import pytest
+from scipy import integrate, stats
+
+import analyze
+from analyze import _TH_SOFT, _TH_STRONG, compute_bayesian_probs, compute_bayesian_probs_batch
+from core.bayesian import (
+    CellStreams, adaptive_mc_uplift_probs, exceed_probs, mc_uplift_probs, qmc_uplift_probs, stream_seed, uplift_probs,
+)
+
+# Monte Carlo 표준오차(50,000회, p=0.5에서 0.0022)의 약 4배
+MC_TOLERANCE = 0.01
+
+# (cd, cn, vd, vn): 소량/대량 모수, 명확한 승자, 경계 근처, 전환율이 높은 경우
+REGRESSION_CELLS = [
+    (1000, 60, 1000, 75),
+    (10000, 300, 10100, 360),
+    (10000, 300, 9900, 310),
+    (50000, 1500, 50000, 1580),
+    (50000, 1500, 50000, 1400),
+    (200000, 4000, 200000, 4150),
+    (1000000, 30000, 1000000, 31200),
+    (5000, 4800, 5000, 4900),
+    (3000000, 400000, 3000000, 404000),
+    (80000, 2000, 20000, 520),
+]
+
+
+@pytest.fixture(autouse=True)
+def no_result_cache(monkeypatch):
+    # 시드를 고정한 추출 결과를 비교하므로 결과 캐시는 사용하지 않음
+    monkeypatch.setenv('BAYESIAN_CACHE', '0')
+
+
+def _near_threshold(p):
+    return any(abs(p - th) < MC_TOLERANCE for th in (_TH_SOFT, _TH_STRONG))
+
+
+@pytest.mark.parametrize('cell', REGRESSION_CELLS)
+def test_analytic_matches_monte_carlo(cell, monkeypatch):
+    monkeypatch.setattr(analyze, '_BAYESIAN_RNG', np.random.default_rng(2024))
+    analytic = compute_bayesian_probs(*cell, mode='analytic')
+    mc = compute_bayesian_probs(*cell, mode='mc')
+    for p_analytic, p_mc in zip(analytic[:5], mc[:5]):
+        assert p_analytic == pytest.approx(p_mc, abs=MC_TOLERANCE)
+    # 경계(0.8/0.9) 근처가 아니면 decision이 같아야 함
+    if not (_near_threshold(mc[2]) or _near_threshold(mc[3])):
+        assert analytic[5] == mc[5]
+
+
+def test_exceed_probs_quadrature_and_normal_approximation():
+    # 수치 적분 결과를 scipy quad와 비교 (k = 1, 1.03, 0.97)
+    a_c, b_c, a_v, b_v = 301.0, 9701.0, 361.0, 9741.0
+    ks = (1.0, 1.03, 0.97)
+    quad = [
+        integrate.quad(lambda x, k=k: stats.beta.pdf(x, a_c, b_c) * stats.beta.sf(min(k * x, 1.0), a_v, b_v),
+                       0.0, 1.0, points=[a_c / (a_c + b_c)], limit=200)[0]
+        for k in ks
+    ]
+    assert [p[0] for p in exceed_probs([a_c], [b_c], [a_v], [b_v], ks)] == pytest.approx(quad, abs=1e-6)
+
+    # 큰 모수는 정규근사로 전환되고 적분 결과와 1e-4 이내
+    big = ([400001.0], [2600001.0], [404001.0], [2596001.0])
+    normal = exceed_probs(*big, ks)
+    quadrature = exceed_probs(*big, ks, normal_min=np.inf)
+    assert [p[0] for p in normal] == pytest.approx([p[0] for p in quadrature], abs=1e-4)
+
+
+def test_batch_keeps_cell_order_and_edge_cases():
+    cells = [(1000, 10, 1000, 80), (10000, 300, 10100, 360), (0, 100, 100, 100), (10000, 500, 10000, 400)]
+    batch = compute_bayesian_probs_batch(*zip(*cells), mode='analytic')
+    assert batch[0] == (None, None, None, None, None, '모수부족 (60건 미만)')
+    assert batch[2] == (None,) * 6
+    assert batch[1] == compute_bayesian_probs(*cells[1], mode='analytic')
+    assert batch[3][5] == 'Strong Control Winner'
+    assert sum(batch[1][2:5]) == pytest.approx(1.0, abs=2e-4)
+
+
+class _RecordingRng:
+    """beta 추출 크기를 기록하는 Generator 래퍼"""
+
+    def __init__(self, seed):
+        self._rng = np.random.default_rng(seed)
+        self.shapes = []
+
+    def beta(self, a, b, size=None):
+        self.shapes.append(size)
+        return self._rng.beta(a, b, size=size)
+
+
+def test_mc_single_cell_matches_per_cell_draws():
+    a_c, b_c, a_v, b_v = 301.0, 9701.0, 361.0, 9741.0
+    rng = np.random.default_rng(7)
+    p_c = rng.beta(a_c, b_c, 50_000)
+    p_v = rng.beta(a_v, b_v, 50_000)
+    uplift = (p_v - p_c) / p_c
+    expected = [np.mean(uplift > 0), np.mean(uplift < 0), np.mean(uplift > 0.03),
+                np.mean(uplift < -0.03), np.mean(np.abs(uplift) <= 0.03)]
+    probs = mc_uplift_probs([a_c], [b_c], [a_v], [b_v], 0.03, 50_000, np.random.default_rng(7))
+    assert [p[0] for p in probs] == expected
+
+
+def test_mc_shares_control_draws_and_chunks_blocks():
+    # Control 2종 × Variation 3개
+    cells = [(1000 + s, 30 + s, 1000, 30 + 5 * v) for s in (0, 100) for v in range(3)]
+    a_c, b_c, a_v, b_v = (np.array(x, dtype=float) for x in zip(*[
+        (cn + 1, cd - cn + 1, vn + 1, vd - vn + 1) for cd, cn, vd, vn in cells
+    ]))
+    rng = _RecordingRng(11)
+    probs = mc_uplift_probs(a_c, b_c, a_v, b_v, 0.03, 20_000, rng)
+    # Control 2행 + Variation 6행 (셀마다 Control을 추출하면 12행)
+    assert rng.shapes == [20_000] * 8
+
+    # Control마다 Control → 해당 Variation 순서로 추출한 값으로 직접 계산한 결과와 같음
+    manual = np.random.default_rng(11)
+    for cell in range(6):
+        if cell % 3 == 0:
+            p_c = manual.beta(a_c[cell], b_c[cell], 20_000)
+        p_v = manual.beta(a_v[cell], b_v[cell], 20_000)
+        uplift = (p_v - p_c) / p_c
+        assert probs[2][cell] == np.mean(uplift > 0.03)
+        assert probs[4][cell] == np.mean(np.abs(uplift) <= 0.03)
+
+    # 블록을 잘게 나눠도 (청크 여러 개, 추출 분할) 해석적 결과와 일치
+    rng = _RecordingRng(11)
+    chunked = mc_uplift_probs(a_c, b_c, a_v, b_v, 0.03, 20_000, rng, block_elements=10_000)
+    assert len(rng.shapes) > 8 and all(sims <= 5_000 for sims in rng.shapes)
+    analytic = uplift_probs(a_c, b_c, a_v, b_v, 0.03)
+    for p_mc, p_chunked, p_analytic in zip(probs, chunked, analytic):
+        assert p_mc == pytest.approx(p_analytic, abs=2 * MC_TOLERANCE)
+        assert p_chunked == pytest.approx(p_analytic, abs=2 * MC_TOLERANCE)
+
+
+def test_adaptive_mc_stops_early_and_respects_cap(monkeypatch):
+    monkeypatch.setattr(analyze, '_BAYESIAN_RNG', np.random.default_rng(5))
+    analytic = compute_bayesian_probs_batch(*zip(*REGRESSION_CELLS), mode='analytic')
+    adaptive = compute_bayesian_probs_batch(*zip(*REGRESSION_CELLS), mode='adaptive')
+    for p_analytic, p_adaptive in zip(analytic, adaptive):
+        if not (_near_threshold(p_analytic[2]) or _near_threshold(p_analytic[3])):
+            assert p_analytic[5] == p_adaptive[5]
+
+    # 명확한 셀은 첫 step에서 종료, 경계에 걸친 셀은 max_sims까지 추출
+    a_c, b_c, a_v, b_v = (np.array(x, dtype=float) for x in ([501, 301], [9501, 9701], [401, 272], [9601, 9730]))
+    exact = uplift_probs(a_c, b_c, a_v, b_v, 0.03)
+    assert exact[3][1] == pytest.approx(_TH_SOFT, abs=0.02)
+    probs, draws = adaptive_mc_uplift_probs(a_c, b_c, a_v, b_v, 0.03, (_TH_SOFT, _TH_STRONG), 20_000,
+                                            np.random.default_rng(5), step=2_500)
+    assert draws.tolist() == [2_500, 20_000]
+    assert probs[3] == pytest.approx(exact[3], abs=MC_TOLERANCE)
+
+
+def test_bayesian_max_sims_env(monkeypatch):
+    monkeypatch.setenv('BAYESIAN_MAX_SIMS', '8000')
+    assert analyze.get_bayesian_max_sims() == 8000
+    monkeypatch.setenv('BAYESIAN_MAX_SIMS', 'abc')
+    assert analyze.get_bayesian_max_sims() == analyze._N_SIMS
+
+
+def test_qmc_matches_analytic_with_fewer_draws(monkeypatch):
+    monkeypatch.setattr(analyze, '_BAYESIAN_RNG', np.random.default_rng(3))
+    analytic = compute_bayesian_probs_batch(*zip(*REGRESSION_CELLS), mode='analytic')
+    quasi = compute_bayesian_probs_batch(*zip(*REGRESSION_CELLS), mode='qmc')
+    for p_analytic, p_qmc in zip(analytic, quasi):
+        # 4,096점 Sobol 오차는 50,000회 Monte Carlo 허용 오차의 1/5 이내
+        assert p_qmc[:5] == pytest.approx(p_analytic[:5], abs=MC_TOLERANCE / 5)
+
+    # 점 개수는 2의 거듭제곱으로 올림, 같은 시드면 같은 결과
+    posterior = ([301.0], [9701.0], [361.0], [9741.0])
+    first = qmc_uplift_probs(*posterior, 0.03, 1000, np.random.default_rng(9))
+    assert qmc_uplift_probs(*posterior, 0.03, 1000, np.random.default_rng(9)) == first
+    assert (first[0] * 1024)[0] == pytest.approx(round((first[0] * 1024)[0]))
+
+
+@pytest.mark.parametrize('mode', ['mc', 'adaptive', 'qmc'])
+def test_cell_streams_are_order_independent(mode, monkeypatch):
+    cells = REGRESSION_CELLS[:5]
+    keys = [('UK', 1, 'CVR', 'All', 1), ('UK', 1, 'CVR', 'All', 2), ('UK', 1, 'CVR', 'PC', 1),
+            ('DE', 2, 'CVR', 'All', None), ('UK', 1, 'AOV', 'All', 1)]
+    forward = compute_bayesian_probs_batch(*zip(*cells), mode=mode, cell_keys=keys)
+
+    # 역순 계산, 셀 하나만 계산, 공유 난수열 상태가 달라도 셀별 결과가 같음
+    monkeypatch.setattr(analyze, '_BAYESIAN_RNG', np.random.default_rng(99))
+    backward = compute_bayesian_probs_batch(*zip(*cells[::-1]), mode=mode, cell_keys=keys[::-1])
+    assert backward[::-1] == forward
+    assert compute_bayesian_probs_batch(*zip(cells[1]), mode=mode, cell_keys=[keys[1]]) == [forward[1]]
+
+    monkeypatch.setenv('BAYESIAN_SEED', '7')
+    assert compute_bayesian_probs_batch(*zip(*cells), mode=mode, cell_keys=keys) != forward
+
+
+def test_cell_streams_share_control_draws():
+    streams = CellStreams(42, [('c', 'All'), ('c', 'PC'), ('c', 'All')], [('v', 1), ('v', 2), ('v', 3)])
+    assert streams.control_of.tolist() == [0, 1, 0] and len(streams.controls) == 2
+    subset = streams.subset(np.array([2]))
+    assert subset.controls is streams.controls and subset.variations == [streams.variations[2]]
+    assert stream_seed(42, ('c', 'All')).generate_state(4).tolist() == \
+        stream_seed(42, ['c', 'All']).generate_state(4).tolist()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Bayesian 결과 캐시 테스트
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import analyze
+from analyze import compute_bayesian_probs_batch
+from core.bayesian_cache import BayesianCache, bayesian_cell_key, bayesian_settings_key
+
+CELLS = [(10000, 300, 10100, 360), (10000, 300, 9900, 310), (1000, 10, 1000, 80)]
+
+
+@pytest.fixture
+def fresh_cache(monkeypatch):
+    monkeypatch.delenv('BAYESIAN_CACHE', raising=False)
+    monkeypatch.delenv('BAYESIAN_CACHE_DISK', raising=False)
+    monkeypatch.setattr(analyze, '_bayesian_cache', None)
+    return analyze.get_bayesian_cache
+
+
+def test_repeated_cells_skip_simulation(fresh_cache, monkeypatch):
+    monkeypatch.setattr(analyze, '_BAYESIAN_RNG', np.random.default_rng(1))
+    first = compute_bayesian_probs_batch(*zip(*CELLS), mode='mc')
+    state = analyze._BAYESIAN_RNG.bit_generator.state
+    # 재실행: 계산 대상 셀 2개 모두 적중, 난수 추출 없음
+    assert compute_bayesian_probs_batch(*zip(*CELLS), mode='mc') == first
+    assert analyze._BAYESIAN_RNG.bit_generator.state == state
+    cache = fresh_cache()
+    assert (cache.hits, cache.misses) == (2, 2)
+
+    # 계산 방식이 다르면 별도 키
+    compute_bayesian_probs_batch(*zip(*CELLS), mode='analytic')
+    assert cache.misses == 4
+
+
+def test_settings_change_the_key():
+    base = bayesian_settings_key(mode='mc', sims=50_000, uplift_threshold=0.03)
+    assert base == bayesian_settings_key(uplift_threshold=0.03, sims=50_000, mode='mc')
+    assert base != bayesian_settings_key(mode='mc', sims=50_000, uplift_threshold=0.05)
+    assert bayesian_cell_key(base, 100, 60, 100, 70) == bayesian_cell_key(base, 100.0, 60.0, 100.0, 70.0)
+
+
+def test_disk_store_is_shared_and_bounded(tmp_path):
+    path = tmp_path / 'bayesian_cache.json'
+    result = (0.9, 0.1, 0.85, 0.05, 0.1, 'Soft Variation Winner')
+    settings = bayesian_settings_key(mode='mc', sims=50_000)
+    a, b, c = (bayesian_cell_key(settings, 10000, 300, 10000, n) for n in (310, 320, 330))
+    first = BayesianCache(10, path)
+    first.put_many([(a, result)])
+    # 새 항목은 flush() 전까지 파일에 쓰지 않음 (작업 끝에 한 번 저장)
+    assert not path.exists()
+    assert first.flush() == 1 and first.flush() == 0
+    other = BayesianCache(10, path)
+    assert other.get_many([a, b]) == [result, None]
+
+    # 다른 프로세스가 저장한 항목과 합쳐 저장, 최대 항목 수를 넘으면 오래된 항목부터 삭제
+    second = BayesianCache(2, path)
+    second.put_many([(b, result)])
+    second.flush()
+    other.max_entries = 2
+    other.put_many([(c, result)])
+    other.flush()
+    assert BayesianCache(10, path).get_many([a, b, c]) == [None, result, result]
+
+
+def test_disk_store_writes_settings_once(tmp_path):
+    path = tmp_path / 'bayesian_cache.json'
+    result = (0.9, 0.1, 0.85, 0.05, 0.1, 'Soft Variation Winner')
+    mc = bayesian_settings_key(mode='mc', sims=50_000, prior=[1.0, 1.0], uplift_threshold=0.03)
+    qmc = bayesian_settings_key(mode='qmc', sims=4096, prior=[1.0, 1.0], uplift_threshold=0.03)
+    keys = [bayesian_cell_key(settings, 10000, 300, 10000, n, stream_key=('UK', 'CVR', 'All', n))
+            for n in range(300, 400) for settings in (mc, qmc)]
+    cache = BayesianCache(1000, path)
+    cache.put_many([(key, result) for key in keys])
+    cache.flush()
+
+    stored = json.loads(path.read_text(encoding='utf-8'))
+    assert stored['settings'] == [mc, qmc]
+    assert stored['entries'][:2] == [[0, keys[0][1], list(result)], [1, keys[1][1], list(result)]]
+    assert BayesianCache(1000, path).get_many(keys) == [result] * len(keys)
+
+    # 이전 형식(설정 키가 항목마다 들어간 {키: 결과}) 파일은 무시하고 새로 만듦
+    path.write_text('{"old|1.0|2.0|3.0|4.0": [0.5, 0.5, 0.1, 0.1, 0.8, "Neutral"]}', encoding='utf-8')
+    assert BayesianCache(1000, path).get_many(keys[:1]) == [None]
+
+
+def test_process_pool_workers_hand_new_entries_to_parent(tmp_path, monkeypatch):
+    # 워커가 계산한 항목은 부모로 모아 작업 끝에 한 번만 저장
+    config = {
+        'segments': ['All'], 'variationCount': 1,
+        'primaryKPIs': [{'name': 'CVR', 'type': 'rate', 'numerator': 'Orders', 'denominator': 'Visits'}],
+    }
+    data = pd.DataFrame({'A': ['Visits', 'Orders'], 'B': [10000, 300], 'C': [10100, 360]})
+    tasks = [
+        (step, data, {}, country, True, ['UK', 'DE', 'FR'], config, '1st report')
+        for step, country in enumerate(['UK', 'DE', 'FR'])
+    ]
+    path = tmp_path / 'bayesian_cache.json'
+    # mc 모드: 셀별 난수열 키가 달라 국가마다 별도 항목
+    monkeypatch.setenv('BAYESIAN_MODE', 'mc')
+    monkeypatch.setenv('BAYESIAN_CACHE', '1')
+    monkeypatch.setenv('BAYESIAN_CACHE_DISK', '1')
+    monkeypatch.setenv('BAYESIAN_CACHE_PATH', str(path))
+    monkeypatch.setattr(analyze, '_bayesian_cache', None)
+    writes = []
+    monkeypatch.setattr(BayesianCache, '_write_file', lambda self, items: writes.append(len(items)))
+
+    analyze.analyze_combinations(tasks, 'process', 2)
+    assert writes == []
+    analyze.flush_bayesian_cache()
+    assert writes == [3]
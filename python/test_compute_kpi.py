@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+KPI 계산 엔진 테스트
+"""
+
+import multiprocessing
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import analyze
+from analyze import (
+    KPI_TYPES, analyze_combinations, compute_kpi, get_analysis_backend, partition_combinations, register_kpi_type,
+)
+
+_analyze_combination = analyze._analyze_combination
+
+
+def _analyze_combination_killed_in_worker(args):
+    """마지막 조합을 분석하는 프로세스 풀 워커를 강제 종료 (OOM으로 죽은 워커 흉내)"""
+    if args[0] == 2 and multiprocessing.parent_process() is not None:
+        os._exit(1)
+    return _analyze_combination(args)
+
+
+@pytest.fixture
+def data_df():
+    return pd.DataFrame({
+        'A': ['Visits', 'Orders', 'Revenue'],
+        'B': [None, None, None],
+        'C': [None, None, None],
+        'D': [10000, 300, 50000.0],
+        'E': [10100, 360, '54,000'],
+        'F': [9900, None, 51000.0],
+    })
+
+
+def test_rate_kpi_single_variation_without_debug(data_df):
+    kpi = {'name': 'CVR', 'type': 'rate', 'numerator': 'Orders', 'denominator': 'Visits'}
+    results, missing = compute_kpi(data_df, kpi, 'UK', [('All', 'D', 'E'), ('PC', 'D', 'F')], 1)
+    assert len(results) == 1 and results[0]['device'] == 'All'
+    assert results[0]['controlRate'] == 0.03
+    assert results[0]['uplift'] == pytest.approx((360 / 10100 - 0.03) / 0.03 * 100)
+    assert results[0]['denominatorSize'] == 20100
+    assert missing == [{'metric': 'Orders', 'segment': 'PC', 'country': 'UK', 'reportOrder': None}]
+
+
+def test_simple_kpi_without_denominator_reports_int_zero_sizes(data_df):
+    # 분모가 없는 simple KPI: 분모 크기는 기존 결과(JSON)와 같이 정수 0
+    kpi = {'name': 'Orders', 'type': 'simple', 'numerator': 'Orders'}
+    results, _ = compute_kpi(data_df, kpi, 'UK', [('All', 'D', 'E')], 1)
+    sizes = [results[0][key] for key in ('denominatorSize', 'denominatorSizeControl', 'denominatorSizeVariation')]
+    assert sizes == [0, 0, 0] and all(type(size) is int for size in sizes)
+    [group], _ = compute_kpi(data_df, kpi, 'UK', [('All - Variation 1', 'D', 'E', 'All')], 2)
+    assert type(group['denominatorSizeControl']) is int
+    assert type(group['variations'][0]['denominatorSizeVariation']) is int
+
+
+def test_multi_variation_results_group_by_segment(data_df):
+    kpi = {'name': 'RPV', 'type': 'rpv', 'numerator': 'Revenue', 'denominator': 'Visits'}
+    segments = [('All - Variation 2', 'D', 'F', 'All'), ('All - Variation 1', 'D', 'E', 'All')]
+    results, missing = compute_kpi(data_df, kpi, 'UK', segments, 2)
+    assert missing == []
+    [result] = results
+    assert result['controlRate'] == 5.0 and result['p_gt0'] is None
+    assert [v['variationNum'] for v in result['variations']] == [1, 2]
+    assert result['variations'][0]['variationValue'] == 54000.0
+
+
+def test_registered_kpi_type_is_evaluated(data_df, monkeypatch):
+    # 테스트 후 레지스트리에서 제거
+    monkeypatch.setitem(KPI_TYPES, 'orders_per_visit_x1000', None)
+    register_kpi_type(
+        ('orders_per_visit_x1000',),
+        operands={'num': ('numerator', None), 'den': ('denominator', None)},
+        formulas=lambda c, v, kpi_config: {'value_v': np.divide(v['num'], v['den']) * 1000},
+        control_operands=(),
+        variation_required=('num', 'den'),
+        row_fields=(('variationValue', 'value_v'),),
+        group_fields=(('variations', 'variations'),),
+        variation_fields=(('variationValue', 'value_v'),),
+    )
+    kpi = {'name': 'OPV', 'type': 'orders_per_visit_x1000', 'numerator': 'Orders', 'denominator': 'Visits'}
+    results, _ = compute_kpi(data_df, kpi, 'UK', [('All', 'D', 'E')], 1)
+    assert results[0]['variationValue'] == pytest.approx(360 / 10100 * 1000)
+
+
+def test_combinations_merge_in_task_order_with_monotonic_progress(data_df, monkeypatch):
+    monkeypatch.setenv('BAYESIAN_MODE', 'mc')
+    config = {
+        'segments': ['All'], 'variationCount': 1,
+        'primaryKPIs': [{'name': 'CVR', 'type': 'rate', 'numerator': 'Orders', 'denominator': 'Visits'}],
+    }
+    data = data_df.drop(columns=['B', 'C']).rename(columns={'D': 'B', 'E': 'C'})[['A', 'B', 'C']]
+    tasks = [
+        (step, data, {}, country, True, ['UK', 'DE', 'FR'], config, order)
+        for step, (order, country) in enumerate([('1st report', 'UK'), ('1st report', 'DE'), ('2nd report', 'FR')])
+    ]
+    progress = []
+    sequential = analyze_combinations(tasks, 'sequential', 1, lambda done, total: progress.append((done, total)))
+    assert progress == [(1, 3), (2, 3), (3, 3)]
+    assert [(r[0]['country'], r[0]['reportOrder']) for r in sequential] == [
+        ('UK', '1st report'), ('DE', '1st report'), ('FR', '2nd report'),
+    ]
+    # 프로세스 풀: 완료 순서와 무관하게 같은 순서·같은 Bayesian 결과
+    assert analyze_combinations(tasks, 'process', 2) == sequential
+    # 작업 중 워커가 죽으면 끝나지 않은 조합만 순차 분석
+    monkeypatch.setattr(analyze, '_analyze_combination', _analyze_combination_killed_in_worker)
+    assert analyze_combinations(tasks, 'process', 2) == sequential
+
+
+def test_analysis_backend_selection(monkeypatch):
+    monkeypatch.setattr(analyze, '_available_cpu_count', lambda: 4)
+    monkeypatch.delenv('ANALYSIS_BACKEND', raising=False)
+    assert get_analysis_backend({}, 12) == ('process', 4)
+    assert get_analysis_backend({}, 2) == ('sequential', 1)
+    assert get_analysis_backend({'analysisBackend': 'sequential'}, 12) == ('sequential', 1)
+    monkeypatch.setenv('ANALYSIS_BACKEND', 'process')
+    assert get_analysis_backend({}, 2) == ('process', 2)
+
+
+def test_partition_combinations_slices_once():
+    combined = pd.DataFrame({
+        'Report Order': ['1st', '1st', '2nd', '2nd', '1st', None],
+        'Country': ['UK', 'UK', 'UK', 'UK', 'DE', 'DE'],
+        'Segment': ['Visits', 'Orders', 'Visits', 'Orders', 'Visits', 'Visits'],
+        'All - Control': [1.0, 2.0, 3.0, 4.0, 5.0, 6.0],
+        'All - Variation 1': [7.0, 8.0, 9.0, 10.0, 11.0, 12.0],
+    })
+    parts = partition_combinations(combined)
+    assert [(order, country, len(df)) for order, country, df in parts] == [('1st', 'UK', 2), ('2nd', 'UK', 2), ('1st', 'DE', 1)]
+    order, country, uk_first = parts[0]
+    assert list(uk_first.columns) == ['A', 'B', 'C'] and uk_first['A'].tolist() == ['Visits', 'Orders']
+    assert np.shares_memory(uk_first['B'].to_numpy(), combined['All - Control'].to_numpy())
+
+    # 같은 조합의 행이 떨어져 있으면 정렬 후 분할 (처음 나온 순서 유지)
+    shuffled = combined.iloc[[0, 2, 1, 4, 3]]
+    assert [(o, c, df['B'].tolist()) for o, c, df in partition_combinations(shuffled)] == [
+        ('1st', 'UK', [1.0, 2.0]), ('2nd', 'UK', [3.0, 4.0]), ('1st', 'DE', [5.0]),
+    ]
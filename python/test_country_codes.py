@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+사이트 코드 매처 테스트
+"""
+
+import pandas as pd
+
+from analyze import detect_countries_from_b_column, detect_country_from_excel
+from core.country_codes import COUNTRY_MATCHER
+
+
+def test_country_matcher_prefers_longest_whole_code():
+    assert COUNTRY_MATCHER.match('CH_FR') == 'CH_FR'
+    assert COUNTRY_MATCHER.match('ch mobile') == 'CH'
+    assert COUNTRY_MATCHER.match('UZ_UZ') == 'UZ_UZ'
+    assert COUNTRY_MATCHER.match('UK_MO Device') == 'UK'
+    # 단어 일부(ALL의 AL, VISITS의 IT)나 응답 문구는 코드로 보지 않음
+    assert COUNTRY_MATCHER.match('All Visits') is None
+    assert COUNTRY_MATCHER.match('NOT_FOUND') is None
+    assert COUNTRY_MATCHER.match(None) is None
+    assert COUNTRY_MATCHER.match_cells(['All Visits', None, 'FR Mobile', float('nan'), 'x BE_FR']) == [
+        None, None, 'FR', None, 'BE_FR',
+    ]
+
+
+def test_detect_countries_from_header_rows():
+    df = pd.DataFrame([
+        [None, 'UK', 'UK', 'CH_FR MO', 'CH_FR MO', 'All Visits', 'All Visits'],
+        [None, 'UK - Control', 'UK - Variation', 'CH_FR - Control', 'CH_FR - Variation', None, None],
+        ['Segments', 'Control', 'Variation', 'Control', 'Variation', 'Control', 'Variation'],
+        ['Visits', 1, 2, 3, 4, 5, 6],
+    ])
+    assert detect_countries_from_b_column(df, 2) == ['UK', 'CH_FR']
+
+    single = pd.DataFrame([['Segments', 'Control'], ['Visits', 1], ['Report suite: DE', None]])
+    assert detect_countries_from_b_column(single, 0) is None
+    assert detect_country_from_excel(single, 0) == 'DE'
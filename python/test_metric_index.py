@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+A열 메트릭 라벨 인덱스 테스트
+"""
+
+import pandas as pd
+
+from analyze import compute_kpi, find_metric_value, plan_metric_lookups
+from core.metric_index import MetricIndex, clean_label, get_metric_index, resolve_metric_matrix
+
+
+def test_metric_index_first_match_like_str_contains():
+    labels = pd.Series(['Visits', None, 'Orders (2)', 'Cart_Add > Series', 'Unique Visits', 'Orders'], dtype=object)
+    index = MetricIndex(labels.to_numpy())
+    for query in ['Visits', 'visits', 'Orders', 'Orders2', 'cartadd', 'Series', 'x', '', 'Revenue']:
+        cleaned = clean_label(query)
+        mask = labels.apply(clean_label).str.contains(cleaned, case=False, na=False, regex=False)
+        expected = int(mask.to_numpy().nonzero()[0][0]) if mask.any() else None
+        assert index.first_containing(cleaned) == expected
+
+
+def test_find_metric_value_uses_frame_index():
+    data_df = pd.DataFrame({
+        'A': ['Visits', 'Orders', '(Cart 2) Cart add Series (Visitor)'],
+        'B': [1000, 50, 7],
+        'C': ['1,010', '-', 8],
+    })
+    assert find_metric_value(data_df, 'Visits', 'UK', 'C') == 1010.0
+    assert find_metric_value(data_df, 'Orders', 'UK', 'C') is None
+    # 핵심 단어 폴백: 숫자·괄호를 뺀 이름으로 재검색
+    assert find_metric_value(data_df, 'Cart add_25 Series', 'UK', 'B') == 7
+    assert find_metric_value(data_df, 'Revenue', 'UK', 'B') is None
+    assert get_metric_index(data_df) is get_metric_index(data_df)
+
+    # A열이 바뀌면 인덱스를 다시 만듦
+    data_df['A'] = ['Orders', 'Visits', 'Cart']
+    assert find_metric_value(data_df, 'Visits', 'UK', 'B') == 50
+
+
+def test_resolve_metric_matrix_matches_find_metric_value():
+    data_df = pd.DataFrame({
+        'A': ['Visits', 'Orders', 'Revenue', 'Cart add (Visitor)'],
+        'B': [1000, 50, 7.5, 3],
+        'C': ['1,010', '-', 'x', 8],
+    })
+    labels = ['Visits', 'Orders', 'Revenue', 'Cart add_25', 'Units', '']
+    matrix = resolve_metric_matrix(data_df, labels, ['B', 'C', 'Z', 'B'])
+    assert matrix.columns == ['B', 'C']
+    assert ('Units', 'B') in matrix and ('Visits', 'Z') not in matrix
+    for label in labels[:-1]:
+        for col in matrix.columns:
+            assert matrix.get(label, col) == find_metric_value(data_df, label, None, col)
+    assert matrix.missing.tolist() == [[False, False], [False, True], [False, True], [False, False], [True, True]]
+
+
+def test_compute_kpi_batch_lookup_matches_per_cell_lookup():
+    data_df = pd.DataFrame({
+        'A': ['Visits', 'Orders', 'Revenue'],
+        'B': [None, None, None],
+        'C': [None, None, None],
+        'D': [1000, 30, 5000.0],
+        'E': [1010, 36, '5,400'],
+        'F': [990, 33, 5100.0],
+    })
+    segments = [('All - Variation 1', 'D', 'E'), ('All - Variation 2', 'D', 'F')]
+    configs = [
+        {'name': 'CVR', 'type': 'rate', 'numerator': 'Orders', 'denominator': 'Visits'},
+        {'name': 'RPV', 'type': 'rpv', 'numerator': 'Revenue', 'denominator': 'Visits'},
+        {'name': 'Revenue', 'type': 'revenue', 'numerator': 'Revenue'},
+    ]
+    for kpi_config in configs:
+        for segment_mapping, variation_count in [(segments, 2), (segments[:1], 1)]:
+            batched = compute_kpi(data_df, kpi_config, segment_mapping=segment_mapping, variation_count=variation_count)
+            # 빈 행렬을 넘기면 모든 값을 find_metric_value로 조회
+            per_cell = compute_kpi(data_df, kpi_config, segment_mapping=segment_mapping, variation_count=variation_count,
+                                   metric_matrix=resolve_metric_matrix(data_df, [], []))
+            assert batched == per_cell
+
+
+def test_plan_metric_lookups_shares_operands_across_kpis():
+    kpis = [
+        {'name': 'CVR', 'type': 'rate', 'numerator': 'Orders', 'denominator': 'Visits'},
+        {'name': 'Cart CVR', 'type': 'rate', 'numerator': 'Cart Add', 'denominator': 'Visits'},
+        {'name': 'Revenue', 'type': 'revenue', 'numerator': ''},
+        {'name': 'RPV', 'type': 'rpv', 'numerator': 'Revenue', 'denominator': 'Visits'},
+        {'name': 'AOV', 'type': 'aop', 'numerator': 'Revenue', 'denominator': 'Orders'},
+    ]
+    segments = [('All - Variation 1', 'D', 'E', 'All'), ('All - Variation 2', 'D', 'F', 'All')]
+    labels, columns, naive_count = plan_metric_lookups(kpis, segments)
+    assert labels == ['Orders', 'Visits', 'Cart Add', 'Revenue']
+    assert columns == ['D', 'E', 'F']
+    assert naive_count == (2 + 2 + 1 + 2 + 2) * 3
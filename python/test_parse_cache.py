@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+파싱 결과 디스크 캐시 테스트
+"""
+
+import os
+
+from core.parse_cache import ParseCache
+
+
+def test_parse_cache_hit_and_miss(tmp_path):
+    src = tmp_path / 'export.csv'
+    src.write_text('Segments,Control,Variation\nVisits,1,2\n')
+    calls = []
+
+    def parse_fn(path):
+        calls.append(path)
+        return ('parsed', str(path))
+
+    cache = ParseCache(tmp_path / 'cache', parser_version=1, max_bytes=10 * 1024 * 1024)
+    assert cache.get_or_parse(str(src), parse_fn) == (('parsed', str(src)), False)
+    assert cache.get_or_parse(str(src), parse_fn) == (('parsed', str(src)), True)
+    assert len(calls) == 1
+
+    # 파서 버전이 바뀌면 기존 항목을 사용하지 않음
+    cache_v2 = ParseCache(tmp_path / 'cache', parser_version=2, max_bytes=10 * 1024 * 1024)
+    assert cache_v2.get_or_parse(str(src), parse_fn)[1] is False
+
+
+def test_parse_cache_evicts_least_recently_used(tmp_path):
+    cache = ParseCache(tmp_path / 'cache', parser_version=1, max_bytes=3000)
+    paths = []
+    for i in range(3):
+        src = tmp_path / f'export_{i}.csv'
+        src.write_text(f'Segments,{i}\n')
+        paths.append(src)
+        cache.get_or_parse(str(src), lambda path: b'x' * 1000)
+        # 항목별 사용 시각을 분명히 구분
+        for entry in (tmp_path / 'cache').glob('*.pkl'):
+            os.utime(entry, (entry.stat().st_mtime - 10,) * 2)
+
+    # 세 번째 항목 저장 시 용량 초과 → 가장 오래된 첫 번째 항목 삭제
+    assert len(list((tmp_path / 'cache').glob('*.pkl'))) == 2
+    assert cache.get_or_parse(str(paths[0]), lambda path: b'')[1] is False
+    assert cache.get_or_parse(str(paths[2]), lambda path: b'')[1] is True
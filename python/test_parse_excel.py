@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+parse_excel 파싱 단계 단위 테스트
+"""
+
+import multiprocessing
+import os
+
+import pandas as pd
+import pytest
+
+import analyze
+from analyze import get_parse_backend, parse_excel, parse_files_parallel
+from core.columns import col_index_to_letter, col_letter_to_index
+from core import workbook_reader
+from core.workbook_reader import sniff_csv_encoding
+
+
+_parse_one_file = analyze._parse_one_file
+
+
+def _parse_one_file_killed_in_worker(args):
+    """두 번째 파일을 파싱하는 프로세스 풀 워커를 강제 종료 (OOM으로 죽은 워커 흉내)"""
+    if args[0] == 1 and multiprocessing.parent_process() is not None:
+        os._exit(1)
+    return _parse_one_file(args)
+
+
+@pytest.fixture(autouse=True)
+def isolated_layout_cache(tmp_path, monkeypatch):
+    """테스트마다 빈 레이아웃 캐시 사용 (프로젝트 tmp/에 쓰지 않음)"""
+    monkeypatch.setenv('LAYOUT_CACHE_PATH', str(tmp_path / 'layout_cache.json'))
+    monkeypatch.setattr(analyze, '_layout_cache', None)
+
+
+def build_export_rows():
+    """Adobe Workspace 내보내기 형식의 최소 샘플 행 생성"""
+    return [
+        ['#=================================================================', None, None, None, None],
+        ['# Report suite: sample', None, None, None, None],
+        [None, 'All Visits', 'All Visits', 'MO Device', 'MO Device'],
+        [None, 'All Visits - Control', 'All Visits - Variation', 'MO Device - Control', 'MO Device - Variation'],
+        ['Segments', 'Control', 'Variation', 'Control', 'Variation'],
+        ['Visits', 1000, 1010, 400, 420],
+        ['####################', None, None, None, None],
+        ['Orders', 100, '1,150', 40, '-'],
+        [None, None, None, None, None],
+        ['Orders', 5, 6, 7, 8],
+        ['Orders (7)', 1, 2, 3, 4],
+        ['=====', None, None, None, None],
+        ['Revenue', 10.5, 11.25, 3, 4],
+    ]
+
+
+def write_export(tmp_path, suffix):
+    path = tmp_path / f'export{suffix}'
+    df = pd.DataFrame(build_export_rows())
+    if suffix == '.csv':
+        df.to_csv(path, header=False, index=False)
+    else:
+        df.to_excel(path, header=False, index=False)
+    return path
+
+
+def check_parsed(data_df, segment_names):
+    assert segment_names == {'B': 'All Visits', 'C': 'All Visits', 'D': 'MO Device', 'E': 'MO Device'}
+    # 주석/구분선/빈 행 제거, 중복 메트릭명 번호 부여
+    assert data_df['A'].tolist() == ['Visits', 'Orders', 'Orders (2)', 'Orders (3)', 'Revenue']
+    # 숫자 변환: 천단위 콤마·'-'는 NaN, 정수 컬럼은 int64 유지
+    assert str(data_df['D'].dtype) == 'int64'
+    assert data_df['B'].tolist()[:4] == [1000, 100, 5, 1]
+    assert pd.isna(data_df['C'].iloc[1])
+    assert pd.isna(data_df['E'].iloc[1])
+    assert data_df['C'].iloc[4] == 11.25
+
+
+def test_parse_excel_xlsx(tmp_path):
+    data_df, segment_names, _, _, _ = parse_excel(str(write_export(tmp_path, '.xlsx')))
+    check_parsed(data_df, segment_names)
+
+
+def test_parse_excel_csv(tmp_path):
+    data_df, segment_names, _, _, _ = parse_excel(str(write_export(tmp_path, '.csv')))
+    check_parsed(data_df, segment_names)
+
+
+def test_coerce_numeric_block_matches_to_numeric():
+    # 소수 표기 정수('1.0')는 float64, 2^53보다 큰 정수는 정밀도 손실 없이 int64 (컬럼별 pd.to_numeric과 동일)
+    block = pd.DataFrame({
+        'B': ['1.0', '2.0', '3.0'],
+        'C': ['1', '2', '3'],
+        'D': ['12345678901234567', '1', '2'],
+        'E': ['1,150', '-', '4'],
+        'F': [10.5, 11.25, 3],
+    }, dtype=object)
+    converted = analyze._coerce_numeric_block(block)
+    pd.testing.assert_frame_equal(converted, block.apply(pd.to_numeric, errors='coerce'))
+    assert [str(dtype) for dtype in converted.dtypes[:3]] == ['float64', 'int64', 'int64']
+    assert converted['D'].iloc[0] == 12345678901234567
+
+
+def test_parse_excel_two_phase_read(tmp_path):
+    # 헤더 미리보기(상단 행) 범위를 넘는 긴 파일: 데이터 영역은 2단계로 필요한 컬럼만 읽음
+    # 세그먼트로 감지되지 않은 컬럼(F)은 full_width=True(파싱 데이터 내보내기)일 때만 값이 남음
+    rows = [row + [None] for row in build_export_rows()]
+    rows += [[f'Metric {i}', i, i + 1, i + 2, i + 3, i * 10] for i in range(200)]
+    for suffix in ('.xlsx', '.csv'):
+        path = tmp_path / f'tall{suffix}'
+        df = pd.DataFrame(rows)
+        if suffix == '.csv':
+            df.to_csv(path, header=False, index=False)
+        else:
+            df.to_excel(path, header=False, index=False)
+        data_df, segment_names, _, _, _ = parse_excel(str(path))
+        check_parsed(data_df.iloc[:5], segment_names)
+        assert len(data_df) == 205
+        assert data_df['A'].iloc[-1] == 'Metric 199'
+        assert data_df['E'].iloc[-1] == 202
+        assert data_df['F'].isna().all()
+        assert data_df.attrs['full_width'] is False
+
+        full_df = parse_excel(str(path), full_width=True)[0]
+        assert full_df.attrs['full_width'] is True
+        assert full_df['F'].iloc[5:].tolist() == [i * 10 for i in range(200)]
+        pd.testing.assert_frame_equal(full_df.drop(columns='F'), data_df.drop(columns='F'))
+
+
+def test_parse_excel_streaming_csv(tmp_path, monkeypatch):
+    # 대용량 CSV 스트리밍 파싱 결과가 한 번에 읽은 결과와 같아야 함 (청크 경계에 소수/빈 값 포함)
+    rows = [row + [None] for row in build_export_rows()]
+    rows += [[f'Metric {i}', i, i + 0.5 if i == 150 else i + 1, i + 2, None if i == 120 else i + 3, 'n/a']
+             for i in range(200)]
+    rows += [['# footer', None, None, None, None, None]]
+    path = tmp_path / 'tall.csv'
+    pd.DataFrame(rows).to_csv(path, header=False, index=False)
+    expected = parse_excel(str(path))
+
+    monkeypatch.setenv('CSV_STREAM_MIN_MB', '0')
+    monkeypatch.setattr(analyze, 'CSV_STREAM_CHUNK_ROWS', 32)
+    streamed = parse_excel(str(path))
+    pd.testing.assert_frame_equal(streamed[0], expected[0])
+    assert streamed[0].attrs == expected[0].attrs
+    assert streamed[1:] == expected[1:]
+    check_parsed(streamed[0].iloc[:5], streamed[1])
+
+
+def test_parse_excel_wide_workbook(tmp_path):
+    # Z열을 넘는 세그먼트 컬럼(40개 세그먼트 × Control/Variation)도 AA, AB, ... 주소로 파싱
+    n_segments = 40
+    names = [f'Segment {i}' for i in range(n_segments) for _ in range(2)]
+    rows = [
+        [None] + names,
+        [None] + [f'{name} - {kind}' for name, kind in zip(names, ['Control', 'Variation'] * n_segments)],
+        ['Segments'] + ['Control', 'Variation'] * n_segments,
+        ['Visits'] + list(range(1, 2 * n_segments + 1)),
+    ]
+    path = tmp_path / 'wide.xlsx'
+    pd.DataFrame(rows).to_excel(path, header=False, index=False)
+    data_df, segment_names, _, _, _ = parse_excel(str(path))
+    assert list(data_df.columns[:3]) == ['A', 'B', 'C']
+    assert list(data_df.columns[-3:]) == ['CA', 'CB', 'CC']
+    assert segment_names['CB'] == segment_names['CC'] == 'Segment 39'
+    assert data_df['CC'].iloc[0] == 2 * n_segments
+
+    assert [col_index_to_letter(i) for i in (0, 25, 26, 701, 702)] == ['A', 'Z', 'AA', 'ZZ', 'AAA']
+    assert all(col_letter_to_index(col_index_to_letter(i)) == i for i in range(1000))
+
+
+def test_parse_excel_layout_cache(tmp_path, monkeypatch):
+    # 같은 템플릿(헤더 구조)의 두 번째 파일은 세그먼트/국가 감지를 건너뜀
+    first = write_export(tmp_path, '.csv')
+    expected = parse_excel(str(first))
+    assert analyze.get_layout_cache().misses == 1
+
+    rows = build_export_rows()
+    rows[1] = ['# Report suite: other date range', None, None, None, None]
+    rows[5] = ['Visits', 2000, 2020, 800, 840]
+    second = tmp_path / 'second.csv'
+    pd.DataFrame(rows).to_csv(second, header=False, index=False)
+
+    def fail(*args, **kwargs):
+        raise AssertionError('레이아웃 캐시 적중 시 감지를 다시 하면 안 됨')
+
+    monkeypatch.setattr(analyze, 'scan_segment_columns_from_excel', fail)
+    monkeypatch.setattr(analyze, 'detect_countries_from_b_column', fail)
+    data_df, segment_names, country, is_multi_country, countries = parse_excel(str(second))
+    assert analyze.get_layout_cache().hits == 1
+    assert (segment_names, country, is_multi_country, countries) == expected[1:]
+    assert data_df.attrs == expected[0].attrs
+    assert data_df['B'].iloc[0] == 2000
+
+    # 파일에 저장되어 다른 프로세스(새 캐시 인스턴스)에서도 사용
+    monkeypatch.setattr(analyze, '_layout_cache', None)
+    parse_excel(str(second))
+    assert analyze.get_layout_cache().hits == 1
+
+
+def test_parse_excel_csv_encodings(tmp_path):
+    # 한국어 로케일 내보내기(cp949)와 BOM 포함 UTF-8: 앞부분 바이트로 한 번에 인코딩 판별
+    rows = build_export_rows() + [['구매 전환', 1, 2, 3, 4]]
+    for encoding, expected in (('cp949', 'cp949'), ('utf-8-sig', 'utf-8-sig'), ('utf-8', 'utf-8')):
+        path = tmp_path / f'export_{encoding}.csv'
+        pd.DataFrame(rows).to_csv(path, header=False, index=False, encoding=encoding)
+        assert sniff_csv_encoding(path) == expected
+        data_df, segment_names, _, _, _ = parse_excel(str(path))
+        check_parsed(data_df.iloc[:5], segment_names)
+        assert data_df['A'].iloc[-1] == '구매 전환'
+
+    # 비ASCII 문자가 판별 샘플 구간 뒤에만 있는 경우
+    path = tmp_path / 'late_korean.csv'
+    path.write_bytes(b'Segments,Control\n' * 10 + '방문,1\n'.encode('cp949'))
+    assert sniff_csv_encoding(path, sample_bytes=16) == 'cp949'
+    # 판별 범위(max_bytes)가 모두 ASCII면 파일 끝까지 읽지 않고 utf-8로 가정
+    assert sniff_csv_encoding(path, sample_bytes=16, max_bytes=64) == 'utf-8'
+
+
+def test_parse_excel_csv_late_or_mixed_encoding(tmp_path, monkeypatch):
+    # 판별 범위 뒤쪽에만 cp949 문자가 있으면 다시 읽고, UTF-8 뒤에 cp949가 섞인 파일은 깨진 바이트만 치환
+    monkeypatch.setattr(workbook_reader, 'ENCODING_SNIFF_BYTES', 16)
+    monkeypatch.setattr(workbook_reader, 'ENCODING_SNIFF_MAX_BYTES', 64)
+    rows = build_export_rows() + [[f'Metric {i}', i, i, i, i] for i in range(100)]
+    ascii_csv = pd.DataFrame(rows).to_csv(header=False, index=False).encode('ascii')
+    late_cp949 = ascii_csv + '구매 전환,1,2,3,4\n'.encode('cp949')
+    # 첫 비ASCII 문자(주석 행)가 UTF-8이라 utf-8로 판별됨
+    mixed = ('# 방문 리포트,,,,\n'.encode('utf-8') + ascii_csv.replace(b'Metric 0,', '방문 0,'.encode('utf-8'))
+             + '구매 전환,1,2,3,4\n'.encode('cp949'))
+    for stream_min_mb in ('512', '0'):
+        monkeypatch.setenv('CSV_STREAM_MIN_MB', stream_min_mb)
+        for name, content in (('late', late_cp949), ('mixed', mixed)):
+            path = tmp_path / f'{name}.csv'
+            path.write_bytes(content)
+            data_df, segment_names, _, _, _ = parse_excel(str(path))
+            check_parsed(data_df.iloc[:5], segment_names)
+            assert len(data_df) == 106
+            assert data_df['E'].iloc[-1] == 4
+            if name == 'late':
+                assert data_df['A'].iloc[-1] == '구매 전환'
+            else:
+                assert data_df['A'].iloc[5] == '방문 0'
+                assert '\ufffd' in data_df['A'].iloc[-1]
+
+
+def test_parse_files_parallel_backends(tmp_path, monkeypatch):
+    # 프로세스 풀 백엔드도 스레드 풀과 같은 프레임·attrs를 부모로 돌려줌
+    files_config = [{'path': str(write_export(tmp_path, suffix))} for suffix in ('.xlsx', '.csv')]
+    by_backend = {
+        backend: parse_files_parallel(files_config, None, backend, 2)
+        for backend in ('thread', 'process')
+    }
+    for idx in range(len(files_config)):
+        thread_df, thread_segments, _, thread_err = by_backend['thread'][idx]
+        process_df, process_segments, _, process_err = by_backend['process'][idx]
+        assert thread_err is None and process_err is None
+        check_parsed(process_df, process_segments)
+        pd.testing.assert_frame_equal(thread_df, process_df)
+        assert thread_df.attrs == process_df.attrs
+
+    # 작업 중 워커가 죽으면 끝나지 않은 파일만 스레드 풀로 다시 파싱
+    monkeypatch.setattr(analyze, '_parse_one_file', _parse_one_file_killed_in_worker)
+    recovered = parse_files_parallel(files_config, None, 'process', 2)
+    assert sorted(recovered) == [0, 1]
+    for idx, (data_df, segment_names, _, err) in recovered.items():
+        assert err is None
+        pd.testing.assert_frame_equal(data_df, by_backend['thread'][idx][0])
+
+    assert get_parse_backend({'parseBackend': 'thread'}, 20)[0] == 'thread'
+    assert get_parse_backend({'parseBackend': 'auto'}, 1) == ('thread', 1)
+
+
+if __name__ == '__main__':
+    import tempfile
+    from pathlib import Path
+    with tempfile.TemporaryDirectory() as d:
+        test_parse_excel_xlsx(Path(d))
+        test_parse_excel_csv(Path(d))
+        test_parse_excel_two_phase_read(Path(d))
+        test_parse_excel_wide_workbook(Path(d))
+        test_parse_excel_csv_encodings(Path(d))
+    print("모든 테스트 통과!")
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+파싱 데이터 내보내기 테스트
+"""
+
+import pandas as pd
+
+import pytest
+
+from core.parsed_data import (
+    PARSED_DATA_SOURCES_DIR, export_parsed_data_xlsx, load_parsed_data, parsed_data_paths, save_parsed_data,
+    save_parsed_data_sources,
+)
+
+
+def test_export_is_deferred_and_reused(tmp_path):
+    pickle_path, xlsx_path = parsed_data_paths(tmp_path)
+    xlsx_path.write_bytes(b'previous job')
+    df = pd.DataFrame({'Segment': ['Visits', 'Orders'], 'All - Control': [1000, 30]})
+
+    # 작업 중에는 중간 파일만 저장하고 이전 작업의 XLSX는 삭제
+    assert save_parsed_data(df, tmp_path) == pickle_path
+    assert not xlsx_path.exists()
+    pd.testing.assert_frame_equal(load_parsed_data(tmp_path), df)
+
+    # 요청 시 XLSX 생성, 최신이면 재사용
+    assert export_parsed_data_xlsx(tmp_path) == xlsx_path
+    pd.testing.assert_frame_equal(pd.read_excel(xlsx_path), df)
+    mtime = xlsx_path.stat().st_mtime_ns
+    assert export_parsed_data_xlsx(tmp_path) == xlsx_path
+    assert xlsx_path.stat().st_mtime_ns == mtime
+
+
+def test_export_without_parsed_data(tmp_path):
+    assert export_parsed_data_xlsx(tmp_path) is None
+    assert load_parsed_data(tmp_path) is None
+
+
+def test_export_rebuilds_from_linked_sources(tmp_path):
+    # 원본 파일은 분석 후 삭제되어도 링크로 남아 XLSX 생성 시 다시 파싱됨
+    source = tmp_path / 'upload.csv'
+    source.write_text('Visits,1000\n')
+    recipe = {'segments': ['All'], 'variationCount': 1, 'files': None}
+    calls = []
+
+    def rebuild(source_paths, saved_recipe):
+        calls.append(saved_recipe)
+        return pd.DataFrame({'Segment': [open(path).read().split(',')[0] for path in source_paths]})
+
+    save_parsed_data_sources([source], recipe, tmp_path)
+    source.unlink()
+    with pytest.raises(ValueError):
+        load_parsed_data(tmp_path)
+    xlsx_path = export_parsed_data_xlsx(tmp_path, rebuild)
+    assert calls == [recipe]
+    assert pd.read_excel(xlsx_path)['Segment'].tolist() == ['Visits']
+
+    # 다음 작업이 프레임을 저장하면 이전 원본 링크는 삭제
+    save_parsed_data(pd.DataFrame({'Segment': ['Orders']}), tmp_path)
+    assert list((tmp_path / PARSED_DATA_SOURCES_DIR).iterdir()) == []
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+빈도주의 통계 일괄 계산 테스트
+"""
+
+import numpy as np
+import pytest
+
+from analyze import compute_confidence_rate, compute_verdict
+from core.stats import confidence_rates, verdicts
+
+
+def test_confidence_rates_edge_cases_match_scalar():
+    cells = [
+        (100, 1000, 150, 1000),   # 일반
+        (100, 1000, 100, 1000),   # 같은 비율 → 0.0
+        (5, 0, 10, 100),          # 분모 0
+        (0, 100, 0, 100),         # 두 비율 모두 0
+        (100, 100, 100, 100),     # 분산 0
+        (10, 100, np.nan, 100),   # 결측
+        (500, 100, 10, 100),      # 비율 > 1 (sqrt 음수)
+    ]
+    pC, z, p_value, confidence = confidence_rates(*np.array(cells, dtype=float).T)
+    assert confidence[0] == pytest.approx(99.93, abs=0.01)
+    assert pC[0] == 0.1 and z[0] > 0 and p_value[0] == pytest.approx(1 - confidence[0] / 100)
+    assert confidence[1:5].tolist() == [0.0, 0.0, 0.0, 0.0]
+    assert pC[1] == 0.1 and np.isnan(pC[2:]).all()
+    assert np.isnan(confidence[5:]).all()
+
+    scalar = [compute_confidence_rate(*cell) for cell in cells]
+    assert scalar[0] == (0.1, confidence[0])
+    assert scalar[1] == (0.1, 0.0)
+    assert scalar[2:5] == [(None, 0.0)] * 3
+    assert scalar[5:] == [(None, None)] * 2
+
+
+def test_verdicts_match_thresholds():
+    uplift = [5.0, -5.0, 5.0, -5.0, 1.0, 5.0, 5.0]
+    num_c = [200, 200, 200, 200, 200, 99, 200]
+    num_v = [200, 200, 200, 200, 200, 200, 200]
+    confidence = [96.0, 95.0, 92.0, 90.0, 99.0, 99.0, np.nan]
+    expected = [
+        'Variation 우세', 'Control 우세', 'Variation 우세 (유보)', 'Control 우세 (유보)',
+        '차이 없음', '모수 부족', '차이 없음',
+    ]
+    assert verdicts(uplift, num_c, num_v, confidence).tolist() == expected
+    assert [compute_verdict(u, c, v, None if np.isnan(conf) else conf)
+            for u, c, v, conf in zip(uplift, num_c, num_v, confidence)] == expected